@@ -1,72 +1,319 @@
-import logging
-from paths import path
-from data_reading import DataReading
-from files import FileName
-import os
-from data_analysis import Analysis
-from data_injection import DataInjection
-
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-    handlers=[
-        logging.FileHandler(
-            os.path.join(path.get_logs_path(), "data_analysis_main.log")
-        ),
-        logging.StreamHandler(),
-    ],
-)
-
-
-def main():
-    logging.info("Starting the main function")
-    try:
-        # reading the data
-        data_frames = DataReading.read_data(FileName.get_files_name())
-        for name, data_frame in data_frames.items():
-            #processing the data
-            if data_frame is not None:
-                logging.info(f"Reading the data {name} is successful")
-                if name == "country_wise":
-                    Analysis.country_wise_eda(data_frame=data_frame, name=name)
-                elif name == "covid_19_clean":
-                    Analysis.covid_19_clean_eda(data_frame == data_frame, name=name)
-                elif name == "day_wise":
-                    Analysis.day_wise_eda(data_frame=data_frame, name=name)
-                elif name == "full_grouped":
-                    Analysis.full_grouped_eda(data_frame=data_frame, name=name)
-                elif name == "usa_county_wise":
-                    Analysis.usa_county_wise_eda(data_frame=data_frame, name=name)
-                elif name == "worldometer":
-                    Analysis.worldometer_eda(data_frame=data_frame, name=name)
-                else:
-                    logging.info(
-                        f"Data processing for {name} is not defined in the main function"
-                    )
-
-            else:
-                logging.info(
-                    f"Data of {name} doesnot exist or there is a problem with the data"
-                )
-        
-        try:
-         #injecting the data to db
-         db_create=DataInjection(db_name="covid_19_db")
-         db_create.create_database()
-         db_create.inject_data_from_parquet()
-         
-        except Exception as e:
-         logging.error(f"error occured durin the data injection: {e}")
-        
-        finally:
-            if db_create:
-                db_create.close_connection()
-
-
-    except Exception as e:
-        logging.error(f"Error in main function: {e}")
-
-
-if __name__ == "__main__":
-    main()
+import logging
+from paths import path
+from files import FileName
+import os
+import sys
+import time
+import argparse
+import importlib
+from config import Config
+from run_manifest import RunManifest
+from instrumentation import Instrumentation
+
+# modules imported by every subcommand, the startup of the cli only imports the light ones above
+COMMAND_MODULES = {
+    "run": ["data_pipeline", "data_injection"],
+    "ingest": ["data_pipeline"],
+    "validate": ["data_reading", "data_expectations"],
+    "load": ["data_injection"],
+    "upload": ["s3_transfer"],
+    "query": ["duckdb"],
+}
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    handlers=[
+        logging.FileHandler(
+            os.path.join(path.get_logs_path(), "data_analysis_main.log")
+        ),
+        logging.StreamHandler(),
+    ],
+)
+
+
+def open_database():
+    from data_injection import DataInjection
+
+    db_create = DataInjection(
+        db_name="covid_19_db", threads=Config.get_db_threads(), memory_limit=Config.get_db_memory_limit()
+    )
+    db_create.create_database()
+    return db_create
+
+
+def main(execution_mode=None, max_workers=None, batch_size=None, ingest_mode=None, engine=None, load_mode=None):
+    ''' process the changed datasets and load them, returns 1 if a dataset or the load failed, else 0 '''
+    logging.info("Starting the main function")
+    failed = False
+    db_create = None
+    records = []
+    run_info = {
+        "execution_mode": execution_mode or Config.get_execution_mode(),
+        "engine": engine or Config.get_engine(),
+        "ingest_mode": ingest_mode or Config.get_ingest_mode(),
+        "load_mode": load_mode or Config.get_load_mode(),
+        "batch_size": batch_size or Config.get_batch_size(),
+        "datasets": {},
+    }
+    try:
+        with Instrumentation.stage("run"):
+            # skipping the datasets which did not change since the last run
+            manifest = RunManifest(path.get_output_path(), engine=run_info["engine"], load_mode=run_info["load_mode"])
+            if not os.path.exists(os.path.join(path.get_db_files_path(), "covid_19_db.duckdb")):
+                manifest.clear()
+            file_names = FileName.get_files_name()
+            changed = manifest.get_changed(file_names)
+            if not changed:
+                logging.info("No dataset changed since the last run, nothing to do")
+                return 0
+
+            # heavy modules are only needed when there is something to process
+            from data_pipeline import Pipeline
+
+            if (ingest_mode or Config.get_ingest_mode()) == "delta":
+                # appending only the new dates of the time series datasets
+                db_create=open_database()
+                for name, result in Pipeline.run_delta(changed, db_create).items():
+                    if result["success"]:
+                        logging.info(f"Appended {result['rows']} new rows of {name}")
+                        run_info["datasets"][name] = f"appended {result['rows']} rows"
+                        manifest.update(name, changed.pop(name))
+                manifest.save()
+
+            # reading and processing the data
+            options = {
+                "batch_size": batch_size or Config.get_batch_size(),
+                "engine": engine or Config.get_engine(),
+                "direct": (load_mode or Config.get_load_mode()) == "direct",
+            }
+            if run_info["execution_mode"] == "async":
+                # the orchestrator loads (and uploads) every dataset as soon as it is processed
+                from orchestrator import Orchestrator
+                if db_create is None:
+                    db_create=open_database()
+                results = Orchestrator(
+                    db_create, max_workers=max_workers or Config.get_max_workers(),
+                    upload_bucket=Config.get_upload_bucket(), **options
+                ).run(changed)
+            else:
+                results = Pipeline.run(
+                    changed,
+                    execution_mode=run_info["execution_mode"],
+                    max_workers=max_workers or Config.get_max_workers(),
+                    **options,
+                )
+            processed = []
+            tables = {}
+            for name, result in results.items():
+                records.extend(result.pop("stages", []))
+                run_info["datasets"][name] = "success" if result["success"] else result["error"]
+                if result["success"]:
+                    processed.append(name)
+                    if "table" in result:
+                        tables[name] = result.pop("table")
+                    logging.info(f"Processing of {name} is successful")
+                else:
+                    failed = True
+                    logging.info(f"Processing of {name} failed: {result['error']}")
+
+            try:
+             #injecting the data to db
+             if db_create is None:
+                 db_create=open_database()
+             if tables:
+                 Pipeline.load_direct(tables, db_create, export_parquet=Config.get_export_parquet())
+             db_create.inject_data_from_parquet(
+                 table_names=[name for name in processed if name not in tables and not results[name].get("loaded")]
+             )
+             db_create.refresh_rollups()
+             for name in processed:
+                 manifest.update(name, changed[name])
+             manifest.save()
+         
+            except Exception as e:
+             failed = True
+             logging.error(f"error occured durin the data injection: {e}")
+        
+            finally:
+                if db_create:
+                    db_create.close_connection()
+
+
+    except Exception as e:
+        failed = True
+        logging.error(f"Error in main function: {e}")
+
+    finally:
+        Instrumentation.write_report(records + Instrumentation.drain(), run_info)
+    return 1 if failed else 0
+
+
+def get_file_names(datasets=None):
+    ''' input files of the given datasets, every dataset by default '''
+    file_names = FileName.get_files_name()
+    return {name: file_path for name, file_path in file_names.items() if not datasets or name in datasets}
+
+
+def ingest(args):
+    ''' read, clean and write the datasets to parquet, without loading them to the database '''
+    from data_pipeline import Pipeline
+
+    results = Pipeline.run(
+        get_file_names(args.datasets),
+        execution_mode=args.execution_mode or Config.get_execution_mode(),
+        max_workers=args.max_workers or Config.get_max_workers(),
+        batch_size=args.batch_size or Config.get_batch_size(),
+        engine=args.engine or Config.get_engine(),
+    )
+    for name, result in results.items():
+        print(f"{name:<16} {'ok' if result['success'] else result['error']}")
+    return 0 if all(result["success"] for result in results.values()) else 1
+
+
+def validate(args):
+    ''' check the input files against the expectations of their dataset, without writing any output '''
+    from data_reading import DataReading
+    from data_expectations import Expectations
+
+    failed = False
+    for name, file_path in get_file_names(args.datasets).items():
+        try:
+            data_frame = DataReading.read_data({name: file_path})[name]
+        except Exception as e:
+            print(f"{name:<16} cannot be read: {e}")
+            failed = True
+            continue
+        result = Expectations.validate(data_frame, name, path.get_validations_path())
+        statistics = result["statistics"]
+        print(f"{name:<16} rows={len(data_frame)} {statistics['successful_expectations']}/"
+              f"{statistics['evaluated_expectations']} expectations met")
+        for document in result["results"]:
+            if not document["success"]:
+                config = document["expectation_config"]
+                print(f"    {config['expectation_type']} {config['kwargs']}: "
+                      f"{document['exception_info']['exception_message'] or document['result']}")
+        if args.with_ge:
+            ge_result = Expectations.validate_with_ge(data_frame, Expectations.get_suite(name), name)
+            print(f"    great_expectations success={ge_result['success']}")
+        failed = failed or not result["success"]
+    return 1 if failed else 0
+
+
+def load(args):
+    ''' load the parquet output into the database and refresh the rollups of the loaded tables '''
+    db_create = open_database()
+    try:
+        db_create.inject_data_from_parquet(table_names=args.tables)
+        db_create.refresh_rollups(full=args.rebuild_rollups)
+    finally:
+        db_create.close_connection()
+    return 0
+
+
+def upload(args):
+    ''' sync the parquet output to a bucket '''
+    from s3_transfer import S3Transfer
+
+    report = S3Transfer().sync_directory(args.output_dir, args.bucket, args.prefix, delete=args.delete, dry_run=args.dry_run)
+    print(f"upload={len(report['upload'])} ({report['upload_bytes']} bytes) skip={len(report['skip'])} "
+          f"delete={len(report['delete'])}{' (dry run)' if args.dry_run else ''}")
+    return 0
+
+
+def query(args):
+    ''' run a sql query on a read-only connection to the database '''
+    import duckdb
+
+    connection = duckdb.connect(args.db_file, read_only=True)
+    try:
+        connection.sql(args.sql).show(max_rows=args.max_rows)
+    finally:
+        connection.close()
+    return 0
+
+
+def get_parser():
+    parser = argparse.ArgumentParser(prog="analyze", description="COVID-19 data pipeline")
+    parser.add_argument("--import-only", choices=list(COMMAND_MODULES), metavar="COMMAND",
+                        help="only import the modules of COMMAND and print the time it took, to measure its cold start")
+    subparsers = parser.add_subparsers(dest="command", metavar="command")
+    datasets = list(FileName.get_files_name())
+
+    run_parser = subparsers.add_parser("run", help="process the changed datasets and load them (the default)")
+    run_parser.add_argument("--execution-mode", choices=["serial", "parallel", "async"])
+    run_parser.add_argument("--max-workers", type=int)
+    run_parser.add_argument("--batch-size", type=int)
+    run_parser.add_argument("--ingest-mode", choices=["full", "delta"])
+    run_parser.add_argument("--engine", choices=["pandas", "duckdb", "polars"])
+    run_parser.add_argument("--load-mode", choices=["parquet", "direct"])
+
+    ingest_parser = subparsers.add_parser("ingest", help="read, clean and write the datasets to parquet")
+    ingest_parser.add_argument("--datasets", nargs="+", choices=datasets)
+    ingest_parser.add_argument("--execution-mode", choices=["serial", "parallel"])
+    ingest_parser.add_argument("--max-workers", type=int)
+    ingest_parser.add_argument("--batch-size", type=int)
+    ingest_parser.add_argument("--engine", choices=["pandas", "duckdb", "polars"])
+
+    validate_parser = subparsers.add_parser("validate", help="check the input files against the expectations of their dataset")
+    validate_parser.add_argument("--datasets", nargs="+", choices=datasets)
+    validate_parser.add_argument("--with-ge", action="store_true",
+                                 help="also validate with great_expectations (optional dependency) for its reports")
+
+    load_parser = subparsers.add_parser("load", help="load the parquet output into the database")
+    load_parser.add_argument("--tables", nargs="+", help="only load these tables")
+    load_parser.add_argument("--rebuild-rollups", action="store_true", help="rebuild every rollup table, not only the ones of the loaded tables")
+
+    upload_parser = subparsers.add_parser("upload", help="sync the parquet output to S3")
+    upload_parser.add_argument("bucket")
+    upload_parser.add_argument("--prefix", default="")
+    upload_parser.add_argument("--output-dir", default=path.get_output_path())
+    upload_parser.add_argument("--delete", action="store_true", help="delete the remote files which no longer exist locally")
+    upload_parser.add_argument("--dry-run", action="store_true")
+
+    query_parser = subparsers.add_parser("query", help="run a sql query on the database")
+    query_parser.add_argument("sql")
+    query_parser.add_argument("--db-file", default=os.path.join(path.get_db_files_path(), "covid_19_db.duckdb"))
+    query_parser.add_argument("--max-rows", type=int, default=40)
+    return parser
+
+
+def cli(argv=None):
+    """
+    Entry point of the analyze command.
+
+    The heavy modules (pandas, duckdb, boto3) are only imported by the
+    subcommand which needs them, so the help and the light commands start fast.
+
+    Args:
+        argv (list, optional): The arguments. Defaults to sys.argv[1:].
+
+    Returns:
+        int: The exit code.
+    """
+    args = get_parser().parse_args(argv)
+    if args.import_only:
+        start = time.perf_counter()
+        for module in COMMAND_MODULES[args.import_only]:
+            importlib.import_module(module)
+        print(f"{args.import_only} imports took {time.perf_counter() - start:.3f}s")
+        return 0
+
+    command = args.command or "run"
+
+    if command == "run":
+        return main(
+            execution_mode=getattr(args, "execution_mode", None),
+            max_workers=getattr(args, "max_workers", None),
+            batch_size=getattr(args, "batch_size", None),
+            ingest_mode=getattr(args, "ingest_mode", None),
+            engine=getattr(args, "engine", None),
+            load_mode=getattr(args, "load_mode", None),
+        )
+    commands = {"ingest": ingest, "validate": validate, "load": load, "upload": upload, "query": query}
+    return commands[command](args)
+
+
+if __name__ == "__main__":
+    sys.exit(cli())
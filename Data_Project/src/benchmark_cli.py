@@ -0,0 +1,75 @@
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+from paths import path
+
+COMMANDS = ["run", "ingest", "validate", "load", "upload", "query"]
+
+
+def time_process(arguments, repeat):
+    """
+    Time a fresh python process, from its start to its exit.
+
+    Args:
+        arguments (list): The arguments after the python executable.
+        repeat (int): Number of runs.
+
+    Returns:
+        dict: The best and the median seconds, or the error of a failed run.
+    """
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        process = subprocess.run([sys.executable, *arguments], cwd=path.get_src_path(), capture_output=True, text=True)
+        timings.append(time.perf_counter() - start)
+        if process.returncode != 0:
+            return {"error": process.stderr.strip().splitlines()[-1] if process.stderr.strip() else f"exit code {process.returncode}"}
+    timings.sort()
+    return {"best_seconds": round(timings[0], 4), "median_seconds": round(timings[len(timings) // 2], 4)}
+
+
+def benchmark(commands: list, repeat: int = 5):
+    """
+    Measure the cold start of the cli and of every subcommand.
+
+    The "help" time is the start of the cli up to the parsing of the arguments, the
+    "imports" time also imports the modules the subcommand needs, without running it.
+    The "python" baseline is the start of an empty interpreter.
+
+    Args:
+        commands (list): Names of the subcommands.
+        repeat (int, optional): Number of runs of each measure.
+
+    Returns:
+        dict: Results keyed by subcommand with the "help" and "imports" timings.
+    """
+    results = {"python": {"help": time_process(["-c", "pass"], repeat)}}
+    results["cli"] = {"help": time_process(["__main__.py", "--help"], repeat)}
+    for command in commands:
+        results[command] = {
+            "help": time_process(["__main__.py", command, "--help"], repeat),
+            "imports": time_process(["__main__.py", "--import-only", command], repeat),
+        }
+    for command, result in results.items():
+        timings = " ".join(
+            f"{name}={timing['best_seconds']:.3f}s" if "error" not in timing else f"{name}=failed ({timing['error']})"
+            for name, timing in result.items()
+        )
+        print(f"{command:<9} {timings}")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure the cold start time of every cli subcommand")
+    parser.add_argument("--commands", nargs="+", default=COMMANDS, choices=COMMANDS)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", default=os.path.join(path.get_logs_path(), "benchmark_cli.json"))
+    args = parser.parse_args()
+
+    results = benchmark(args.commands, args.repeat)
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"Results saved to {args.output}")
@@ -0,0 +1,82 @@
+import os
+import json
+import time
+import shutil
+import argparse
+import tempfile
+from files import FileName
+from paths import path
+
+
+def run_pandas(name, file_path, output_dir):
+    ''' read -> apply_rules -> to_parquet with pandas '''
+    from data_reading import DataReading
+    from data_analysis import Analysis
+    from data_conversion import DataConvert
+
+    data_frame = DataReading.read_data({name: file_path})[name]
+    df = Analysis.apply_rules(data_frame, name, output_dir)
+    DataConvert.to_parquet({name: df}, output_dir)
+    return len(df)
+
+
+def run_duckdb(name, file_path, output_dir):
+    ''' read -> clean -> parquet in a single DuckDB COPY '''
+    from data_sql_engine import SqlEngine
+    return SqlEngine.clean_dataset(name, file_path, output_dir, output_dir)
+
+
+def run_polars(name, file_path, output_dir):
+    ''' read -> clean -> parquet in a lazy Polars query '''
+    from data_polars_engine import PolarsEngine
+    return PolarsEngine.clean_dataset(name, file_path, output_dir, output_dir)
+
+
+ENGINES = {"pandas": run_pandas, "duckdb": run_duckdb, "polars": run_polars}
+
+
+def benchmark(file_names: dict, engines: list, repeat: int = 3):
+    """
+    Time every engine on every dataset.
+
+    Args:
+        file_names (dict): Dictionary where keys are dataset names and values are file paths.
+        engines (list): Names of the engines in ENGINES.
+        repeat (int, optional): Number of runs of each engine, the best run is reported.
+
+    Returns:
+        dict: Results keyed by dataset name and engine with the rows and the seconds.
+    """
+    results = {}
+    for name, file_path in file_names.items():
+        if not os.path.exists(file_path):
+            print(f"Skipping {name}, {file_path} does not exist")
+            continue
+        results[name] = {}
+        for engine in engines:
+            timings = []
+            rows = None
+            for _ in range(repeat):
+                output_dir = tempfile.mkdtemp(prefix=f"benchmark_{engine}_")
+                try:
+                    start = time.perf_counter()
+                    rows = ENGINES[engine](name, file_path, output_dir)
+                    timings.append(time.perf_counter() - start)
+                finally:
+                    shutil.rmtree(output_dir, ignore_errors=True)
+            results[name][engine] = {"rows": rows, "best_seconds": min(timings), "seconds": timings}
+            print(f"{name:<16} {engine:<7} rows={rows} best={min(timings):.3f}s")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare the dataframe engines on every dataset")
+    parser.add_argument("--engines", nargs="+", default=list(ENGINES), choices=list(ENGINES))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", default=os.path.join(path.get_logs_path(), "benchmark_engines.json"))
+    args = parser.parse_args()
+
+    results = benchmark(FileName.get_files_name(), args.engines, args.repeat)
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"Results saved to {args.output}")
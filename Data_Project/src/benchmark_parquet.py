@@ -0,0 +1,103 @@
+import os
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import duckdb
+import pyarrow.parquet as pq
+from paths import path
+from data_layouts import DataLayouts
+
+
+def get_size(output_path):
+    ''' size in bytes of a Parquet file or of all the files of a dataset directory '''
+    if os.path.isfile(output_path):
+        return os.path.getsize(output_path)
+    return sum(os.path.getsize(os.path.join(root, file_name))
+               for root, dirs, files in os.walk(output_path) for file_name in files)
+
+
+def get_queries(name, table, source):
+    ''' a full scan and, when the dataset has one, a lookup of a single key value '''
+    queries = {"full_scan": f"SELECT count(*), sum(hash(COLUMNS(*))) FROM {source}"}
+    layout = DataLayouts.get_layout(name)
+    keys = [column for column in layout["bloom_filter_columns"] + layout["sort_by"] if column in table.column_names]
+    if keys:
+        value = DataLayouts.decode(table[keys[0]])[table.num_rows // 2].as_py()
+        literal = f"'{value}'" if isinstance(value, str) else f"'{value}'::TIMESTAMP" if hasattr(value, "year") else repr(value)
+        queries[f"lookup_{keys[0]}"] = f"SELECT count(*) FROM {source} WHERE \"{keys[0]}\" = {literal}"
+    return queries
+
+
+def time_query(connection, query, repeat):
+    ''' best time of repeat runs of a query '''
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        connection.execute(query).fetchall()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def benchmark(output_dir: str, profiles: list, repeat: int = 5):
+    """
+    Write every output dataset with every encoding profile and measure it.
+
+    Args:
+        output_dir (str): Directory of the Parquet files written by the pipeline.
+        profiles (list): Names of the profiles in DataLayouts.PROFILES.
+        repeat (int, optional): Number of runs of each measure, the best run is reported.
+
+    Returns:
+        dict: Results keyed by dataset name and profile with the file size in bytes, the
+            write seconds and the DuckDB seconds of each query.
+    """
+    from data_conversion import DataConvert
+
+    results = {}
+    connection = duckdb.connect()
+    for name in DataLayouts.get_layouts():
+        input_path = os.path.join(output_dir, f"{name}.parquet")
+        if not os.path.exists(input_path):
+            print(f"Skipping {name}, {input_path} does not exist, run the pipeline first")
+            continue
+        table = pq.read_table(input_path)
+        results[name] = {}
+        for profile in profiles:
+            benchmark_dir = tempfile.mkdtemp(prefix=f"benchmark_{profile}_")
+            try:
+                write_seconds = []
+                for _ in range(repeat):
+                    start = time.perf_counter()
+                    DataConvert.to_parquet({name: table}, benchmark_dir, partitioned=False, profile=profile)
+                    write_seconds.append(time.perf_counter() - start)
+                output_path = os.path.join(benchmark_dir, f"{name}.parquet")
+                source = f"read_parquet('{output_path.replace(os.sep, '/')}')"
+                results[name][profile] = {
+                    "bytes": get_size(output_path),
+                    "write_seconds": min(write_seconds),
+                    "scan_seconds": {query_name: time_query(connection, query, repeat)
+                                     for query_name, query in get_queries(name, table, source).items()},
+                }
+            finally:
+                shutil.rmtree(benchmark_dir, ignore_errors=True)
+            result = results[name][profile]
+            scans = " ".join(f"{query_name}={seconds * 1000:.1f}ms" for query_name, seconds in result["scan_seconds"].items())
+            print(f"{name:<16} {profile:<13} bytes={result['bytes']:<9} write={result['write_seconds'] * 1000:.1f}ms {scans}")
+    connection.close()
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare the Parquet encoding profiles on every output dataset")
+    parser.add_argument("--profiles", nargs="+", default=list(DataLayouts.PROFILES), choices=list(DataLayouts.PROFILES))
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output-dir", default=path.get_output_path())
+    parser.add_argument("--output", default=os.path.join(path.get_logs_path(), "benchmark_parquet.json"))
+    args = parser.parse_args()
+
+    results = benchmark(args.output_dir, args.profiles, args.repeat)
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"Results saved to {args.output}")
@@ -0,0 +1,217 @@
+import os
+import sys
+import json
+import shutil
+import argparse
+import platform
+import tempfile
+import subprocess
+from datetime import datetime
+from paths import path
+from data_generators import DataGenerators
+from instrumentation import Instrumentation
+
+# the eda methods write their Parquet file, the to_parquet stage is taken out of the eda stage
+STAGES = ["read", "eda", "to_parquet", "inject"]
+
+
+def get_commit():
+    ''' the current git commit, None outside a git checkout '''
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=path.get_project_root(),
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def get_versions():
+    ''' versions of the python packages the stages depend on '''
+    import duckdb
+    import pandas
+    import pyarrow
+    return {"python": platform.python_version(), "pandas": pandas.__version__,
+            "pyarrow": pyarrow.__version__, "duckdb": duckdb.__version__}
+
+
+def run_stages(name, file_path, work_dir):
+    """
+    Run the stages of a dataset once.
+
+    Args:
+        name (str): Name of the dataset.
+        file_path (str): Path of the input csv file.
+        work_dir (str): Folder of the Parquet files and of the database.
+
+    Returns:
+        list: The records of the stages, see Instrumentation.stage.
+    """
+    from data_reading import DataReading
+    from data_injection import DataInjection
+    from data_pipeline import Pipeline
+
+    output_dir = os.path.join(work_dir, "output")
+    db_folder = os.path.join(work_dir, "db_files")
+    shutil.rmtree(db_folder, ignore_errors=True)
+    with Instrumentation.collect() as records:
+        with Instrumentation.stage("read", dataset=name) as record:
+            data_frame = DataReading.read_data({name: file_path})[name]
+            record["rows_out"] = len(data_frame)
+        with Instrumentation.stage("eda", rows_in=len(data_frame)) as record:
+            df = Pipeline.get_eda(name)(data_frame=data_frame, name=name, output_dir=output_dir)
+            if df is None:
+                raise RuntimeError(f"Analysis of {name} failed, check the analysis logs")
+            record["rows_out"] = len(df)
+        injector = DataInjection(db_name="benchmark", db_folder=db_folder)
+        injector.create_database()
+        try:
+            with Instrumentation.stage("inject"):
+                injector.inject_data_from_parquet(table_names=[name], parquet_folder=output_dir)
+        finally:
+            injector.close_connection()
+    return split_parquet_write(name, records)
+
+
+def split_parquet_write(name, records):
+    """
+    Move the Parquet write of the eda stage to a to_parquet stage of its own.
+
+    The write_parquet records nested in the eda stage are summed into the to_parquet record
+    and their wall and CPU seconds subtracted from the eda record. The peak RSS increase of
+    the eda stage is kept, as it cannot be split.
+
+    Args:
+        name (str): Name of the dataset.
+        records (list): The records of a run of the stages.
+
+    Returns:
+        list: The records of the stages of STAGES, the other nested stages are left out.
+    """
+    stages = {record["stage"]: record for record in records if record["parent"] is None}
+    writes = [record for record in records if record["stage"] == "write_parquet"]
+    peaks = [record["peak_rss_delta_bytes"] for record in writes if record["peak_rss_delta_bytes"] is not None]
+    stages["to_parquet"] = {
+        "stage": "to_parquet",
+        "dataset": name,
+        "parent": None,
+        "rows_in": sum(record["rows_in"] or 0 for record in writes),
+        "rows_out": sum(record["rows_out"] or 0 for record in writes),
+        "wall_seconds": round(sum(record["wall_seconds"] for record in writes), 6),
+        "cpu_seconds": round(sum(record["cpu_seconds"] for record in writes), 6),
+        "peak_rss_delta_bytes": max(peaks) if peaks else None,
+    }
+    for key in ["wall_seconds", "cpu_seconds"]:
+        stages["eda"][key] = round(max(stages["eda"][key] - stages["to_parquet"][key], 0.0), 6)
+    return [stages[stage] for stage in STAGES]
+
+
+def benchmark(scales: list, names: list, repeat: int = 3, data_dir: str = None, seed: int = 0):
+    """
+    Time the stages of every dataset on synthetic data of every scale.
+
+    Args:
+        scales (list): Sizes of the data as multiples of the Kaggle files.
+        names (list): Names of the datasets.
+        repeat (int, optional): Number of runs of each dataset, the best run is reported.
+        data_dir (str, optional): Folder where the generated csv files are kept and reused.
+            Defaults to a temporary folder which is removed at the end.
+        seed (int, optional): Seed of the generated data.
+
+    Returns:
+        dict: Results keyed by scale ("x1", "x10", ...) and dataset name with the rows, the
+            csv size in bytes and, for every stage, the best and all the wall seconds, the CPU
+            seconds of the best run and the largest peak RSS increase.
+    """
+    results = {}
+    temp_dir = tempfile.mkdtemp(prefix="benchmark_pipeline_")
+    try:
+        for scale in scales:
+            scale_dir = os.path.join(data_dir or temp_dir, f"x{scale}")
+            results[f"x{scale}"] = {}
+            for name in names:
+                file_path = os.path.join(scale_dir, DataGenerators.FILE_NAMES[name])
+                if data_dir is None or not os.path.exists(file_path):
+                    file_path = DataGenerators.generate(name, scale_dir, scale, seed)
+
+                runs = [run_stages(name, file_path, os.path.join(temp_dir, "work")) for _ in range(repeat)]
+                stages = {}
+                for stage in STAGES:
+                    stage_runs = [next(record for record in run if record["stage"] == stage) for run in runs]
+                    best = min(stage_runs, key=lambda record: record["wall_seconds"])
+                    peaks = [record["peak_rss_delta_bytes"] for record in stage_runs if record["peak_rss_delta_bytes"] is not None]
+                    stages[stage] = {
+                        "best_seconds": best["wall_seconds"],
+                        "seconds": [record["wall_seconds"] for record in stage_runs],
+                        "cpu_seconds": best["cpu_seconds"],
+                        "peak_rss_delta_bytes": max(peaks) if peaks else None,
+                    }
+                results[f"x{scale}"][name] = {
+                    "rows": runs[0][0]["rows_out"],
+                    "csv_bytes": os.path.getsize(file_path),
+                    "stages": stages,
+                }
+                timings = " ".join(f"{stage}={stages[stage]['best_seconds']:.3f}s" for stage in STAGES)
+                print(f"x{scale:<4} {name:<16} rows={runs[0][0]['rows_out']:<10} {timings}")
+                if data_dir is None:
+                    os.remove(file_path)
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+    return results
+
+
+def compare(baseline: dict, report: dict, threshold: float = 0.1):
+    """
+    Find the stages which got slower than in a baseline report.
+
+    Args:
+        baseline (dict): A report saved by an earlier run.
+        report (dict): The report of this run.
+        threshold (float, optional): Relative slowdown reported as a regression. Defaults to 0.1.
+
+    Returns:
+        list: (scale, dataset, stage, baseline seconds, seconds) of every regression.
+    """
+    regressions = []
+    for scale, datasets in report["results"].items():
+        for name, result in datasets.items():
+            old = baseline.get("results", {}).get(scale, {}).get(name)
+            if old is None:
+                continue
+            for stage, timing in result["stages"].items():
+                old_seconds = old["stages"].get(stage, {}).get("best_seconds")
+                if old_seconds and timing["best_seconds"] > old_seconds * (1 + threshold):
+                    regressions.append((scale, name, stage, old_seconds, timing["best_seconds"]))
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time the pipeline stages on synthetic data of growing size")
+    parser.add_argument("--scales", nargs="+", type=int, default=[1, 10, 100])
+    parser.add_argument("--datasets", nargs="+", default=list(DataGenerators.BASE_ROWS), choices=list(DataGenerators.BASE_ROWS))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--data-dir", help="keep the generated csv files in this folder and reuse them")
+    parser.add_argument("--output", default=os.path.join(path.get_logs_path(), "benchmark_pipeline.json"))
+    parser.add_argument("--compare", help="an earlier report to compare the timings with")
+    parser.add_argument("--threshold", type=float, default=0.1, help="relative slowdown reported as a regression")
+    args = parser.parse_args()
+
+    report = {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "commit": get_commit(),
+        "versions": get_versions(),
+        "seed": args.seed,
+        "repeat": args.repeat,
+        "results": benchmark(args.scales, args.datasets, args.repeat, args.data_dir, args.seed),
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results saved to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(baseline, report, args.threshold)
+        for scale, name, stage, old_seconds, seconds in regressions:
+            print(f"{scale:<5} {name:<16} {stage:<10} {old_seconds:.3f}s -> {seconds:.3f}s")
+        print(f"{len(regressions)} stages slower than {args.compare} by more than {args.threshold:.0%}")
+        sys.exit(1 if regressions else 0)
@@ -0,0 +1,112 @@
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+class Config:
+    @staticmethod
+    def get_execution_mode():
+        ''' how the datasets are processed, "serial" (default), "parallel" or "async" '''
+        return os.getenv("execution_mode", "serial").lower()
+
+    @staticmethod
+    def get_max_workers():
+        ''' number of worker processes for the parallel and async modes, None lets the pool decide '''
+        max_workers = os.getenv("max_workers")
+        return int(max_workers) if max_workers else None
+
+    @staticmethod
+    def get_engine():
+        ''' engine which cleans the datasets, "pandas" (default), "duckdb" or "polars" '''
+        return os.getenv("engine", "pandas").lower()
+
+    @staticmethod
+    def get_ingest_mode():
+        ''' "full" (default) reloads every changed dataset, "delta" only appends the new dates of the time series '''
+        return os.getenv("ingest_mode", "full").lower()
+
+    @staticmethod
+    def get_output_layout():
+        ''' "file" (default) writes a single Parquet file per dataset, "partitioned" writes hive partitioned directories '''
+        return os.getenv("output_layout", "file").lower()
+
+    @staticmethod
+    def get_parquet_profile():
+        ''' Parquet encoding profile of DataLayouts.PROFILES for every dataset, None uses the profile of each dataset '''
+        return os.getenv("parquet_profile")
+
+    @staticmethod
+    def get_load_mode():
+        ''' "parquet" (default) loads the database from the Parquet files, "direct" loads the cleaned tables from memory '''
+        return os.getenv("load_mode", "parquet").lower()
+
+    @staticmethod
+    def get_export_parquet():
+        ''' write the Parquet files next to the direct load, true by default '''
+        return os.getenv("export_parquet", "true").lower() in ("true", "1", "yes")
+
+    @staticmethod
+    def get_db_threads():
+        ''' number of DuckDB threads used to load the database, None uses all cores '''
+        db_threads = os.getenv("db_threads")
+        return int(db_threads) if db_threads else None
+
+    @staticmethod
+    def get_db_memory_limit():
+        ''' DuckDB memory limit such as "4GB", None keeps the DuckDB default '''
+        return os.getenv("db_memory_limit")
+
+    @staticmethod
+    def get_batch_size():
+        ''' rows per batch for the streaming mode, None reads every csv fully into memory '''
+        batch_size = os.getenv("batch_size")
+        return int(batch_size) if batch_size else None
+
+    @staticmethod
+    def get_s3_max_concurrency():
+        ''' number of S3 objects transferred at the same time '''
+        return int(os.getenv("s3_max_concurrency", "4"))
+
+    @staticmethod
+    def get_s3_part_concurrency():
+        ''' number of parts of one multipart S3 transfer sent at the same time '''
+        return int(os.getenv("s3_part_concurrency", "4"))
+
+    @staticmethod
+    def get_s3_multipart_chunksize():
+        ''' size in bytes of the parts of multipart S3 transfers, 8MB by default '''
+        return int(os.getenv("s3_multipart_chunksize", str(8 * 1024 * 1024)))
+
+    @staticmethod
+    def get_s3_endpoint_url():
+        ''' endpoint of an S3 compatible store such as MinIO or a moto server, None uses AWS '''
+        return os.getenv("s3_endpoint_url")
+
+    @staticmethod
+    def get_s3_cache():
+        ''' keep the objects read from S3 in the local cache, true by default '''
+        return os.getenv("s3_cache", "true").lower() in ("true", "1", "yes")
+
+    @staticmethod
+    def get_s3_cache_max_bytes():
+        ''' size limit of the local S3 cache in bytes, 2GB by default '''
+        return int(os.getenv("s3_cache_max_bytes", str(2 * 1024 * 1024 * 1024)))
+
+    @staticmethod
+    def get_query_pool_size():
+        ''' number of read-only connections of the query service, 4 by default '''
+        return int(os.getenv("query_pool_size", "4"))
+
+    @staticmethod
+    def get_query_cache_size():
+        ''' number of query results kept by the query service, 256 by default '''
+        return int(os.getenv("query_cache_size", "256"))
+
+    @staticmethod
+    def get_queue_size():
+        ''' number of datasets waiting between two stages of the async mode, 2 by default '''
+        return int(os.getenv("queue_size", "2"))
+
+    @staticmethod
+    def get_upload_bucket():
+        ''' bucket the async mode uploads every loaded dataset to, None (default) skips the upload '''
+        return os.getenv("upload_bucket")
@@ -1,86 +1,254 @@
-import os
-import pandas as pd
-from paths import path
-import string
-import logging
-
-logging.basicConfig(level=logging.INFO,
-                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-                    handlers=[
-                        logging.FileHandler(os.path.join(path.get_logs_path(), "data_conversions.log")),
-                        logging.StreamHandler()
-                    ]
-                    )
-
-class DataConvert:
-    @staticmethod
-    def to_parquet(data_frame: dict, output_dir=None):
-        '''
-        Convert DataFrames to Parquet format and log the conversion process.
-
-        Args:
-            data_frame (dict): Dictionary where keys are names and values are DataFrames to convert.
-            output_dir (str, optional): Directory path to save the Parquet files. Defaults to None.
-
-        Returns:
-            None
-
-        '''
-        if not os.path.exists(output_dir):
-            os.makedirs(output_dir)
-        
-        for name, df in data_frame.items():
-            output_path = os.path.join(output_dir, f"{name}.parquet")
-            if os.path.exists(output_path):
-                logging.info(f"File {output_path.split(os.sep)[-2]} already exists and will be overwritten.")
-            df.to_parquet(output_path, engine='pyarrow', index=False)
-            logging.info(f"Converted {name} to Parquet at {output_path.split(os.sep)[-2]}")
-
-    @staticmethod
-    def save_to_csv(non_compliant_df:pd.DataFrame, key: str, intermediate_path:str=path.get_intermediate_path()):
-        '''
-        Save non-compliant DataFrame to a CSV file at the specified path.
-
-        Args:
-            non_compliant_df (pd.DataFrame): DataFrame containing non-compliant data.
-            key (str): Name or identifier for the DataFrame.
-            intermediate_path (str, optional): Path to store the CSV file. Defaults to path.get_intermediate_path().
-
-        Returns:
-            None
-        '''
-        os.makedirs(intermediate_path, exist_ok=True)
-        
-        file_path = os.path.join(intermediate_path, f'{key}_non_compliant.csv')
-        
-        if os.path.exists(file_path):
-            existing_df = pd.read_csv(file_path)
-            updated_df = pd.concat([existing_df, non_compliant_df]).drop_duplicates().reset_index(drop=True)
-        else:
-           updated_df = non_compliant_df
-
-        updated_df.to_csv(file_path, index=False)
-
-
-class multiple_DataConvert(DataConvert):
-    @staticmethod
-    def multiple_to_parquet(data_frames: dict, output_dir: str=None):
-        '''
-        Convert multiple DataFrames to Parquet format and log the conversion process.
-
-        Args:
-            data_frames (dict): Dictionary where keys are names and values are DataFrames to convert.
-            output_dir (str, optional): Directory path to save the Parquet files. Defaults to None.
-
-        Returns:
-            None
-        '''
-        if not os.path.exists(output_dir):
-            os.makedirs(output_dir)
-        
-        for name, df in data_frames.items():
-            output_path = os.path.join(output_dir, f"{name}.parquet")
-            if os.path.exists(output_path):
-                logging.info(f"File {output_path} already exists and will be overwritten.")
-            df.to_parquet(output_path, engine='pyarrow', index=False)
-            logging.info(f"Converted {name} to Parquet at {output_path.split(os.sep)[-2]}")
\ No newline at end of file
+import os
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pyarrow.dataset as ds
+import shutil
+from paths import path
+from config import Config
+from data_layouts import DataLayouts
+from instrumentation import Instrumentation
+import string
+import logging
+
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+                    handlers=[
+                        logging.FileHandler(os.path.join(path.get_logs_path(), "data_conversions.log")),
+                        logging.StreamHandler()
+                    ]
+                    )
+
+class DataConvert:
+    @staticmethod
+    def to_parquet(data_frame: dict, output_dir=None, partitioned: bool = None, profile: str = None,
+                   layout_name: str = None):
+        '''
+        Convert DataFrames to Parquet format and log the conversion process.
+
+        The rows are sorted, split in row groups and encoded with the profile declared in
+        DataLayouts. In the partitioned layout a dataset with partition columns is written as a hive partitioned
+        directory {output_dir}/{name}/ instead of the single file {output_dir}/{name}.parquet.
+
+        Args:
+            data_frame (dict): Dictionary where keys are names and values are DataFrames
+                (or Arrow tables) to convert.
+            output_dir (str, optional): Directory path to save the Parquet files. Defaults to None.
+            partitioned (bool, optional): Use the partitioned layout.
+                Defaults to Config.get_output_layout() == "partitioned".
+            profile (str, optional): Encoding profile of DataLayouts.PROFILES used for every
+                dataset. Defaults to Config.get_parquet_profile(), None uses the profile of
+                each dataset.
+            layout_name (str, optional): Dataset whose layout is used for every DataFrame, for
+                files named other than their dataset such as the delta part files. Defaults to
+                None, which uses the layout of each name.
+
+        Returns:
+            None
+
+        '''
+        os.makedirs(output_dir, exist_ok=True)
+        if partitioned is None:
+            partitioned = Config.get_output_layout() == "partitioned"
+        if profile is None:
+            profile = Config.get_parquet_profile()
+
+        for name, df in data_frame.items():
+            with Instrumentation.stage("write_parquet", dataset=name, rows_in=len(df)) as record:
+                layout = DataLayouts.get_layout(layout_name or name)
+                table = df if isinstance(df, pa.Table) else pa.Table.from_pandas(df, preserve_index=False)
+                table = DataLayouts.sort_table(table, layout["sort_by"])
+                record["rows_out"] = table.num_rows
+                if partitioned and layout["partition_by"]:
+                    DataConvert.to_partitioned_parquet(table, name, output_dir, layout, profile)
+                    continue
+
+                output_path = os.path.join(output_dir, f"{name}.parquet")
+                if os.path.exists(output_path):
+                    logging.info(f"File {output_path.split(os.sep)[-2]} already exists and will be overwritten.")
+                pq.write_table(table, output_path, row_group_size=layout["row_group_size"],
+                               **DataLayouts.get_write_options(layout_name or name, table, profile))
+                DataConvert.remove_output(name, output_dir, partitioned=True)
+                logging.info(f"Converted {name} to Parquet at {output_path.split(os.sep)[-2]}")
+
+    @staticmethod
+    def to_partitioned_parquet(table: pa.Table, name: str, output_dir: str, layout: dict, profile: str = None):
+        '''
+        Write a table as a hive partitioned directory, for example {name}/month=2020-03/part-0.parquet.
+
+        The directory is written under a temporary name and swapped in once complete, so
+        readers never see a partially written dataset.
+
+        Args:
+            table (pa.Table): The sorted table of the dataset.
+            name (str): Name of the dataset.
+            output_dir (str): Directory path to save the dataset directory.
+            layout (dict): The layout of the dataset from DataLayouts.
+            profile (str, optional): Encoding profile to use instead of the one of the dataset.
+        '''
+        # the partition columns only exist in the directory names, not in the files
+        file_table = table.drop_columns([column for column in layout["partition_by"] if column in table.column_names])
+        write_options = ds.ParquetFileFormat().make_write_options(
+            **DataLayouts.get_write_options(name, file_table, profile)
+        )
+        dataset_dir = os.path.join(output_dir, name)
+        temp_dir = os.path.join(output_dir, f"_{name}.tmp")
+        shutil.rmtree(temp_dir, ignore_errors=True)
+        ds.write_dataset(
+            DataLayouts.add_partition_columns(table, name),
+            temp_dir,
+            format="parquet",
+            partitioning=layout["partition_by"],
+            partitioning_flavor="hive",
+            basename_template="part-{i}.parquet",
+            file_options=write_options,
+            max_rows_per_group=layout["row_group_size"],
+            min_rows_per_group=0,
+            existing_data_behavior="overwrite_or_ignore",
+        )
+        if os.path.exists(dataset_dir):
+            logging.info(f"Directory {name} already exists and will be overwritten.")
+            shutil.rmtree(dataset_dir)
+        os.replace(temp_dir, dataset_dir)
+        DataConvert.remove_output(name, output_dir, partitioned=False)
+        logging.info(f"Converted {name} to Parquet partitioned by {', '.join(layout['partition_by'])} at {dataset_dir}")
+
+    @staticmethod
+    def remove_output(name: str, output_dir: str, partitioned: bool):
+        '''
+        Remove the output of a dataset in one layout, once it was written in the other one.
+
+        Args:
+            name (str): Name of the dataset.
+            output_dir (str): Directory path of the Parquet files.
+            partitioned (bool): Remove the partitioned directory (True) or the single file (False).
+        '''
+        if partitioned:
+            dataset_dir = os.path.join(output_dir, name)
+            if os.path.isdir(dataset_dir):
+                shutil.rmtree(dataset_dir)
+                logging.info(f"Removed the partitioned output of {name}")
+        else:
+            output_path = os.path.join(output_dir, f"{name}.parquet")
+            if os.path.exists(output_path):
+                os.remove(output_path)
+                logging.info(f"Removed the single file output of {name}")
+
+    @staticmethod
+    def to_parquet_in_batches(batches, name: str, output_dir: str):
+        '''
+        Append DataFrame batches to a single Parquet file.
+
+        The file is written under a temporary name and moved in place once all the batches
+        are written, so readers never see a partially written file.
+
+        The row group size and encoding of the layout in DataLayouts are applied, but as only
+        one batch is held in memory, every batch is sorted by sort_by on its own (so each row
+        group is sorted, not the whole file) and partition_by is not applied: a streamed
+        dataset is always written as a single file, whatever the output layout.
+
+        Args:
+            batches (iterable): DataFrames with the same columns.
+            name (str): Name of the Parquet file.
+            output_dir (str): Directory path to save the Parquet file.
+
+        Returns:
+            int: Number of rows written.
+        '''
+        os.makedirs(output_dir, exist_ok=True)
+        output_path = os.path.join(output_dir, f"{name}.parquet")
+        temp_path = f"{output_path}.tmp"
+        layout = DataLayouts.get_layout(name)
+        writer = None
+        rows = 0
+        try:
+            for df in batches:
+                if writer is None:
+                    table = pa.Table.from_pandas(df, preserve_index=False)
+                    writer = pq.ParquetWriter(temp_path, table.schema,
+                                              **DataLayouts.get_write_options(name, table, Config.get_parquet_profile()))
+                else:
+                    table = pa.Table.from_pandas(df, schema=writer.schema, preserve_index=False)
+                table = DataLayouts.sort_table(table, layout["sort_by"])
+                writer.write_table(table, row_group_size=layout["row_group_size"])
+                rows += table.num_rows
+        except Exception:
+            if writer is not None:
+                writer.close()
+                writer = None
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        finally:
+            if writer is not None:
+                writer.close()
+
+        if writer is None:
+            logging.info(f"No rows to convert for {name}")
+            return rows
+        if os.path.exists(output_path):
+            logging.info(f"File {output_path.split(os.sep)[-2]} already exists and will be overwritten.")
+        os.replace(temp_path, output_path)
+        DataConvert.remove_output(name, output_dir, partitioned=True)
+        logging.info(f"Converted {rows} rows of {name} to Parquet at {output_path.split(os.sep)[-2]}")
+        return rows
+
+    @staticmethod
+    def save_non_compliant(non_compliant_df: pd.DataFrame, key: str, intermediate_path: str = path.get_intermediate_path()):
+        '''
+        Append non-compliant rows to the quarantine of the dataset.
+
+        Unlike save_to_csv the existing rows are not read back, rows which were already
+        quarantined are skipped by their row hash.
+
+        Args:
+            non_compliant_df (pd.DataFrame): DataFrame containing non-compliant data.
+            key (str): Name or identifier for the DataFrame.
+            intermediate_path (str, optional): Path of the quarantine. Defaults to path.get_intermediate_path().
+
+        Returns:
+            int: Number of new non-compliant rows.
+        '''
+        from data_quarantine import Quarantine
+        return Quarantine.append(non_compliant_df, key, intermediate_path)
+
+    @staticmethod
+    def save_to_csv(non_compliant_df:pd.DataFrame, key: str, intermediate_path:str=path.get_intermediate_path()):
+        '''
+        Save non-compliant DataFrame to a CSV file at the specified path.
+
+        Args:
+            non_compliant_df (pd.DataFrame): DataFrame containing non-compliant data.
+            key (str): Name or identifier for the DataFrame.
+            intermediate_path (str, optional): Path to store the CSV file. Defaults to path.get_intermediate_path().
+
+        Returns:
+            None
+        '''
+        os.makedirs(intermediate_path, exist_ok=True)
+        
+        file_path = os.path.join(intermediate_path, f'{key}_non_compliant.csv')
+        
+        if os.path.exists(file_path):
+            existing_df = pd.read_csv(file_path)
+            updated_df = pd.concat([existing_df, non_compliant_df]).drop_duplicates().reset_index(drop=True)
+        else:
+           updated_df = non_compliant_df
+
+        updated_df.to_csv(file_path, index=False)
+
+
+class multiple_DataConvert(DataConvert):
+    @staticmethod
+    def multiple_to_parquet(data_frames: dict, output_dir: str=None):
+        '''
+        Convert multiple DataFrames to Parquet format and log the conversion process.
+
+        Args:
+            data_frames (dict): Dictionary where keys are names and values are DataFrames to convert.
+            output_dir (str, optional): Directory path to save the Parquet files. Defaults to None.
+
+        Returns:
+            None
+        '''
+        DataConvert.to_parquet(data_frames, output_dir)
\ No newline at end of file
@@ -0,0 +1,357 @@
+import os
+import json
+import logging
+from datetime import datetime
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+from data_rules import DataRules
+from data_schemas import DataSchemas
+from data_layouts import DataLayouts
+
+
+class Expectations:
+    """Native runner of the expectations the pipeline uses, with Great Expectations compatible results.
+
+    The expectations are written as Great Expectations expectation configurations
+    ({"expectation_type": ..., "kwargs": {...}}) and the result is a validation result
+    document in the Great Expectations format, so existing reports and data docs keep
+    working. The column expectations are evaluated with Arrow compute batch by batch, the
+    uniqueness expectations with a single Arrow group by over the whole table, so a run
+    neither converts the frame to a Great Expectations dataset nor loops over the rows in Python.
+
+    Supported expectation types:
+        expect_column_values_to_be_in_type_list (column, type_list)
+        expect_column_values_to_be_between (column, min_value, max_value)
+        expect_column_values_to_not_be_null (column)
+        expect_column_values_to_be_unique (column)
+        expect_compound_columns_to_be_unique (column_list)
+
+    Great Expectations itself is an optional dependency, only imported by validate_with_ge.
+    """
+
+    PARTIAL_UNEXPECTED_COUNT = 20
+    BATCH_SIZE = 64 * 1024
+
+    # type names of the type_list mapped to the Arrow type checks which match them
+    TYPE_NAMES = {
+        "int": pa.types.is_integer,
+        "int64": pa.types.is_int64,
+        "float": pa.types.is_floating,
+        "float64": pa.types.is_float64,
+        "str": lambda arrow_type: pa.types.is_string(arrow_type) or pa.types.is_large_string(arrow_type),
+        "bool": pa.types.is_boolean,
+        "datetime": pa.types.is_timestamp,
+        "datetime64": pa.types.is_timestamp,
+    }
+
+    @staticmethod
+    def expectation(expectation_type: str, **kwargs):
+        ''' an expectation configuration in the Great Expectations format '''
+        return {"expectation_type": expectation_type, "kwargs": kwargs, "meta": {}}
+
+    @staticmethod
+    def get_suite(name: str):
+        """
+        Get the expectations of the input csv of a dataset from DataSchemas and DataRules.
+
+        The column names are the names in the csv file. Every typed column is expected in
+        its type, the unique columns and the date column to have no null values, the
+        non_negative columns to be at least 0 and the between columns in their range.
+
+        Args:
+            name (str): Name of the dataset.
+
+        Returns:
+            list: The expectation configurations, empty for a dataset without schema and rules.
+        """
+        schema = DataSchemas.get_schemas().get(name, {"dtype": {}, "categories": [], "dates": []})
+        rules = DataRules.get_rules().get(name)
+        suite = []
+        type_lists = {"int64": ["int", "int64"], "float64": ["float", "float64", "int", "int64"]}
+        for column, dtype in schema["dtype"].items():
+            suite.append(Expectations.expectation("expect_column_values_to_be_in_type_list", column=column, type_list=type_lists.get(dtype, [dtype])))
+        for column in schema["categories"]:
+            suite.append(Expectations.expectation("expect_column_values_to_be_in_type_list", column=column, type_list=["str"]))
+        for column in schema["dates"]:
+            suite.append(Expectations.expectation("expect_column_values_to_be_in_type_list", column=column, type_list=["datetime"]))
+        if rules is None:
+            return suite
+
+        raw_names = {new_name: column for column, new_name in rules["rename"].items()}
+        raw = lambda column: raw_names.get(column, column)
+        keys = [raw(column) for column in rules["unique"]]
+        filled = {raw(column) for column in rules["fill_null"]}
+        not_null = keys + ([raw(rules["date_column"])] if rules["date_column"] else [])
+        for column in dict.fromkeys(column for column in not_null if column not in filled):
+            suite.append(Expectations.expectation("expect_column_values_to_not_be_null", column=column))
+        for column in rules["non_negative"]:
+            if column not in rules["between"]:
+                suite.append(Expectations.expectation("expect_column_values_to_be_between", column=raw(column), min_value=0, max_value=None))
+        for column, (min_value, max_value) in rules["between"].items():
+            suite.append(Expectations.expectation("expect_column_values_to_be_between", column=raw(column), min_value=min_value, max_value=max_value))
+        if len(keys) == 1:
+            suite.append(Expectations.expectation("expect_column_values_to_be_unique", column=keys[0]))
+        elif keys:
+            suite.append(Expectations.expectation("expect_compound_columns_to_be_unique", column_list=keys))
+        return suite
+
+    @staticmethod
+    def to_arrow(data):
+        """
+        Convert a DataFrame to an Arrow table column by column.
+
+        A column whose values cannot be converted to a single Arrow type (such as an object
+        column mixing numbers and text) is kept as a null column of the type "mixed" in the
+        returned dict, so its type expectation fails instead of the whole conversion.
+
+        Args:
+            data (pd.DataFrame | pa.Table): The data.
+
+        Returns:
+            tuple: The Arrow table and a dict of the columns which could not be converted.
+        """
+        if isinstance(data, pa.Table):
+            return data, {}
+        columns, mixed = {}, {}
+        for column in data.columns:
+            try:
+                columns[str(column)] = pa.array(data[column], from_pandas=True)
+            except (pa.ArrowInvalid, pa.ArrowTypeError):
+                mixed[str(column)] = data[column].map(lambda value: type(value).__name__).unique().tolist()
+                columns[str(column)] = pa.nulls(len(data))
+        return pa.table(columns) if columns else pa.table({}), mixed
+
+    @staticmethod
+    def get_type_name(arrow_type: pa.DataType):
+        ''' the name of an Arrow type as reported in observed_value, dictionary columns by their values '''
+        if pa.types.is_dictionary(arrow_type):
+            arrow_type = arrow_type.value_type
+        return str(arrow_type)
+
+    @staticmethod
+    def is_numeric(arrow_type: pa.DataType):
+        return pa.types.is_integer(arrow_type) or pa.types.is_floating(arrow_type)
+
+    @staticmethod
+    def new_result(element_count: int = 0):
+        return {"element_count": element_count, "missing_count": 0, "unexpected_count": 0, "partial_unexpected_list": []}
+
+    @staticmethod
+    def add_unexpected(result: dict, values):
+        ''' count the unexpected values and keep the first ones as examples '''
+        result["unexpected_count"] += len(values)
+        room = Expectations.PARTIAL_UNEXPECTED_COUNT - len(result["partial_unexpected_list"])
+        if room > 0:
+            result["partial_unexpected_list"].extend(values.slice(0, room).to_pylist())
+
+    @staticmethod
+    def evaluate_batch(batch: pa.RecordBatch, expectation: dict, result: dict):
+        """
+        Add the counts of a batch of rows to the result of a column expectation.
+
+        Args:
+            batch (pa.RecordBatch): The rows.
+            expectation (dict): A not_null or between expectation configuration.
+            result (dict): The result so far, updated in place.
+        """
+        kwargs = expectation["kwargs"]
+        column = DataLayouts.decode(batch.column(kwargs["column"]))
+        nulls = column.null_count
+        result["element_count"] += len(column)
+        if expectation["expectation_type"] == "expect_column_values_to_not_be_null":
+            result["unexpected_count"] += nulls
+            return
+
+        result["missing_count"] += nulls
+        outside = None
+        if kwargs.get("min_value") is not None:
+            outside = pc.less(column, kwargs["min_value"])
+        if kwargs.get("max_value") is not None:
+            above = pc.greater(column, kwargs["max_value"])
+            outside = above if outside is None else pc.or_(outside, above)
+        if outside is not None:
+            Expectations.add_unexpected(result, column.filter(pc.fill_null(outside, False)))
+
+    @staticmethod
+    def evaluate_unique(table: pa.Table, columns: list):
+        """
+        Get the result of a uniqueness expectation over the whole table.
+
+        Every row whose key occurs more than once is unexpected, rows where every key column
+        is null are ignored, as in Great Expectations.
+
+        Args:
+            table (pa.Table): The data.
+            columns (list): The key columns.
+
+        Returns:
+            dict: The result.
+        """
+        keys = pa.table({column: DataLayouts.decode(table[column]) for column in columns})
+        all_null = pc.is_null(keys[columns[0]])
+        for column in columns[1:]:
+            all_null = pc.and_(all_null, pc.is_null(keys[column]))
+        result = Expectations.new_result(table.num_rows)
+        result["missing_count"] = pc.sum(all_null).as_py() or 0
+        keys = keys.filter(pc.invert(all_null))
+        counts = keys.group_by(columns).aggregate([([], "count_all")])
+        duplicates = counts.filter(pc.greater(counts["count_all"], 1))
+        result["unexpected_count"] = pc.sum(duplicates["count_all"]).as_py() or 0
+        examples = duplicates.slice(0, Expectations.PARTIAL_UNEXPECTED_COUNT)
+        result["partial_unexpected_list"] = (
+            examples[columns[0]].to_pylist() if len(columns) == 1
+            else [{column: row[column] for column in columns} for row in examples.to_pylist()]
+        )
+        return result
+
+    @staticmethod
+    def finish_result(result: dict):
+        ''' add the percentages of the counts as Great Expectations does '''
+        element_count, missing_count = result["element_count"], result["missing_count"]
+        nonmissing = element_count - missing_count
+        result["missing_percent"] = 100 * missing_count / element_count if element_count else None
+        result["unexpected_percent"] = 100 * result["unexpected_count"] / nonmissing if nonmissing else None
+        result["unexpected_percent_total"] = 100 * result["unexpected_count"] / element_count if element_count else None
+        result["unexpected_percent_nonmissing"] = result["unexpected_percent"]
+        return result
+
+    @staticmethod
+    def run(data, expectations: list, suite_name: str = "default", batch_size: int = None):
+        """
+        Evaluate expectations on a DataFrame or an Arrow table.
+
+        Args:
+            data (pd.DataFrame | pa.Table): The data.
+            expectations (list): Expectation configurations, see Expectations.expectation.
+            suite_name (str, optional): Name of the suite in the result meta.
+            batch_size (int, optional): Rows in each batch of the column expectations.
+                Defaults to BATCH_SIZE.
+
+        Returns:
+            dict: The validation result in the Great Expectations format, with success,
+                results, statistics and meta.
+        """
+        table, mixed = Expectations.to_arrow(data)
+        results = [None] * len(expectations)
+        batched = []
+        for position, expectation in enumerate(expectations):
+            expectation_type, kwargs = expectation["expectation_type"], expectation["kwargs"]
+            columns = kwargs.get("column_list") or [kwargs.get("column")]
+            missing_columns = [column for column in columns if column not in table.column_names]
+            if missing_columns:
+                results[position] = {"exception": f"Columns {missing_columns} do not exist"}
+            elif expectation_type == "expect_column_values_to_be_in_type_list":
+                column = kwargs["column"]
+                arrow_type = table.schema.field(column).type
+                if pa.types.is_dictionary(arrow_type):
+                    arrow_type = arrow_type.value_type
+                observed = f"mixed({', '.join(mixed[column])})" if column in mixed else Expectations.get_type_name(arrow_type)
+                # a column without any value has no type to check, as an empty column in Great Expectations
+                matches = column not in mixed and (
+                    pa.types.is_null(arrow_type) or table[column].null_count == table.num_rows
+                    or any(Expectations.TYPE_NAMES.get(type_name, lambda _: False)(arrow_type) for type_name in kwargs["type_list"])
+                )
+                results[position] = {"success": matches, "result": {"observed_value": observed}}
+            elif expectation_type in ("expect_column_values_to_be_unique", "expect_compound_columns_to_be_unique"):
+                results[position] = {"result": Expectations.evaluate_unique(table, columns)}
+            elif (expectation_type == "expect_column_values_to_be_between"
+                  and not Expectations.is_numeric(table.schema.field(kwargs["column"]).type)):
+                results[position] = {"exception": f"Column {kwargs['column']} is not numeric"}
+            elif expectation_type in ("expect_column_values_to_not_be_null", "expect_column_values_to_be_between"):
+                results[position] = {"result": Expectations.new_result()}
+                batched.append(position)
+            else:
+                results[position] = {"exception": f"Unsupported expectation type {expectation_type}"}
+
+        # every batch is read once for all the column expectations
+        for batch in table.to_batches(max_chunksize=batch_size or Expectations.BATCH_SIZE):
+            for position in batched:
+                Expectations.evaluate_batch(batch, expectations[position], results[position]["result"])
+
+        documents = []
+        for expectation, outcome in zip(expectations, results):
+            exception = outcome.get("exception")
+            result = outcome.get("result", {})
+            if "element_count" in result:
+                Expectations.finish_result(result)
+                success = result["unexpected_count"] == 0
+            else:
+                success = outcome.get("success", False) and exception is None
+            documents.append({
+                "success": success,
+                "expectation_config": expectation,
+                "result": result,
+                "meta": {},
+                "exception_info": {
+                    "raised_exception": exception is not None,
+                    "exception_message": exception,
+                    "exception_traceback": None,
+                },
+            })
+
+        successful = sum(document["success"] for document in documents)
+        return {
+            "success": successful == len(documents),
+            "results": documents,
+            "statistics": {
+                "evaluated_expectations": len(documents),
+                "successful_expectations": successful,
+                "unsuccessful_expectations": len(documents) - successful,
+                "success_percent": 100 * successful / len(documents) if documents else None,
+            },
+            "evaluation_parameters": {},
+            "meta": {
+                "expectation_suite_name": suite_name,
+                "validation_time": datetime.now().strftime("%Y%m%dT%H%M%S.%fZ"),
+                "great_expectations_version": None,
+                "engine": "arrow",
+            },
+        }
+
+    @staticmethod
+    def validate(data, name: str, output_dir: str = None):
+        """
+        Evaluate the suite of a dataset and optionally save the result document.
+
+        Args:
+            data (pd.DataFrame | pa.Table): The input data of the dataset, with the csv column names.
+            name (str): Name of the dataset.
+            output_dir (str, optional): Folder where the result is saved as {name}.json.
+
+        Returns:
+            dict: The validation result.
+        """
+        result = Expectations.run(data, Expectations.get_suite(name), suite_name=name)
+        for document in result["results"]:
+            if not document["success"]:
+                config = document["expectation_config"]
+                logging.info(f"{name}: {config['expectation_type']} {config['kwargs']} failed: "
+                             f"{document['exception_info']['exception_message'] or document['result']}")
+        if output_dir:
+            os.makedirs(output_dir, exist_ok=True)
+            with open(os.path.join(output_dir, f"{name}.json"), "w") as f:
+                json.dump(result, f, indent=2, default=str)
+        return result
+
+    @staticmethod
+    def validate_with_ge(data_frame: pd.DataFrame, expectations: list, suite_name: str = "default"):
+        """
+        Evaluate the same expectations with Great Expectations, for its reports and data docs.
+
+        Needs the optional great_expectations package (pip install great_expectations).
+
+        Args:
+            data_frame (pd.DataFrame): The data.
+            expectations (list): Expectation configurations.
+            suite_name (str, optional): Name of the suite.
+
+        Returns:
+            The Great Expectations validation result.
+        """
+        import great_expectations as ge
+
+        return ge.from_pandas(data_frame).validate(
+            expectation_suite={"expectation_suite_name": suite_name, "expectations": expectations},
+            result_format="SUMMARY",
+        )
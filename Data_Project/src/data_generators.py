@@ -0,0 +1,339 @@
+import os
+import numpy as np
+import pyarrow as pa
+import pyarrow.csv as pv
+from datetime import date, timedelta
+
+
+class DataGenerators:
+    """Synthetic input csv files of every dataset, keyed by the names in FileName.get_files_name().
+
+    The files have the columns of the Kaggle files, with the types of DataSchemas and values
+    which pass the rules of DataRules, so the whole pipeline can be run and timed on them.
+    The number of rows is BASE_ROWS (the size of the Kaggle file) times a scale factor.
+
+    The time series datasets are grids of locations x DAYS dates, in date order like the
+    Kaggle files; they grow by adding locations, except day_wise which has a single location
+    and grows by adding dates. The counts of a location are a deterministic function of the
+    date, so the rows can be generated in chunks and the same seed gives the same files.
+    """
+
+    BASE_ROWS = {
+        "country_wise": 187,
+        "covid_19_clean": 35156,
+        "day_wise": 188,
+        "full_grouped": 35156,
+        "usa_county_wise": 627920,
+        "worldometer": 209,
+    }
+
+    FILE_NAMES = {
+        "country_wise": "country_wise_latest.csv",
+        "covid_19_clean": "covid_19_clean_complete.csv",
+        "day_wise": "day_wise.csv",
+        "full_grouped": "full_grouped.csv",
+        "usa_county_wise": "usa_county_wise.csv",
+        "worldometer": "worldometer_data.csv",
+    }
+
+    START_DATE = date(2020, 1, 22)
+    DAYS = 188
+    CHUNK_ROWS = 1_000_000
+    WHO_REGIONS = ["Africa", "Americas", "Eastern Mediterranean", "Europe", "South-East Asia", "Western Pacific"]
+    CONTINENTS = ["Africa", "Asia", "Australia/Oceania", "Europe", "North America", "South America"]
+
+    @staticmethod
+    def get_generators():
+        """
+        Get the generator of every dataset.
+
+        Returns:
+            dict: Dataset names mapped to a function(rows, rng) which yields the rows as
+                Arrow tables of at most CHUNK_ROWS rows.
+        """
+        return {
+            "country_wise": DataGenerators.country_wise,
+            "covid_19_clean": DataGenerators.covid_19_clean,
+            "day_wise": DataGenerators.day_wise,
+            "full_grouped": DataGenerators.full_grouped,
+            "usa_county_wise": DataGenerators.usa_county_wise,
+            "worldometer": DataGenerators.worldometer,
+        }
+
+    @staticmethod
+    def get_dates(days: int, date_format: str = "%Y-%m-%d"):
+        ''' the dates of the time series from START_DATE as strings '''
+        return pa.array([(DataGenerators.START_DATE + timedelta(days=day)).strftime(date_format) for day in range(days)])
+
+    @staticmethod
+    def get_names(prefix: str, count: int):
+        ''' numbered names such as "Country 000001" '''
+        return pa.array([f"{prefix} {index:06d}" for index in range(count)])
+
+    @staticmethod
+    def iter_grid(rows: int, days: int):
+        """
+        Split the rows of a locations x dates grid in chunks, in date order.
+
+        Args:
+            rows (int): Number of rows, the last date is cut short when it is not a multiple of days.
+            days (int): Number of dates.
+
+        Yields:
+            tuple: The location and the day index arrays of the next chunk of rows.
+        """
+        locations = max(-(-rows // days), 1)
+        for start in range(0, rows, DataGenerators.CHUNK_ROWS):
+            index = np.arange(start, min(start + DataGenerators.CHUNK_ROWS, rows))
+            yield index % locations, index // locations
+
+    @staticmethod
+    def get_counts(weight: np.ndarray, death_rate: np.ndarray, recovery_rate: np.ndarray, day: np.ndarray):
+        """
+        Get the cumulative counts of locations on given days.
+
+        The confirmed cases grow with the square of the day, a share of them die and a growing
+        share recovers, so every count is non-negative and active = confirmed - deaths - recovered.
+
+        Args:
+            weight (np.ndarray): Size of the outbreak of each row's location.
+            death_rate (np.ndarray): Share of the confirmed cases which die.
+            recovery_rate (np.ndarray): Share of the confirmed cases which finally recover.
+            day (np.ndarray): Day index of each row, a negative day has no cases.
+
+        Returns:
+            dict: The confirmed, deaths, recovered and active arrays.
+        """
+        day = np.maximum(day, 0)
+        confirmed = np.floor(weight * day * day).astype(np.int64)
+        deaths = np.floor(confirmed * death_rate).astype(np.int64)
+        recovered = np.floor(confirmed * recovery_rate * np.minimum(day / 120, 1)).astype(np.int64)
+        return {
+            "confirmed": confirmed,
+            "deaths": deaths,
+            "recovered": recovered,
+            "active": confirmed - deaths - recovered,
+        }
+
+    @staticmethod
+    def get_location_rates(rng: np.random.Generator, locations: int):
+        ''' outbreak size, death rate and recovery rate of every location '''
+        return (
+            rng.lognormal(0.0, 1.5, locations),
+            rng.uniform(0.005, 0.08, locations),
+            rng.uniform(0.4, 0.9, locations),
+        )
+
+    @staticmethod
+    def get_ratios(numerator: np.ndarray, denominator: np.ndarray):
+        ''' 100 * numerator / denominator rounded to 2 decimals, 0 where the denominator is 0 '''
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.round(np.where(denominator > 0, 100 * numerator / np.maximum(denominator, 1), 0.0), 2)
+
+    @staticmethod
+    def country_wise(rows: int, rng: np.random.Generator):
+        weight, death_rate, recovery_rate = DataGenerators.get_location_rates(rng, rows)
+        today = DataGenerators.get_counts(weight, death_rate, recovery_rate, np.full(rows, DataGenerators.DAYS - 1))
+        yesterday = DataGenerators.get_counts(weight, death_rate, recovery_rate, np.full(rows, DataGenerators.DAYS - 2))
+        last_week = DataGenerators.get_counts(weight, death_rate, recovery_rate, np.full(rows, DataGenerators.DAYS - 8))
+        week_change = today["confirmed"] - last_week["confirmed"]
+        yield pa.table({
+            "Country/Region": DataGenerators.get_names("Country", rows),
+            "Confirmed": today["confirmed"],
+            "Deaths": today["deaths"],
+            "Recovered": today["recovered"],
+            "Active": today["active"],
+            "New cases": today["confirmed"] - yesterday["confirmed"],
+            "New deaths": today["deaths"] - yesterday["deaths"],
+            "New recovered": today["recovered"] - yesterday["recovered"],
+            "Deaths / 100 Cases": DataGenerators.get_ratios(today["deaths"], today["confirmed"]),
+            "Recovered / 100 Cases": DataGenerators.get_ratios(today["recovered"], today["confirmed"]),
+            "Deaths / 100 Recovered": DataGenerators.get_ratios(today["deaths"], today["recovered"]),
+            "Confirmed last week": last_week["confirmed"],
+            "1 week change": week_change,
+            "1 week % increase": DataGenerators.get_ratios(week_change, last_week["confirmed"]),
+            "WHO Region": pa.array(DataGenerators.WHO_REGIONS).take(np.arange(rows) % len(DataGenerators.WHO_REGIONS)),
+        })
+
+    @staticmethod
+    def covid_19_clean(rows: int, rng: np.random.Generator):
+        locations = max(-(-rows // DataGenerators.DAYS), 1)
+        weight, death_rate, recovery_rate = DataGenerators.get_location_rates(rng, locations)
+        lat, long = rng.uniform(-60, 70, locations), rng.uniform(-180, 180, locations)
+        # most locations are whole countries without a province, as in the Kaggle file
+        provinces = pa.array([f"Province {index:06d}" if index % 5 == 0 else None for index in range(locations)])
+        countries = DataGenerators.get_names("Country", locations)
+        dates = DataGenerators.get_dates(DataGenerators.DAYS)
+        for location, day in DataGenerators.iter_grid(rows, DataGenerators.DAYS):
+            counts = DataGenerators.get_counts(weight[location], death_rate[location], recovery_rate[location], day)
+            yield pa.table({
+                "Province/State": provinces.take(location),
+                "Country/Region": countries.take(location),
+                "Lat": lat[location],
+                "Long": long[location],
+                "Date": dates.take(day),
+                "Confirmed": counts["confirmed"],
+                "Deaths": counts["deaths"],
+                "Recovered": counts["recovered"],
+                "Active": counts["active"],
+                "WHO Region": pa.array(DataGenerators.WHO_REGIONS).take(location % len(DataGenerators.WHO_REGIONS)),
+            })
+
+    @staticmethod
+    def day_wise(rows: int, rng: np.random.Generator):
+        day = np.arange(rows)
+        weight, death_rate, recovery_rate = np.full(rows, 500.0), np.full(rows, 0.04), np.full(rows, 0.7)
+        today = DataGenerators.get_counts(weight, death_rate, recovery_rate, day + 1)
+        yesterday = DataGenerators.get_counts(weight, death_rate, recovery_rate, day)
+        yield pa.table({
+            "Date": DataGenerators.get_dates(rows),
+            "Confirmed": today["confirmed"],
+            "Deaths": today["deaths"],
+            "Recovered": today["recovered"],
+            "Active": today["active"],
+            "New cases": today["confirmed"] - yesterday["confirmed"],
+            "New deaths": today["deaths"] - yesterday["deaths"],
+            "New recovered": today["recovered"] - yesterday["recovered"],
+            "Deaths / 100 Cases": DataGenerators.get_ratios(today["deaths"], today["confirmed"]),
+            "Recovered / 100 Cases": DataGenerators.get_ratios(today["recovered"], today["confirmed"]),
+            "Deaths / 100 Recovered": DataGenerators.get_ratios(today["deaths"], today["recovered"]),
+            "No. of countries": np.minimum(day // 2 + 6, 187),
+        })
+
+    @staticmethod
+    def full_grouped(rows: int, rng: np.random.Generator):
+        locations = max(-(-rows // DataGenerators.DAYS), 1)
+        weight, death_rate, recovery_rate = DataGenerators.get_location_rates(rng, locations)
+        countries = DataGenerators.get_names("Country", locations)
+        dates = DataGenerators.get_dates(DataGenerators.DAYS)
+        for location, day in DataGenerators.iter_grid(rows, DataGenerators.DAYS):
+            rates = weight[location], death_rate[location], recovery_rate[location]
+            today = DataGenerators.get_counts(*rates, day)
+            yesterday = DataGenerators.get_counts(*rates, day - 1)
+            yield pa.table({
+                "Date": dates.take(day),
+                "Country/Region": countries.take(location),
+                "Confirmed": today["confirmed"],
+                "Deaths": today["deaths"],
+                "Recovered": today["recovered"],
+                "Active": today["active"],
+                "New cases": today["confirmed"] - yesterday["confirmed"],
+                "New deaths": today["deaths"] - yesterday["deaths"],
+                "New recovered": today["recovered"] - yesterday["recovered"],
+                "WHO Region": pa.array(DataGenerators.WHO_REGIONS).take(location % len(DataGenerators.WHO_REGIONS)),
+            })
+
+    @staticmethod
+    def usa_county_wise(rows: int, rng: np.random.Generator):
+        locations = max(-(-rows // DataGenerators.DAYS), 1)
+        weight, death_rate, recovery_rate = DataGenerators.get_location_rates(rng, locations)
+        lat, long = rng.uniform(18, 65, locations), rng.uniform(-170, -65, locations)
+        states = [f"State {index % 58:02d}" for index in range(locations)]
+        counties = [f"County {index:06d}" for index in range(locations)]
+        admin2 = pa.array(counties)
+        province_state = pa.array(states)
+        combined_key = pa.array([f"{county}, {state}, US" for county, state in zip(counties, states)])
+        # a few locations have no FIPS code, as in the Kaggle file
+        fips = pa.array([None if index % 50 == 0 else float(1000 + index) for index in range(locations)], pa.float64())
+        dates = DataGenerators.get_dates(DataGenerators.DAYS, "%m/%d/%y")
+        for location, day in DataGenerators.iter_grid(rows, DataGenerators.DAYS):
+            counts = DataGenerators.get_counts(weight[location], death_rate[location], recovery_rate[location], day)
+            size = len(location)
+            yield pa.table({
+                "UID": 84000000 + location,
+                "iso2": pa.array(["US"]).take(np.zeros(size, dtype=np.int64)),
+                "iso3": pa.array(["USA"]).take(np.zeros(size, dtype=np.int64)),
+                "code3": np.full(size, 840),
+                "FIPS": fips.take(location),
+                "Admin2": admin2.take(location),
+                "Province_State": province_state.take(location),
+                "Country_Region": pa.array(["US"]).take(np.zeros(size, dtype=np.int64)),
+                "Lat": lat[location],
+                "Long_": long[location],
+                "Combined_Key": combined_key.take(location),
+                "Date": dates.take(day),
+                "Confirmed": counts["confirmed"],
+                "Deaths": counts["deaths"],
+            })
+
+    @staticmethod
+    def worldometer(rows: int, rng: np.random.Generator):
+        weight, death_rate, recovery_rate = DataGenerators.get_location_rates(rng, rows)
+        counts = DataGenerators.get_counts(weight, death_rate, recovery_rate, np.full(rows, DataGenerators.DAYS - 1))
+        population = np.floor(rng.lognormal(15, 2, rows)) + counts["confirmed"]
+        tests = np.floor(counts["confirmed"] * rng.uniform(5, 50, rows))
+        # the columns which are often empty in the Kaggle file have null values
+        missing = rng.random(rows) < 0.2
+
+        def with_nulls(values):
+            return pa.array(np.asarray(values, dtype=np.float64), mask=missing)
+
+        yield pa.table({
+            "Country/Region": DataGenerators.get_names("Country", rows),
+            "Continent": pa.array(DataGenerators.CONTINENTS).take(np.arange(rows) % len(DataGenerators.CONTINENTS)),
+            "Population": population,
+            "TotalCases": counts["confirmed"],
+            "NewCases": with_nulls(np.zeros(rows)),
+            "TotalDeaths": counts["deaths"].astype(np.float64),
+            "NewDeaths": with_nulls(np.zeros(rows)),
+            "TotalRecovered": counts["recovered"].astype(np.float64),
+            "NewRecovered": with_nulls(np.zeros(rows)),
+            "ActiveCases": counts["active"].astype(np.float64),
+            "Serious,Critical": with_nulls(np.floor(counts["active"] * 0.01)),
+            "Tot Cases/1M pop": np.round(counts["confirmed"] / population * 1e6),
+            "Deaths/1M pop": with_nulls(np.round(counts["deaths"] / population * 1e6)),
+            "TotalTests": with_nulls(tests),
+            "Tests/1M pop": with_nulls(np.round(tests / population * 1e6)),
+            "WHO Region": pa.array(DataGenerators.WHO_REGIONS).take(np.arange(rows) % len(DataGenerators.WHO_REGIONS)),
+        })
+
+    @staticmethod
+    def generate(name: str, output_dir: str, scale: int = 1, seed: int = 0):
+        """
+        Write the synthetic input csv file of a dataset.
+
+        Args:
+            name (str): Name of the dataset in BASE_ROWS.
+            output_dir (str): Folder of the csv file, which gets the file name of the Kaggle file.
+            scale (int, optional): Number of rows as a multiple of BASE_ROWS. Defaults to 1.
+            seed (int, optional): Seed of the random values. Defaults to 0.
+
+        Returns:
+            str: The path of the csv file.
+        """
+        os.makedirs(output_dir, exist_ok=True)
+        file_path = os.path.join(output_dir, DataGenerators.FILE_NAMES[name])
+        rows = int(DataGenerators.BASE_ROWS[name] * scale)
+        rng = np.random.default_rng(seed)
+        writer = None
+        temp_file = f"{file_path}.tmp"
+        try:
+            for table in DataGenerators.get_generators()[name](rows, rng):
+                if writer is None:
+                    writer = pv.CSVWriter(temp_file, table.schema)
+                writer.write_table(table)
+        finally:
+            if writer is not None:
+                writer.close()
+        os.replace(temp_file, file_path)
+        return file_path
+
+    @staticmethod
+    def generate_all(output_dir: str, scale: int = 1, names: list = None, seed: int = 0):
+        """
+        Write the synthetic input csv files of several datasets.
+
+        Args:
+            output_dir (str): Folder of the csv files.
+            scale (int, optional): Number of rows as a multiple of BASE_ROWS. Defaults to 1.
+            names (list, optional): Names of the datasets. Defaults to every dataset.
+            seed (int, optional): Seed of the random values. Defaults to 0.
+
+        Returns:
+            dict: Dictionary where keys are dataset names and values are file paths, like
+                FileName.get_files_name().
+        """
+        return {
+            name: DataGenerators.generate(name, output_dir, scale, seed)
+            for name in names or DataGenerators.BASE_ROWS
+        }
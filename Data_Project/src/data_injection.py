@@ -1,114 +1,453 @@
-import duckdb
-import logging
-import os
-import glob
-from paths import path
-import datetime
-import shutil
-
-logging.basicConfig(level=logging.INFO,
-                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-                    handlers=[
-                        logging.FileHandler(os.path.join(path.get_logs_path(), "data_injection.log")),
-                        logging.StreamHandler()
-                    ])
-
-class DataInjection:
-    """A class to handle data injection into a DuckDB database.
-
-    Attributes:
-        db_name (str): The name of the database.
-        db_folder (str): The folder where the database file is located.
-        db_file (str): The full path to the database file.
-        connection (duckdb.DuckDBPyConnection): The connection to the DuckDB database.
-    """
-    def __init__(self, db_name, db_folder):
-         
-         """Initializes the DataInjection class.
-
-        Args:
-            db_name (str): The name of the database.
-            db_folder (str): The folder where the database file is located.
-        """
-         self.db_name = db_name
-         self.db_folder = db_folder
-         self.db_file = os.path.join(db_folder, f'{db_name}.duckdb')
-         self.connection = None
-    
-    def create_database(self):
-
-        """"
-        Creates a database connection and backs up the existing database if it exists.
-
-        Raises:
-            Exception: If there is an error connecting to the database or backing it up.
-
-        """
-        try:
-            if os.path.exists(self.db_file):
-                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                backup_db_file = os.path.join(self.db_folder, f'{self.db_name}_{timestamp}.duckdb')
-                shutil.copyfile(self.db_file, backup_db_file)
-                logging.info(f"Existing database '{self.db_name}.duckdb' backed up as '{self.db_name}_{timestamp}.duckdb'.")
-                #os.remove(self.db_file)
-            
-            os.makedirs(self.db_folder, exist_ok=True)
-            self.connection = duckdb.connect(self.db_file)
-            logging.info(f"Connected to {self.db_file} successfully.")
-        
-        except Exception as e:
-            logging.error(f"Error connecting to database: {e}")
-            raise
-
-    def inject_data_from_parquet(self):
-        """
-        Injects data from Parquet files into the database.
-
-        This method reads all Parquet files from the output path and creates tables in the
-        database corresponding to each Parquet file.
-
-        Raises:
-            Exception: If there is an error injecting data from Parquet files.
-
-        """
-        parquet_folder = path.get_output_path()
-        
-        try:
-            parquet_files = glob.glob(os.path.join(parquet_folder, '*.parquet'))
-            
-            for file_path in parquet_files:
-                file_name = os.path.basename(file_path)
-                table_name = os.path.splitext(file_name)[0]
-                
-                self.connection.execute(f"DROP TABLE IF EXISTS {table_name}")
-                self.connection.execute(f"CREATE TABLE {table_name} AS SELECT * FROM read_parquet('{file_path}')")
-                logging.info(f"Table {table_name} created successfully from {file_path}.")
-            
-            tables = self.connection.execute("SHOW TABLES").fetchall()
-            logging.info(f"Tables in the database: {tables}")
-        
-        except Exception as e:
-            logging.error(f"Error injecting data from Parquet files: {e}")
-            raise
-        
-    def close_connection(self):
-        """
-        Closes the connection to the database.
-        Logs a message indicating that the database connection has been closed.
-        """
-        
-        if self.connection:
-            self.connection.close()
-            logging.info("Database connection closed.")
-
-# Example usage:
-if __name__ == "__main__":
-    try:
-        data_injector = DataInjection(db_name="covid_19_db",db_folder=path.get_db_files_path())
-        data_injector.create_database()
-        data_injector.inject_data_from_parquet()
-    except Exception as e:
-        logging.error(f"An error occurred during data injection: {e}")
-    finally:
-        if data_injector:
-            data_injector.close_connection()
+import duckdb
+import logging
+import os
+import json
+import glob
+from paths import path
+from data_layouts import DataLayouts
+from instrumentation import Instrumentation
+from datetime import datetime
+import shutil
+
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+                    handlers=[
+                        logging.FileHandler(os.path.join(path.get_logs_path(), "data_injection.log")),
+                        logging.StreamHandler()
+                    ])
+
+class DataInjection:
+    """A class to handle data injection into a DuckDB database.
+
+    Attributes:
+        db_name (str): The name of the database.
+        db_folder (str): The folder where the database file is located.
+        db_file (str): The full path to the database file.
+        connection (duckdb.DuckDBPyConnection): The connection to the DuckDB database.
+        threads (int): Number of DuckDB threads, None uses all cores.
+        memory_limit (str): DuckDB memory limit such as '4GB', None uses the DuckDB default.
+        changes (dict): Tables changed through this instance and not rolled up yet, mapped
+            to "reloaded" or "appended".
+
+    Every committed (re)load of tables bumps their version in {db_name}.versions.json next to
+    the database file and calls the functions of DataInjection.listeners, so readers such as
+    QueryService can drop what they cached from the old tables.
+    """
+
+    # functions called with (db_file, table_names) after tables were (re)loaded in this process
+    listeners = []
+    def __init__(self, db_name, db_folder=None, threads=None, memory_limit=None):
+         
+         """Initializes the DataInjection class.
+
+        Args:
+            db_name (str): The name of the database.
+            db_folder (str, optional): The folder where the database file is located.
+                Defaults to None, which uses path.get_db_files_path().
+            threads (int, optional): Number of DuckDB threads. Defaults to None.
+            memory_limit (str, optional): DuckDB memory limit. Defaults to None.
+        """
+         self.db_name = db_name
+         self.db_folder = db_folder or path.get_db_files_path()
+         self.db_file = os.path.join(self.db_folder, f'{db_name}.duckdb')
+         self.connection = None
+         self.threads = threads
+         self.memory_limit = memory_limit
+         self.changes = {}
+    
+    def create_database(self):
+
+        """"
+        Creates a database connection and backs up the existing database if it exists.
+
+        Raises:
+            Exception: If there is an error connecting to the database or backing it up.
+
+        """
+        try:
+            if os.path.exists(self.db_file):
+                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+                backup_db_file = os.path.join(self.db_folder, f'{self.db_name}_{timestamp}.duckdb')
+                shutil.copyfile(self.db_file, backup_db_file)
+                logging.info(f"Existing database '{self.db_name}.duckdb' backed up as '{self.db_name}_{timestamp}.duckdb'.")
+                #os.remove(self.db_file)
+            
+            os.makedirs(self.db_folder, exist_ok=True)
+            self.connection = duckdb.connect(self.db_file)
+            if self.threads:
+                self.connection.execute(f"SET threads = {int(self.threads)}")
+            if self.memory_limit:
+                self.connection.execute(f"SET memory_limit = '{self.memory_limit}'")
+            logging.info(f"Connected to {self.db_file} successfully.")
+        
+        except Exception as e:
+            logging.error(f"Error connecting to database: {e}")
+            raise
+
+    def inject_data_from_parquet(self, table_names=None, bulk=True, parquet_folder=None):
+        """
+        Injects data from Parquet files into the database.
+
+        This method reads all Parquet files from the output path and creates tables in the
+        database corresponding to each Parquet file or hive partitioned dataset directory.
+        Delta part files appended by the incremental ingestion (output/_deltas/<table>/*.parquet)
+        are loaded with their table. Entries starting with "_" are pipeline metadata and skipped.
+
+        In bulk mode every table is first loaded under a staging name and swapped in, all in
+        one transaction, so readers never see a half loaded database and a failure leaves the
+        previous tables untouched.
+
+        Args:
+            table_names (list, optional): Only (re)load the tables with these names.
+                Defaults to None, which loads every Parquet file.
+            bulk (bool, optional): Load all the tables in a single transaction. Defaults to True.
+            parquet_folder (str, optional): Folder of the Parquet files.
+                Defaults to path.get_output_path().
+
+        Raises:
+            Exception: If there is an error injecting data from Parquet files.
+
+        """
+        parquet_folder = parquet_folder or path.get_output_path()
+        # only roll back a transaction of this call, an error outside it would hide behind the rollback error
+        in_transaction = False
+
+        try:
+            parquet_files = glob.glob(os.path.join(parquet_folder, '*.parquet'))
+            parquet_files += [
+                entry.path for entry in os.scandir(parquet_folder)
+                if entry.is_dir() and not entry.name.startswith(('_', '.'))
+            ]
+            loaded = []
+            if bulk:
+                self.connection.execute("BEGIN TRANSACTION")
+                in_transaction = True
+            
+            for file_path in parquet_files:
+                file_name = os.path.basename(file_path)
+                table_name = os.path.splitext(file_name)[0]
+                if table_names is not None and table_name not in table_names:
+                    continue
+                
+                delta_files = sorted(glob.glob(os.path.join(parquet_folder, '_deltas', table_name, '*.parquet')))
+                source = DataInjection.get_parquet_source(table_name, file_path, delta_files)
+
+                with Instrumentation.stage("inject", dataset=table_name) as record:
+                    self.replace_table(table_name, source, staging=bulk)
+                    record["rows_out"] = self.connection.execute(f"SELECT count(*) FROM {table_name}").fetchone()[0]
+                logging.info(f"Table {table_name} created successfully from {file_path}.")
+                loaded.append(table_name)
+
+            if bulk:
+                self.connection.execute("COMMIT")
+                in_transaction = False
+            self.record_reload(loaded)
+            
+            tables = self.connection.execute("SHOW TABLES").fetchall()
+            logging.info(f"Tables in the database: {tables}")
+        
+        except Exception as e:
+            if in_transaction:
+                self.connection.execute("ROLLBACK")
+            logging.error(f"Error injecting data from Parquet files: {e}")
+            raise
+        
+    @staticmethod
+    def get_parquet_source(table_name, file_path, delta_files=()):
+        """
+        Builds the relation which reads a table from its Parquet file or partitioned directory.
+
+        Args:
+            table_name (str): The name of the table.
+            file_path (str): The Parquet file, or the directory of a hive partitioned dataset.
+            delta_files (list, optional): Delta part files appended to the table.
+
+        Returns:
+            str: A read_parquet table function, or a subquery for partitioned datasets.
+        """
+        from data_sql_engine import SqlEngine
+
+        def file_list(files):
+            return "[" + ", ".join(SqlEngine.literal(file.replace(os.sep, "/")) for file in files) + "]"
+
+        if not os.path.isdir(file_path):
+            return f"read_parquet({file_list([file_path, *delta_files])}, union_by_name=true)"
+
+        pattern = os.path.join(file_path, '**', '*.parquet').replace(os.sep, "/")
+        derived_columns = DataLayouts.get_derived_columns(table_name)
+        exclude = f" EXCLUDE ({', '.join(derived_columns)})" if derived_columns else ""
+        source = f"SELECT *{exclude} FROM read_parquet({SqlEngine.literal(pattern)}, hive_partitioning=true, hive_types_autocast=false)"
+        if delta_files:
+            source += f" UNION ALL BY NAME SELECT * FROM read_parquet({file_list(delta_files)}, union_by_name=true)"
+        return f"({source})"
+
+    def replace_table(self, table_name, source, staging=True):
+        """
+        Replaces a table with the rows of a query source.
+
+        The rows are cast and sorted as the table layout of the dataset in DataLayouts
+        declares, and its primary key and indexes are built once the table is complete.
+
+        Args:
+            table_name (str): The name of the table.
+            source (str): The relation to select from, a table function or a registered view.
+            staging (bool, optional): Build the table under a staging name first and swap it
+                in, so the old table stays readable until the new one is complete.
+        """
+        select = self.get_table_select(table_name, source)
+        if staging:
+            staging_table = f"{table_name}__staging"
+            self.connection.execute(f"DROP TABLE IF EXISTS {staging_table}")
+            self.connection.execute(f"CREATE TABLE {staging_table} AS {select}")
+            self.connection.execute(f"DROP TABLE IF EXISTS {table_name}")
+            # DuckDB cannot rename a table with indexes, they are built after the swap
+            self.connection.execute(f"ALTER TABLE {staging_table} RENAME TO {table_name}")
+        else:
+            self.connection.execute(f"DROP TABLE IF EXISTS {table_name}")
+            self.connection.execute(f"CREATE TABLE {table_name} AS {select}")
+        self.create_indexes(table_name)
+
+    def get_table_columns(self, relation):
+        ''' names and types of the columns of a table or a query source, keyed by lower case name '''
+        return {
+            column.lower(): (column, column_type)
+            for column, column_type, *_ in self.connection.execute(f"DESCRIBE SELECT * FROM {relation}").fetchall()
+        }
+
+    @staticmethod
+    def can_cast(source_type, column_type):
+        ''' whether the values of a column can be cast to the type of the table layout without loss of meaning '''
+        if column_type in ("DATE", "TIMESTAMP"):
+            return source_type.startswith(("DATE", "TIMESTAMP"))
+        return source_type.startswith(("TINYINT", "SMALLINT", "INTEGER", "BIGINT", "HUGEINT", "UTINYINT", "USMALLINT",
+                                       "UINTEGER", "UBIGINT", "FLOAT", "DOUBLE", "DECIMAL"))
+
+    def get_table_select(self, table_name, source):
+        """
+        Builds the SELECT which loads a table from its source with the casts and the row
+        order of its table layout. Columns of the layout missing from the source are ignored,
+        as are the casts from an unexpected source type (e.g. dates kept as text by an old
+        version of the pipeline), which are logged.
+
+        Args:
+            table_name (str): The name of the table.
+            source (str): The relation to select from.
+
+        Returns:
+            str: The SELECT statement.
+        """
+        layout = DataLayouts.get_layout(table_name)["table"]
+        columns = self.get_table_columns(source)
+        casts = []
+        for column, column_type in layout["column_types"].items():
+            if column.lower() not in columns:
+                continue
+            name, source_type = columns[column.lower()]
+            if DataInjection.can_cast(source_type, column_type):
+                casts.append(f'CAST("{name}" AS {column_type}) AS "{name}"')
+            else:
+                logging.warning(f"Column {name} of {table_name} is {source_type}, it is not cast to {column_type}")
+        replace = f" REPLACE ({', '.join(casts)})" if casts else ""
+        select = f"SELECT *{replace} FROM {source}"
+        sort_by = [f'"{columns[column.lower()][0]}"' for column in layout["sort_by"] if column.lower() in columns]
+        if sort_by:
+            select += f" ORDER BY {', '.join(sort_by)}"
+        return select
+
+    def create_indexes(self, table_name):
+        """
+        Builds the primary key and the ART indexes of the table layout of a table.
+
+        Raises:
+            duckdb.ConstraintException: If a key of the primary key is null or duplicated.
+        """
+        layout = DataLayouts.get_layout(table_name)["table"]
+        columns = self.get_table_columns(table_name)
+        primary_key = layout["primary_key"]
+        if primary_key and all(column.lower() in columns for column in primary_key):
+            key = ", ".join(f'"{columns[column.lower()][0]}"' for column in primary_key)
+            self.connection.execute(f"ALTER TABLE {table_name} ADD PRIMARY KEY ({key})")
+        for index in layout["indexes"]:
+            if all(column.lower() in columns for column in index):
+                index_name = f"{table_name}_{'_'.join(index)}_idx".lower()
+                index_columns = ", ".join(f'"{columns[column.lower()][0]}"' for column in index)
+                self.connection.execute(f"CREATE INDEX {index_name} ON {table_name} ({index_columns})")
+
+    def inject_data_from_frames(self, frames):
+        """
+        Injects in-memory Arrow tables or DataFrames into the database.
+
+        Every frame is registered with the connection, which scans its memory without a copy,
+        and materialized with CREATE TABLE AS. All the tables are built in one transaction.
+
+        Args:
+            frames (dict): Dictionary where keys are table names and values are Arrow tables
+                or DataFrames.
+
+        Raises:
+            Exception: If there is an error injecting the frames.
+        """
+        in_transaction = False
+        try:
+            self.connection.execute("BEGIN TRANSACTION")
+            in_transaction = True
+            for table_name, frame in frames.items():
+                view_name = f"{table_name}__frame"
+                self.connection.register(view_name, frame)
+                try:
+                    with Instrumentation.stage("inject", dataset=table_name, rows_in=len(frame)) as record:
+                        self.replace_table(table_name, view_name)
+                        record["rows_out"] = len(frame)
+                finally:
+                    self.connection.unregister(view_name)
+                logging.info(f"Table {table_name} created successfully from memory.")
+            self.connection.execute("COMMIT")
+            in_transaction = False
+            self.record_reload(list(frames))
+        except Exception as e:
+            if in_transaction:
+                self.connection.execute("ROLLBACK")
+            logging.error(f"Error injecting data from frames: {e}")
+            raise
+
+    def get_max_date(self, table_name, date_column):
+        """
+        Gets the latest date already loaded in a table.
+
+        Args:
+            table_name (str): The name of the table.
+            date_column (str): The name of the date column.
+
+        Returns:
+            The latest date, None if the table does not exist, is empty or the column
+            is not a date column (the table has to be fully reloaded in these cases).
+        """
+        column_type = self.connection.execute(
+            "SELECT data_type FROM information_schema.columns WHERE table_name = ? AND column_name = ?",
+            [table_name, date_column],
+        ).fetchone()
+        if column_type is None or not column_type[0].startswith(("DATE", "TIMESTAMP")):
+            return None
+        return self.connection.execute(f'SELECT max("{date_column}") FROM {table_name}').fetchone()[0]
+
+    def append_data_from_parquet(self, table_name, file_path):
+        """
+        Appends the rows of a Parquet file to an existing table.
+
+        Args:
+            table_name (str): The name of the table.
+            file_path (str): The path of the Parquet file.
+
+        Raises:
+            Exception: If there is an error inserting the rows.
+        """
+        try:
+            self.connection.execute(f"INSERT INTO {table_name} BY NAME SELECT * FROM {DataInjection.get_parquet_source(table_name, file_path)}")
+            logging.info(f"Rows of {file_path} appended to table {table_name}.")
+            self.record_reload([table_name], change="appended")
+        except Exception as e:
+            logging.error(f"Error appending {file_path} to {table_name}: {e}")
+            raise
+
+    @staticmethod
+    def get_versions_file(db_file):
+        ''' file of the table versions of a database file '''
+        return f"{os.path.splitext(db_file)[0]}.versions.json"
+
+    @staticmethod
+    def read_versions(db_file):
+        """
+        Reads the versions of the tables of a database file.
+
+        Args:
+            db_file (str): The path of the database file.
+
+        Returns:
+            dict: Table names mapped to the number of times they were (re)loaded, empty if
+                the versions were never recorded.
+        """
+        try:
+            with open(DataInjection.get_versions_file(db_file)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def record_reload(self, table_names, change="reloaded"):
+        """
+        Bumps the versions of reloaded tables and notifies the listeners.
+
+        Args:
+            table_names (list): The tables which were (re)loaded.
+            change (str, optional): "reloaded" when the tables were replaced, "appended" when
+                rows of new dates were added to them.
+        """
+        if not table_names:
+            return
+        for table_name in table_names:
+            if self.changes.get(table_name) != "reloaded":
+                self.changes[table_name] = change
+        versions = DataInjection.read_versions(self.db_file)
+        for table_name in table_names:
+            versions[table_name] = versions.get(table_name, 0) + 1
+        versions_file = DataInjection.get_versions_file(self.db_file)
+        with open(f"{versions_file}.tmp", "w") as f:
+            json.dump(versions, f)
+        os.replace(f"{versions_file}.tmp", versions_file)
+        for listener in DataInjection.listeners:
+            listener(self.db_file, table_names)
+
+    def refresh_rollups(self, full=False):
+        """
+        Refreshes the rollup tables of DataRollups whose sources changed, in one transaction.
+
+        Args:
+            full (bool, optional): Rebuild every rollup, whatever changed. Defaults to False.
+
+        Returns:
+            dict: The refreshed rollups mapped to "full" or "incremental".
+
+        Raises:
+            Exception: If there is an error building the rollups.
+        """
+        from data_rollups import DataRollups
+
+        in_transaction = False
+        try:
+            self.connection.execute("BEGIN TRANSACTION")
+            in_transaction = True
+            refreshed = DataRollups.refresh(self.connection, None if full else self.changes)
+            self.connection.execute("COMMIT")
+            in_transaction = False
+        except Exception as e:
+            if in_transaction:
+                self.connection.execute("ROLLBACK")
+            logging.error(f"Error refreshing the rollups: {e}")
+            raise
+        # the reload of the rollups is recorded as a change too, which the next refresh must not see
+        self.record_reload(list(refreshed))
+        self.changes = {}
+        return refreshed
+
+    def close_connection(self):
+        """
+        Closes the connection to the database.
+        Logs a message indicating that the database connection has been closed.
+        """
+        
+        if self.connection:
+            self.connection.close()
+            self.connection = None
+            logging.info("Database connection closed.")
+
+# Example usage:
+if __name__ == "__main__":
+    try:
+        data_injector = DataInjection(db_name="covid_19_db",db_folder=path.get_db_files_path())
+        data_injector.create_database()
+        data_injector.inject_data_from_parquet()
+        data_injector.refresh_rollups()
+    except Exception as e:
+        logging.error(f"An error occurred during data injection: {e}")
+    finally:
+        if data_injector:
+            data_injector.close_connection()
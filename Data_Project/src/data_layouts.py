@@ -0,0 +1,271 @@
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+
+class DataLayouts:
+    """Parquet layout of every output dataset, keyed by the names in FileName.get_files_name().
+
+    The column names are the names of the output (after the rename in DataRules).
+    Each entry holds:
+        sort_by (list): Columns the rows are sorted by before they are written, so the
+            row group statistics of these columns are tight and readers can skip row groups.
+        row_group_size (int): Maximum number of rows in a row group.
+        partition_by (list): Hive partition columns of the partitioned output layout.
+        month_of (str, optional): Date column from which the "month" partition column
+            (YYYY-MM) is derived. The month only exists in the directory names.
+        profile (str): Name of the encoding profile in PROFILES.
+        dictionary_columns (list): Low cardinality columns which are dictionary encoded by the
+            profiles which do not dictionary encode every column.
+        bloom_filter_columns (list): High cardinality key columns looked up by equality, which
+            get a bloom filter so readers can skip the row groups without the value.
+        table (dict): How the dataset is loaded as a DuckDB table:
+            sort_by (list): Order of the rows of the table, which keeps the DuckDB zone maps
+                (min/max of every row group) of these columns tight.
+            primary_key (list): Columns of the primary key, whose ART index also checks
+                that every key is loaded once.
+            indexes (list): Column lists of the ART indexes of the point lookups.
+            column_types (dict): Columns cast to a narrower or more exact type, such as
+                the dates without a time or the counts which pandas kept as floats.
+
+    The encoding profiles hold:
+        compression (str): The Parquet codec.
+        compression_level (int, optional): The level of the codec.
+        dictionary (str): "all" dictionary encodes every column, "declared" only the
+            dictionary_columns of the dataset.
+        statistics (str): "all" writes min/max statistics for every column, "keys" only for
+            the sort and bloom filter columns.
+        data_page_size (int): Target size in bytes of the data pages.
+        bloom_filters (bool): Write the bloom filters of the bloom_filter_columns.
+    """
+
+    DEFAULT_ROW_GROUP_SIZE = 128 * 1024
+
+    PROFILES = {
+        "snappy": {
+            "compression": "snappy",
+            "dictionary": "all",
+            "statistics": "all",
+            "data_page_size": 1024 * 1024,
+            "bloom_filters": False,
+        },
+        "zstd": {
+            "compression": "zstd",
+            "compression_level": 3,
+            "dictionary": "declared",
+            "statistics": "all",
+            "data_page_size": 1024 * 1024,
+            "bloom_filters": True,
+        },
+        "zstd_compact": {
+            "compression": "zstd",
+            "compression_level": 12,
+            "dictionary": "declared",
+            "statistics": "keys",
+            "data_page_size": 4 * 1024 * 1024,
+            "bloom_filters": False,
+        },
+    }
+
+    @staticmethod
+    def get_layouts():
+        return {
+            "country_wise": {
+                "sort_by": ["country_region"],
+                "row_group_size": DataLayouts.DEFAULT_ROW_GROUP_SIZE,
+                "partition_by": [],
+                "profile": "zstd",
+                "dictionary_columns": ["who_region"],
+                "bloom_filter_columns": [],
+                "table": {
+                    "sort_by": ["country_region"],
+                    "primary_key": ["country_region"],
+                    "indexes": [],
+                    "column_types": {},
+                },
+            },
+            "covid_19_clean": {
+                "sort_by": ["Date", "country_region", "province_state"],
+                "row_group_size": DataLayouts.DEFAULT_ROW_GROUP_SIZE,
+                "partition_by": ["month"],
+                "month_of": "Date",
+                "profile": "zstd",
+                "dictionary_columns": ["province_state", "country_region", "who_region"],
+                "bloom_filter_columns": ["country_region"],
+                "table": {
+                    "sort_by": ["country_region", "province_state", "Date"],
+                    "primary_key": [],
+                    "indexes": [["country_region"]],
+                    "column_types": {"Date": "DATE"},
+                },
+            },
+            "day_wise": {
+                "sort_by": ["date"],
+                "row_group_size": DataLayouts.DEFAULT_ROW_GROUP_SIZE,
+                "partition_by": [],
+                "profile": "zstd",
+                "dictionary_columns": [],
+                "bloom_filter_columns": [],
+                "table": {
+                    "sort_by": ["date"],
+                    "primary_key": ["date"],
+                    "indexes": [],
+                    "column_types": {"date": "DATE"},
+                },
+            },
+            "full_grouped": {
+                "sort_by": ["date", "country_region"],
+                "row_group_size": DataLayouts.DEFAULT_ROW_GROUP_SIZE,
+                "partition_by": ["month"],
+                "month_of": "date",
+                "profile": "zstd",
+                "dictionary_columns": ["country_region", "who_region"],
+                "bloom_filter_columns": ["country_region"],
+                "table": {
+                    "sort_by": ["country_region", "date"],
+                    "primary_key": ["country_region", "date"],
+                    "indexes": [["country_region"]],
+                    "column_types": {"date": "DATE"},
+                },
+            },
+            "usa_county_wise": {
+                "sort_by": ["province_state", "combined_key", "Date"],
+                "row_group_size": 64 * 1024,
+                "partition_by": ["province_state"],
+                "profile": "zstd",
+                "dictionary_columns": ["iso2", "iso3", "admin2", "province_state", "country_region", "combined_key"],
+                "bloom_filter_columns": ["combined_key", "admin2"],
+                "table": {
+                    "sort_by": ["fips", "Date"],
+                    "primary_key": ["UID", "Date"],
+                    "indexes": [["fips"], ["combined_key"]],
+                    "column_types": {"Date": "DATE", "fips": "INTEGER", "code3": "INTEGER"},
+                },
+            },
+            "worldometer": {
+                "sort_by": ["country_region"],
+                "row_group_size": DataLayouts.DEFAULT_ROW_GROUP_SIZE,
+                "partition_by": [],
+                "profile": "zstd",
+                "dictionary_columns": ["continent", "who_region"],
+                "bloom_filter_columns": [],
+                "table": {
+                    "sort_by": ["country_region"],
+                    "primary_key": ["country_region"],
+                    "indexes": [],
+                    "column_types": {
+                        column: "BIGINT" for column in [
+                            "population", "new_cases", "total_deaths", "new_deaths", "total_recovered",
+                            "new_recovered", "active_cases", "serious_critical", "total_tests",
+                        ]
+                    },
+                },
+            },
+        }
+
+    @staticmethod
+    def get_layout(name: str):
+        ''' layout of a dataset, datasets without an entry are written unsorted in a single file '''
+        return DataLayouts.get_layouts().get(name) or {
+            "sort_by": [],
+            "row_group_size": DataLayouts.DEFAULT_ROW_GROUP_SIZE,
+            "partition_by": [],
+            "profile": "snappy",
+            "dictionary_columns": [],
+            "bloom_filter_columns": [],
+            "table": {"sort_by": [], "primary_key": [], "indexes": [], "column_types": {}},
+        }
+
+    @staticmethod
+    def get_write_options(name: str, table: pa.Table, profile: str = None):
+        """
+        Get the Parquet writer options of a dataset from its layout and encoding profile.
+
+        Args:
+            name (str): Name of the dataset.
+            table (pa.Table): The table as written to the file, used for the column indexes
+                of the sort order and the number of distinct values of the bloom filters.
+            profile (str, optional): Name of a profile in PROFILES to use instead of the one
+                of the dataset.
+
+        Returns:
+            dict: Keyword arguments for pq.write_table, pq.ParquetWriter and the
+                pyarrow.dataset Parquet write options.
+        """
+        layout = DataLayouts.get_layout(name)
+        settings = DataLayouts.PROFILES[profile or layout["profile"]]
+        columns = table.column_names
+        sort_by = [column for column in layout["sort_by"] if column in columns]
+        bloom_filter_columns = [column for column in layout["bloom_filter_columns"] if column in columns]
+
+        options = {
+            "compression": settings["compression"],
+            "compression_level": settings.get("compression_level"),
+            "data_page_size": settings["data_page_size"],
+            "use_dictionary": True,
+            "write_statistics": True,
+        }
+        if settings["dictionary"] == "declared":
+            options["use_dictionary"] = [column for column in layout["dictionary_columns"] if column in columns]
+        if settings["statistics"] == "keys":
+            options["write_statistics"] = list(dict.fromkeys(sort_by + bloom_filter_columns))
+        if settings["bloom_filters"] and bloom_filter_columns:
+            options["bloom_filter_options"] = {
+                column: {"ndv": max(pc.count_distinct(DataLayouts.decode(table[column])).as_py(), 1), "fpp": 0.05}
+                for column in bloom_filter_columns
+            }
+        if sort_by:
+            options["sorting_columns"] = pq.SortingColumn.from_ordering(
+                table.schema, [(column, "ascending") for column in sort_by]
+            )
+        return options
+
+    @staticmethod
+    def get_derived_columns(name: str):
+        ''' partition columns which are not columns of the dataset itself '''
+        return ["month"] if DataLayouts.get_layout(name).get("month_of") else []
+
+    @staticmethod
+    def decode(column):
+        ''' the values of a dictionary (category) column, other columns are returned as they are '''
+        if pa.types.is_dictionary(column.type):
+            return column.cast(column.type.value_type)
+        return column
+
+    @staticmethod
+    def sort_table(table: pa.Table, sort_by: list):
+        """
+        Sort an Arrow table by the columns of sort_by which it has.
+
+        Arrow cannot sort dictionary (category) columns directly, so the sort keys are
+        decoded to their values first and only the sorted order is applied to the table.
+
+        Args:
+            table (pa.Table): The table to sort.
+            sort_by (list): Names of the columns to sort by, in order.
+
+        Returns:
+            pa.Table: The sorted table.
+        """
+        sort_by = [column for column in sort_by if column in table.column_names]
+        if not sort_by:
+            return table
+        keys = pa.table({column: DataLayouts.decode(table[column]) for column in sort_by})
+        return table.take(pc.sort_indices(keys, [(column, "ascending") for column in sort_by]))
+
+    @staticmethod
+    def add_partition_columns(table: pa.Table, name: str):
+        """
+        Add the derived partition columns of a dataset to a table.
+
+        Args:
+            table (pa.Table): The table of the dataset.
+            name (str): Name of the dataset.
+
+        Returns:
+            pa.Table: The table with the derived columns.
+        """
+        month_of = DataLayouts.get_layout(name).get("month_of")
+        if month_of and month_of in table.column_names:
+            table = table.append_column("month", pc.strftime(table[month_of], "%Y-%m"))
+        return table
@@ -0,0 +1,366 @@
+import os
+import shutil
+import logging
+from datetime import datetime
+import pandas as pd
+import pyarrow as pa
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from paths import path
+from data_reading import DataReading
+from data_analysis import Analysis
+from data_conversion import DataConvert
+from data_rules import DataRules
+from data_sql_engine import SqlEngine
+from data_polars_engine import PolarsEngine
+from instrumentation import Instrumentation
+
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+                    handlers=[
+                        logging.FileHandler(os.path.join(path.get_logs_path(), "data_pipeline.log")),
+                        logging.StreamHandler()
+                    ])
+
+
+class Pipeline:
+    """Runs the read -> analysis -> parquet steps for every dataset.
+
+    Every dataset is independent of the others until the data is injected to the
+    database, so the datasets can be processed one after another or in a process pool.
+    """
+
+    @staticmethod
+    def get_eda(name: str):
+        """
+        Get the Analysis method which processes the given dataset.
+
+        Args:
+            name (str): Name of the dataset as given in FileName.get_files_name().
+
+        Returns:
+            function: The eda method, None if processing is not defined for the dataset.
+        """
+        eda_methods = {
+            "country_wise": Analysis.country_wise_eda,
+            "covid_19_clean": Analysis.covid_19_clean_eda,
+            "day_wise": Analysis.day_wise_eda,
+            "full_grouped": Analysis.full_grouped_eda,
+            "usa_county_wise": Analysis.usa_county_wise_eda,
+            "worldometer": Analysis.worldometer_eda,
+        }
+        return eda_methods.get(name)
+
+    @staticmethod
+    def get_engine(engine: str):
+        """
+        Get the function which cleans a whole dataset with a dataframe engine other than pandas.
+
+        Args:
+            engine (str): "duckdb" or "polars".
+
+        Returns:
+            function: clean_dataset(name, file_path) of the engine, None for the pandas engine.
+        """
+        engines = {
+            "duckdb": SqlEngine.clean_dataset,
+            "polars": PolarsEngine.clean_dataset,
+        }
+        return engines.get(engine)
+
+    @staticmethod
+    def process_dataset(name: str, file_path: str, batch_size: int = None, engine: str = "pandas", direct: bool = False):
+        """
+        Process a single dataset and return the timings of its stages with the result.
+
+        The stage records are returned under the key "stages", so the records of the
+        datasets processed in worker processes reach the run report of the main process.
+
+        Args:
+            name (str): Name of the dataset.
+            file_path (str): Path of the input csv file.
+            batch_size (int, optional): Passed to run_dataset.
+            engine (str, optional): Passed to run_dataset.
+            direct (bool, optional): Passed to run_dataset.
+
+        Returns:
+            dict: The result of run_dataset with the key stages.
+        """
+        with Instrumentation.collect() as records:
+            with Instrumentation.stage("process", dataset=name) as record:
+                result = Pipeline.run_dataset(name, file_path, batch_size, engine, direct)
+                if "table" in result:
+                    record["rows_out"] = result["table"].num_rows
+        result["stages"] = records
+        return result
+
+    @staticmethod
+    def run_dataset(name: str, file_path: str, batch_size: int = None, engine: str = "pandas", direct: bool = False):
+        """
+        Read, validate and write a single dataset to parquet.
+
+        Args:
+            name (str): Name of the dataset.
+            file_path (str): Path of the input csv file.
+            batch_size (int, optional): Stream the csv in batches of this many rows
+                instead of reading it fully into memory. Defaults to None.
+            engine (str, optional): "pandas", "duckdb" or "polars", the engine which cleans the data.
+            direct (bool, optional): Return the cleaned data as an Arrow table under the key
+                "table" instead of writing it to Parquet, to load it directly into the database.
+                Only the in-memory pandas engine supports it. Defaults to False.
+
+        Returns:
+            dict: Result of the dataset with the keys name, success and error (and table).
+        """
+        result = {"name": name, "success": False, "error": None}
+        eda = Pipeline.get_eda(name)
+        if eda is None:
+            result["error"] = f"Data processing for {name} is not defined"
+            logging.info(f"Data processing for {name} is not defined in the pipeline")
+            return result
+
+        clean_dataset = Pipeline.get_engine(engine)
+        if clean_dataset is not None:
+            with Instrumentation.stage("clean") as record:
+                cleaned = record["rows_out"] = clean_dataset(name, file_path)
+            if cleaned is None:
+                result["error"] = f"{engine} processing of {name} failed, check the analysis logs"
+            else:
+                result["success"] = True
+                Pipeline.clear_deltas(name)
+            return result
+
+        if batch_size:
+            with Instrumentation.stage("stream") as record:
+                streamed = record["rows_out"] = Analysis.stream_eda(file_path, name, batch_size)
+            if streamed is None:
+                result["error"] = f"Streaming of {name} failed, check the analysis logs"
+            else:
+                result["success"] = True
+                Pipeline.clear_deltas(name)
+            return result
+
+        try:
+            data_frame = DataReading.read_data({name: file_path})[name]
+        except Exception as e:
+            result["error"] = f"Error reading {name}: {e}"
+            logging.error(result["error"])
+            return result
+
+        if data_frame is None:
+            result["error"] = f"Data of {name} doesnot exist or there is a problem with the data"
+            logging.info(result["error"])
+            return result
+
+        logging.info(f"Reading the data {name} is successful")
+        if direct:
+            try:
+                df = Analysis.apply_rules(data_frame, name)
+                table = pa.Table.from_pandas(df, preserve_index=False)
+                # Parquet stores second resolution dates as microseconds, keep both loads alike
+                result["table"] = table.cast(pa.schema([
+                    field.with_type(pa.timestamp("us", field.type.tz))
+                    if pa.types.is_timestamp(field.type) and field.type.unit == "s" else field
+                    for field in table.schema
+                ]))
+                result["success"] = True
+                Pipeline.clear_deltas(name)
+            except Exception as e:
+                result["error"] = f"Error processing {name}: {e}"
+                logging.error(result["error"])
+            return result
+
+        with Instrumentation.stage("analysis", rows_in=len(data_frame)):
+            analysed = eda(data_frame=data_frame, name=name)
+        if analysed is None:
+            result["error"] = f"Processing of {name} failed, check the analysis logs"
+        else:
+            result["success"] = True
+            Pipeline.clear_deltas(name)
+        return result
+
+    @staticmethod
+    def clear_deltas(name: str, output_dir: str = path.get_output_path()):
+        """
+        Remove the delta part files of a dataset once its full Parquet file is rewritten.
+
+        Args:
+            name (str): Name of the dataset.
+            output_dir (str, optional): Directory path of the Parquet files.
+        """
+        delta_dir = os.path.join(output_dir, "_deltas", name)
+        if os.path.exists(delta_dir):
+            shutil.rmtree(delta_dir)
+            logging.info(f"Removed the delta part files of {name}")
+
+    @staticmethod
+    def ingest_delta(name: str, file_path: str, injector, output_dir: str = path.get_output_path()):
+        """
+        Append only the dates newer than the ones already in the database.
+
+        The new rows are validated, written as a new Parquet part file under
+        output/_deltas/<name>/ and inserted into the existing table.
+
+        Args:
+            name (str): Name of a time series dataset in DataRules.get_rules().
+            file_path (str): Path of the input csv file.
+            injector (DataInjection): Injector with an open database connection.
+            output_dir (str, optional): Directory path of the Parquet files.
+
+        Returns:
+            dict: Result of the dataset with the keys name, success, error and rows.
+                success is False when the table has to be fully reloaded instead.
+        """
+        result = {"name": name, "success": False, "error": None, "rows": 0}
+        rules = DataRules.get_rules().get(name, {})
+        date_column = rules.get("date_column")
+        if date_column is None:
+            result["error"] = f"{name} is not a time series dataset"
+            return result
+
+        max_date = injector.get_max_date(name, date_column)
+        if max_date is None:
+            result["error"] = f"No dated rows of {name} in the database, a full load is needed"
+            logging.info(result["error"])
+            return result
+
+        try:
+            data_frame = DataReading.read_data({name: file_path})[name]
+            raw_date_column = next(
+                (column for column, new_name in rules["rename"].items() if new_name == date_column), date_column
+            )
+            new_rows = data_frame[pd.to_datetime(data_frame[raw_date_column]) > pd.Timestamp(max_date)]
+            logging.info(f"Found {len(new_rows)} rows of {name} newer than {max_date}")
+            if len(new_rows) > 0:
+                df = Analysis.apply_rules(new_rows, name)
+                delta_dir = os.path.join(output_dir, "_deltas", name)
+                # microseconds keep the part names of quick successive ingests apart and in order
+                part_name = f"{name}_{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}"
+                part_path = os.path.join(delta_dir, f"{part_name}.parquet")
+                DataConvert.to_parquet({part_name: df}, delta_dir, partitioned=False, layout_name=name)
+                try:
+                    injector.append_data_from_parquet(name, part_path)
+                except Exception:
+                    os.remove(part_path)
+                    raise
+                result["rows"] = len(df)
+            result["success"] = True
+        except Exception as e:
+            result["error"] = f"Error in the delta ingestion of {name}: {e}"
+            logging.error(result["error"])
+        return result
+
+    @staticmethod
+    def run_delta(file_names: dict, injector):
+        """
+        Append the new dates of every time series dataset in file_names.
+
+        Args:
+            file_names (dict): Dictionary where keys are dataset names and values are file paths.
+            injector (DataInjection): Injector with an open database connection.
+
+        Returns:
+            dict: Results of the time series datasets, keyed by dataset name.
+        """
+        rules = DataRules.get_rules()
+        return {
+            name: Pipeline.ingest_delta(name, file_path, injector)
+            for name, file_path in file_names.items()
+            if rules.get(name, {}).get("date_column")
+        }
+
+    @staticmethod
+    def run_serial(file_names: dict, **options):
+        """
+        Process the datasets one after another.
+
+        Args:
+            file_names (dict): Dictionary where keys are dataset names and values are file paths.
+            **options: batch_size, engine and direct, passed to process_dataset.
+
+        Returns:
+            dict: Dictionary where keys are dataset names and values are the results.
+        """
+        return {
+            name: Pipeline.process_dataset(name, file_path, **options)
+            for name, file_path in file_names.items()
+        }
+
+    @staticmethod
+    def run_parallel(file_names: dict, max_workers: int = None, **options):
+        """
+        Process the datasets concurrently in a process pool.
+
+        The results are gathered per dataset as soon as each one finishes, so the small
+        datasets do not wait behind the large ones.
+
+        Args:
+            file_names (dict): Dictionary where keys are dataset names and values are file paths.
+            max_workers (int, optional): Number of worker processes. Defaults to None.
+            **options: batch_size, engine and direct, passed to process_dataset.
+
+        Returns:
+            dict: Dictionary where keys are dataset names and values are the results.
+        """
+        results = {}
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            futures = {
+                executor.submit(Pipeline.process_dataset, name, file_path, **options): name
+                for name, file_path in file_names.items()
+            }
+            for future in as_completed(futures):
+                name = futures[future]
+                try:
+                    results[name] = future.result()
+                except Exception as e:
+                    results[name] = {"name": name, "success": False, "error": str(e)}
+                logging.info(f"Finished processing {name}: success={results[name]['success']}")
+
+        return {name: results[name] for name in file_names}
+
+    @staticmethod
+    def run(file_names: dict, execution_mode: str = "serial", max_workers: int = None, **options):
+        """
+        Process the datasets with the given execution mode.
+
+        Args:
+            file_names (dict): Dictionary where keys are dataset names and values are file paths.
+            execution_mode (str, optional): "serial" or "parallel". Defaults to "serial".
+            max_workers (int, optional): Number of worker processes for the parallel mode.
+            **options: batch_size, engine and direct, passed to process_dataset.
+
+        Returns:
+            dict: Dictionary where keys are dataset names and values are the results.
+        """
+        if execution_mode == "parallel":
+            logging.info(f"Processing {len(file_names)} datasets in parallel with max_workers={max_workers}")
+            return Pipeline.run_parallel(file_names, max_workers, **options)
+        return Pipeline.run_serial(file_names, **options)
+
+    @staticmethod
+    def load_direct(tables: dict, injector, export_parquet: bool = True, output_dir: str = path.get_output_path()):
+        """
+        Load cleaned Arrow tables straight into the database.
+
+        The optional Parquet export of the same tables runs in background threads while
+        DuckDB builds the tables, so it is not on the critical path of the load.
+
+        Args:
+            tables (dict): Dictionary where keys are table names and values are Arrow tables.
+            injector (DataInjection): Injector with an open database connection.
+            export_parquet (bool, optional): Also write every table to Parquet. Defaults to True.
+                Without the export the Parquet files of an earlier run are removed once the
+                tables are loaded, as they no longer match the database.
+            output_dir (str, optional): Directory path to save the Parquet files.
+        """
+        with ThreadPoolExecutor() as executor:
+            exports = [
+                executor.submit(Instrumentation.in_context(DataConvert.to_parquet, {name: table}, output_dir))
+                for name, table in tables.items()
+            ] if export_parquet else []
+            injector.inject_data_from_frames(tables)
+            for export in exports:
+                export.result()
+        if not export_parquet:
+            for name in tables:
+                DataConvert.remove_output(name, output_dir, partitioned=False)
+                DataConvert.remove_output(name, output_dir, partitioned=True)
@@ -0,0 +1,150 @@
+import os
+import logging
+from paths import path
+from config import Config
+from data_layouts import DataLayouts
+from data_rules import DataRules
+from data_schemas import DataSchemas
+
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+                    handlers=[
+                        logging.FileHandler(os.path.join(path.get_logs_path(), "data_analysis.log")),
+                        logging.StreamHandler()
+                    ])
+
+
+class PolarsEngine:
+    """Cleans the datasets with a lazy Polars query over Arrow memory.
+
+    The rename -> null handling -> clamp -> range filter -> Parquet steps of a dataset are
+    declared on a LazyFrame, so Polars fuses them into one streaming plan, sorted and encoded
+    with the layout of the dataset in DataLayouts. Polars is an optional dependency and is
+    only imported when this engine is used.
+    """
+
+    @staticmethod
+    def import_polars():
+        ''' import polars or explain how to install it '''
+        try:
+            import polars as pl
+        except ImportError as e:
+            raise ImportError("The polars engine needs the polars package, install it with pip install polars") from e
+        return pl
+
+    @staticmethod
+    def build_query(name: str, file_path: str):
+        """
+        Build the lazy cleaning query of a dataset from its rules.
+
+        Args:
+            name (str): Name of the dataset in DataRules.get_rules().
+            file_path (str): Path of the input csv file.
+
+        Returns:
+            tuple: The LazyFrame of the cleaned rows and the expression the compliant rows
+                fulfil (None if the dataset has no range rules).
+        """
+        pl = PolarsEngine.import_polars()
+        polars_types = {"int64": pl.Int64, "float64": pl.Float64, "category": pl.Categorical}
+        rules = DataRules.get_rules()[name]
+        schema = DataSchemas.get_schemas().get(name) or {"dtype": {}, "categories": [], "dates": []}
+
+        schema_overrides = {column: polars_types[dtype] for column, dtype in schema["dtype"].items()}
+        schema_overrides.update({column: pl.Categorical for column in schema["categories"]})
+        schema_overrides.update({column: pl.String for column in schema["dates"]})
+        frame = pl.scan_csv(file_path, schema_overrides=schema_overrides)
+
+        columns = frame.collect_schema().names()
+        if schema["dates"]:
+            frame = frame.with_columns(
+                pl.col(column).str.strptime(pl.Datetime("us"), schema.get("date_format"))
+                for column in schema["dates"] if column in columns
+            )
+        frame = frame.rename({column: new_name for column, new_name in rules["rename"].items() if column in columns})
+        columns = frame.collect_schema().names()
+
+        fill_null = [
+            pl.col(column).fill_null(value)
+            if not isinstance(value, str) else pl.col(column).cast(pl.String).fill_null(value)
+            for column, value in rules["fill_null"].items() if column in columns
+        ]
+        if fill_null:
+            frame = frame.with_columns(fill_null)
+        non_negative = [
+            pl.when(pl.col(column) < 0).then(0).otherwise(pl.col(column)).alias(column)
+            for column in rules["non_negative"] if column in columns
+        ]
+        if non_negative:
+            frame = frame.with_columns(non_negative)
+        if rules["drop_null"]:
+            frame = frame.drop_nulls()
+
+        condition = None
+        for column, (min_value, max_value) in rules["between"].items():
+            if column in columns:
+                between = pl.col(column).is_between(min_value, max_value).fill_null(False)
+                condition = between if condition is None else condition & between
+        return frame, condition
+
+    @staticmethod
+    def clean_dataset(name: str, file_path: str, output_dir: str = path.get_output_path(),
+                      intermediate_path: str = path.get_intermediate_path(), partitioned: bool = None,
+                      profile: str = None):
+        """
+        Clean a dataset and write it to Parquet with Polars.
+
+        The single file is streamed by sink_parquet. The partitioned layout is collected and
+        written by DataConvert.to_parquet, so both engines produce the same hive directories.
+
+        Args:
+            name (str): Name of the dataset in DataRules.get_rules().
+            file_path (str): Path of the input csv file.
+            output_dir (str, optional): Directory path to save the Parquet file.
+            intermediate_path (str, optional): Folder of the quarantine of the non-compliant rows.
+            partitioned (bool, optional): Use the partitioned layout.
+                Defaults to Config.get_output_layout() == "partitioned".
+            profile (str, optional): Encoding profile of DataLayouts.PROFILES.
+                Defaults to Config.get_parquet_profile(), None uses the profile of the dataset.
+
+        Returns:
+            int: Number of rows written, None if the processing failed.
+        """
+        logging.info(f"==============Starting {name} Polars analysis==============")
+        layout = DataLayouts.get_layout(name)
+        if partitioned is None:
+            partitioned = Config.get_output_layout() == "partitioned"
+        if profile is None:
+            profile = Config.get_parquet_profile()
+        try:
+            pl = PolarsEngine.import_polars()
+            from data_conversion import DataConvert
+            frame, condition = PolarsEngine.build_query(name, file_path)
+            os.makedirs(output_dir, exist_ok=True)
+            output_path = os.path.join(output_dir, f"{name}.parquet")
+
+            if condition is not None:
+                from data_quarantine import Quarantine
+                frame = frame.cache()
+                Quarantine.append(frame.filter(~condition).collect().to_pandas(), name, intermediate_path)
+                frame = frame.filter(condition)
+
+            if partitioned and layout["partition_by"]:
+                table = frame.collect().to_arrow()
+                DataConvert.to_parquet({name: table}, output_dir, partitioned=True, profile=profile)
+                return table.num_rows
+
+            columns = frame.collect_schema().names()
+            sort_by = [column for column in layout["sort_by"] if column in columns]
+            if sort_by:
+                frame = frame.sort(sort_by, nulls_last=True)
+            settings = DataLayouts.PROFILES[profile or layout["profile"]]
+            frame.sink_parquet(output_path, compression=settings["compression"],
+                               compression_level=settings.get("compression_level"),
+                               row_group_size=layout["row_group_size"])
+            DataConvert.remove_output(name, output_dir, partitioned=True)
+            rows = pl.scan_parquet(output_path).select(pl.len()).collect().item()
+            logging.info(f"Converted {rows} rows of {name} to Parquet at {output_path}")
+            return rows
+        except Exception as e:
+            logging.error(f"Error in the Polars analysis of {name}: {e}")
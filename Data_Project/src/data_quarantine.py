@@ -0,0 +1,235 @@
+import os
+import glob
+import logging
+import argparse
+import duckdb
+import pandas as pd
+from paths import path
+from instrumentation import Instrumentation
+
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+                    handlers=[
+                        logging.FileHandler(os.path.join(path.get_logs_path(), "data_conversions.log")),
+                        logging.StreamHandler()
+                    ]
+                    )
+
+
+class Quarantine:
+    """Append-only store of the non-compliant rows of every dataset.
+
+    The rows of a dataset are kept in the table rejects of {intermediate_path}/{key}_quarantine.duckdb,
+    with the hash of the row as primary key. New rows are inserted with INSERT OR IGNORE, so
+    a row which was already rejected in an earlier run is skipped by a lookup in the primary
+    key index and the cost of a write only depends on the number of new rows. Every dataset
+    has its own database file, so the worker processes of the parallel mode never share one.
+    """
+
+    TABLE = "rejects"
+
+    @staticmethod
+    def get_db_file(key: str, intermediate_path: str = path.get_intermediate_path()):
+        ''' database file of the quarantined rows of a dataset '''
+        return os.path.join(intermediate_path, f"{key}_quarantine.duckdb")
+
+    @staticmethod
+    def hash_rows(frame: pd.DataFrame):
+        """
+        Hash every row on a canonical form of its values.
+
+        The engines return the same row with other dtypes (int64 or float64 numbers, ns or us
+        timestamps, category, object or string text), so the columns are taken in sorted order,
+        numbers as float64, timestamps as datetime64[ns] and nulls as an empty string before
+        the values are hashed as text.
+
+        Args:
+            frame (pd.DataFrame): The rows to hash.
+
+        Returns:
+            np.ndarray: The uint64 hash of every row.
+        """
+        canonical = {}
+        for column in sorted(frame.columns, key=str):
+            values = frame[column]
+            if pd.api.types.is_numeric_dtype(values) and not pd.api.types.is_bool_dtype(values):
+                values = values.astype("float64")
+            elif pd.api.types.is_datetime64_any_dtype(values):
+                values = values.astype("datetime64[ns]")
+            canonical[column] = values.astype(str).where(values.notna(), "").astype(object)
+        return pd.util.hash_pandas_object(pd.DataFrame(canonical), index=False).to_numpy()
+
+    @staticmethod
+    def prepare(non_compliant_df: pd.DataFrame):
+        """
+        Add the row hash and the rejection time to the rows.
+
+        The categories are stored as text, a category column would otherwise become an
+        ENUM table column which rejects the values of later runs.
+
+        Args:
+            non_compliant_df (pd.DataFrame): The non-compliant rows.
+
+        Returns:
+            pd.DataFrame: The rows with the row_hash and rejected_at columns.
+        """
+        frame = non_compliant_df.reset_index(drop=True)
+        row_hash = Quarantine.hash_rows(frame)
+        categories = frame.select_dtypes("category").columns
+        frame = frame.astype({column: object for column in categories})
+        return frame.assign(row_hash=row_hash, rejected_at=pd.Timestamp.now())
+
+    @staticmethod
+    def insert(connection, frame: pd.DataFrame):
+        """
+        Insert the prepared rows which are not in the store yet.
+
+        Args:
+            connection (duckdb.DuckDBPyConnection): Connection to the store of the dataset.
+            frame (pd.DataFrame): Rows returned by Quarantine.prepare.
+
+        Returns:
+            int: Number of new rows.
+        """
+        connection.register("new_rejects", frame)
+        try:
+            connection.execute(f"CREATE TABLE IF NOT EXISTS {Quarantine.TABLE} AS SELECT * FROM new_rejects LIMIT 0")
+            constraints = connection.execute(
+                f"SELECT count(*) FROM duckdb_constraints() WHERE table_name = '{Quarantine.TABLE}' AND constraint_type = 'PRIMARY KEY'"
+            ).fetchone()[0]
+            if not constraints:
+                connection.execute(f"ALTER TABLE {Quarantine.TABLE} ADD PRIMARY KEY (row_hash)")
+
+            existing = {column for column, *_ in connection.execute(f"DESCRIBE {Quarantine.TABLE}").fetchall()}
+            for column, column_type, *_ in connection.execute("DESCRIBE new_rejects").fetchall():
+                if column not in existing:
+                    connection.execute(f'ALTER TABLE {Quarantine.TABLE} ADD COLUMN "{column}" {column_type}')
+
+            return connection.execute(
+                f"INSERT OR IGNORE INTO {Quarantine.TABLE} BY NAME SELECT * FROM new_rejects"
+            ).fetchone()[0]
+        finally:
+            connection.unregister("new_rejects")
+
+    @staticmethod
+    @Instrumentation.timed("quarantine")
+    def append(non_compliant_df: pd.DataFrame, key: str, intermediate_path: str = path.get_intermediate_path()):
+        """
+        Append the non-compliant rows of a dataset, skipping the rows already quarantined.
+
+        Args:
+            non_compliant_df (pd.DataFrame): DataFrame containing non-compliant data.
+            key (str): Name or identifier for the DataFrame.
+            intermediate_path (str, optional): Folder of the store. Defaults to path.get_intermediate_path().
+
+        Returns:
+            int: Number of new rows.
+        """
+        if non_compliant_df.empty:
+            return 0
+        os.makedirs(intermediate_path, exist_ok=True)
+        connection = duckdb.connect(Quarantine.get_db_file(key, intermediate_path))
+        try:
+            inserted = Quarantine.insert(connection, Quarantine.prepare(non_compliant_df))
+        finally:
+            connection.close()
+        logging.info(f"{inserted} new non-compliant rows of {key} quarantined, "
+                     f"{len(non_compliant_df) - inserted} were already known")
+        return inserted
+
+    @staticmethod
+    def read(key: str, intermediate_path: str = path.get_intermediate_path()):
+        """
+        Read the quarantined rows of a dataset.
+
+        Args:
+            key (str): Name or identifier of the dataset.
+            intermediate_path (str, optional): Folder of the store. Defaults to path.get_intermediate_path().
+
+        Returns:
+            pd.DataFrame: The quarantined rows, empty if the dataset has none.
+        """
+        db_file = Quarantine.get_db_file(key, intermediate_path)
+        if not os.path.exists(db_file):
+            return pd.DataFrame()
+        connection = duckdb.connect(db_file, read_only=True)
+        try:
+            return connection.execute(f"SELECT * FROM {Quarantine.TABLE} ORDER BY rejected_at").df()
+        finally:
+            connection.close()
+
+    @staticmethod
+    def compact(key: str, intermediate_path: str = path.get_intermediate_path(), older_than_days: int = None,
+                export: bool = False):
+        """
+        Compact the store of a dataset.
+
+        The legacy {key}_non_compliant.csv written by DataConvert.save_to_csv is imported and
+        removed, rows older than older_than_days are dropped, and the table is copied into a
+        fresh database file, since DuckDB does not give the space of deleted rows back.
+
+        Args:
+            key (str): Name or identifier of the dataset.
+            intermediate_path (str, optional): Folder of the store. Defaults to path.get_intermediate_path().
+            older_than_days (int, optional): Drop the rows rejected more than this many days ago.
+            export (bool, optional): Also export the rows to {key}_quarantine.parquet for inspection.
+
+        Returns:
+            int: Number of rows in the store after the compaction.
+        """
+        db_file = Quarantine.get_db_file(key, intermediate_path)
+        csv_file = os.path.join(intermediate_path, f"{key}_non_compliant.csv")
+        if os.path.exists(csv_file):
+            inserted = Quarantine.append(pd.read_csv(csv_file), key, intermediate_path)
+            os.remove(csv_file)
+            logging.info(f"Imported {inserted} rows of {csv_file} into the quarantine of {key}")
+        if not os.path.exists(db_file):
+            return 0
+
+        compact_file = f"{db_file}.compact"
+        if os.path.exists(compact_file):
+            os.remove(compact_file)
+        connection = duckdb.connect(db_file)
+        try:
+            if older_than_days is not None:
+                deleted = connection.execute(
+                    f"DELETE FROM {Quarantine.TABLE} WHERE rejected_at < now()::TIMESTAMP - INTERVAL {int(older_than_days)} DAY"
+                ).fetchone()[0]
+                logging.info(f"Dropped {deleted} quarantined rows of {key} older than {older_than_days} days")
+            connection.execute(f"ATTACH '{compact_file}' AS compact")
+            connection.execute(f"CREATE TABLE compact.{Quarantine.TABLE} AS SELECT * FROM {Quarantine.TABLE} LIMIT 0")
+            connection.execute(f"ALTER TABLE compact.{Quarantine.TABLE} ADD PRIMARY KEY (row_hash)")
+            connection.execute(f"INSERT INTO compact.{Quarantine.TABLE} SELECT * FROM {Quarantine.TABLE} ORDER BY rejected_at")
+            rows = connection.execute(f"SELECT count(*) FROM compact.{Quarantine.TABLE}").fetchone()[0]
+            if export:
+                parquet_file = os.path.join(intermediate_path, f"{key}_quarantine.parquet").replace(os.sep, "/")
+                connection.execute(f"COPY compact.{Quarantine.TABLE} TO '{parquet_file}' (FORMAT parquet)")
+            connection.execute("DETACH compact")
+        finally:
+            connection.close()
+        os.replace(compact_file, db_file)
+        logging.info(f"Compacted the quarantine of {key} to {rows} rows")
+        return rows
+
+    @staticmethod
+    def get_keys(intermediate_path: str = path.get_intermediate_path()):
+        ''' datasets with a quarantine store or a legacy non-compliant csv '''
+        keys = set()
+        for pattern, suffix in [("*_quarantine.duckdb", "_quarantine.duckdb"), ("*_non_compliant.csv", "_non_compliant.csv")]:
+            keys.update(os.path.basename(file_path)[:-len(suffix)]
+                        for file_path in glob.glob(os.path.join(intermediate_path, pattern)))
+        return sorted(keys)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Maintain the quarantine of the non-compliant rows")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    compact_parser = subparsers.add_parser("compact", help="import legacy csv files, drop old rows and reclaim space")
+    compact_parser.add_argument("--keys", nargs="+", help="datasets to compact, all by default")
+    compact_parser.add_argument("--older-than", type=int, help="drop the rows rejected more than this many days ago")
+    compact_parser.add_argument("--export", action="store_true", help="also export every quarantine to Parquet")
+    args = parser.parse_args()
+
+    for key in args.keys or Quarantine.get_keys():
+        rows = Quarantine.compact(key, older_than_days=args.older_than, export=args.export)
+        print(f"{key}: {rows} quarantined rows")
@@ -1,130 +1,254 @@
-from io import BytesIO
-import great_expectations as ge
-import duckdb
-import pandas as pd
-from creds import Creds
-import boto3
-import logging
-import os
-from paths import path
-from dotenv import load_dotenv
-
-load_dotenv()
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-    handlers=[
-        logging.FileHandler(
-            os.path.join(path.get_logs_path(), "data_reading.log")
-        ),
-        logging.StreamHandler(),
-    ],
-)
-
-
-class DataReading:
-    @staticmethod
-    def read_data(file_names: dict):
-        ''' takes the fie name and the location of the file to the csv format '''
-        data_frames = {}
-        for name, file_path in file_names.items():
-            data_frames[name] = ge.read_csv(file_path)
-        return data_frames
-
-    @staticmethod    
-    def read_data_from_db(file_path: str):
-        ''' Reads data from duckdb database file and return data frames'''
-        try:
-            connection = duckdb.connect(file_path)
-            tables = connection.execute("SHOW TABLES").fetchall()
-            
-            data_frames = {}
-            for table_name, in tables:
-                data_frames[table_name] = ge.read_sql(f"SELECT * FROM {table_name}", connection)
-            
-            return data_frames
-        
-        except Exception as e:
-            logging.info(f"Error reading data from duckdB: {e}")
-            raise
-        
-        finally:
-            if connection:
-                connection.close()
-
-    
-    @staticmethod
-    def read_data_aws(bucket_name):
-        
-        
-        s3 = boto3.client(
-            service_name=os.getenv("service_name"),
-            region_name=os.getenv("region_name"),
-            aws_access_key_id=Creds.get_Access_Key(),
-            aws_secret_access_key=Creds.get_Access_Secret_Key()
-        )
-        
-        data_dict = {}
-
-        try:
-            response = s3.list_objects_v2(Bucket=bucket_name)
-        except Exception as e:
-            logging.info(f"Error listing objects in bucket: {e}")
-            return data_dict
-        
-        for obj in response.get('Contents', []):
-            file_name = obj['Key']
-            file_type = file_name.split('.')[-1].lower()
-
-            try:
-                s3_object = s3.get_object(Bucket=bucket_name, Key=file_name)
-                file_stream = BytesIO(s3_object['Body'].read())
-                
-                if file_type == 'csv':
-                    df = pd.read_csv(file_stream)
-                elif file_type == 'parquet':
-                    df = pd.read_parquet(file_stream)
-                else:
-                    continue
-                
-                data_dict[file_name.lower()] = df
-            except Exception as e:
-                logging.info(f"Error reading object {file_name}: {e}")
-        
-        return data_dict
-    
-    @staticmethod
-    def upload_data_aws(output_dir: str, bucket_name: str):
-        s3 = boto3.client(
-            service_name=os.getenv("service_name"),
-            region_name=os.getenv("region_name"),
-            aws_access_key_id=Creds.get_Access_Key(),
-            aws_secret_access_key=Creds.get_Access_Secret_Key()
-        )
-        
-        try:
-           
-            for root, dirs, files in os.walk(output_dir):
-                for file_name in files:
-                    file_path = os.path.join(root, file_name)
-                    
-                    try:
-                        
-                        s3_key = os.path.relpath(file_path, output_dir)
-                        s3_key = s3_key.replace(os.path.sep, '/')
-                        
-                        
-                        s3.upload_file(file_path, bucket_name, s3_key)
-                        logging.info(f"Successfully uploaded {file_name} to bucket {bucket_name} with key {s3_key}.")
-                    
-                    except Exception as e:
-                        logging.info(f"Error uploading file {file_name}: {e}")
-        
-        except Exception as e:
-            logging.info(f"Error accessing directory {output_dir}: {e}")
-
-
-
-
-
-
+import duckdb
+import pandas as pd
+import logging
+import os
+from paths import path
+from data_schemas import DataSchemas
+from instrumentation import Instrumentation
+from dotenv import load_dotenv
+
+load_dotenv()
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    handlers=[
+        logging.FileHandler(
+            os.path.join(path.get_logs_path(), "data_reading.log")
+        ),
+        logging.StreamHandler(),
+    ],
+)
+
+
+class DataReading:
+    @staticmethod
+    @Instrumentation.timed("read")
+    def read_data(file_names: dict):
+        ''' takes the fie name and the location of the file to the csv format,
+        datasets with a schema in DataSchemas are read with their declared types '''
+        data_frames = {}
+        for name, file_path in file_names.items():
+            data_frames[name] = pd.read_csv(file_path, **DataSchemas.get_read_options(name))
+        return data_frames
+
+    @staticmethod
+    def read_data_in_batches(file_path: str, batch_size: int, read_options: dict = None):
+        '''
+        Read a csv file in fixed size row batches instead of loading the whole file.
+
+        Args:
+            file_path (str): Path of the csv file.
+            batch_size (int): Number of rows in each batch.
+            read_options (dict, optional): Extra read_csv options such as the dtypes.
+
+        Yields:
+            pd.DataFrame: The next batch of rows.
+        '''
+        with pd.read_csv(file_path, chunksize=batch_size, **(read_options or {})) as reader:
+            for batch in reader:
+                yield batch
+
+    @staticmethod
+    def quote(identifier: str):
+        ''' quote a table or column name for DuckDB '''
+        return '"' + identifier.replace('"', '""') + '"'
+
+    @staticmethod
+    def build_query(table_name: str, column_types: dict, columns: list = None, filters: dict = None,
+                    limit: int = None):
+        """
+        Build the SELECT of a table with its projection, predicate and limit.
+
+        The filter values are bound as parameters, cast to the type of their column.
+
+        Args:
+            table_name (str): Name of the table.
+            column_types (dict): Types of the columns of the table, keyed by lower case name.
+            columns (list, optional): Columns to read. Defaults to every column.
+            filters (dict, optional): Conditions keyed by column name, combined with AND. A list
+                or a set matches any of its values, a (low, high) tuple is an inclusive range
+                where None leaves a side open, any other value must be equal.
+            limit (int, optional): Maximum number of rows.
+
+        Returns:
+            tuple: The sql and its parameters.
+
+        Raises:
+            ValueError: If a column is not in the table.
+        """
+        unknown = [column for column in list(columns or []) + list(filters or {}) if column.lower() not in column_types]
+        if unknown:
+            raise ValueError(f"Columns {unknown} are not in {table_name}")
+
+        projection = ", ".join(DataReading.quote(column) for column in columns) if columns else "*"
+        sql = f"SELECT {projection} FROM {DataReading.quote(table_name)}"
+        conditions, params = [], []
+
+        def parameter(column, value):
+            params.append(value)
+            return f"CAST(? AS {column_types[column.lower()]})"
+
+        for column, condition in (filters or {}).items():
+            quoted = DataReading.quote(column)
+            if isinstance(condition, (list, set, frozenset)):
+                if not condition:
+                    conditions.append("false")
+                    continue
+                values = ", ".join(parameter(column, value) for value in condition)
+                conditions.append(f"{quoted} IN ({values})")
+            elif isinstance(condition, tuple):
+                low, high = condition
+                if low is not None:
+                    conditions.append(f"{quoted} >= {parameter(column, low)}")
+                if high is not None:
+                    conditions.append(f"{quoted} <= {parameter(column, high)}")
+            elif condition is None:
+                conditions.append(f"{quoted} IS NULL")
+            else:
+                conditions.append(f"{quoted} = {parameter(column, condition)}")
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        if limit is not None:
+            sql += f" LIMIT {int(limit)}"
+        return sql, params
+
+    @staticmethod
+    def get_column_types(connection, table_name: str):
+        ''' types of the columns of a table, keyed by lower case name '''
+        rows = connection.execute(
+            "SELECT column_name, data_type FROM duckdb_columns() WHERE table_name = ?", [table_name]
+        ).fetchall()
+        if not rows:
+            raise ValueError(f"Table {table_name} does not exist")
+        return {column.lower(): data_type for column, data_type in rows}
+
+    @staticmethod
+    def read_data_from_db(file_path: str, table_names: list = None, columns: list = None, filters: dict = None,
+                          limit: int = None, as_arrow: bool = False):
+        """
+        Read tables of a DuckDB database file on a read-only connection.
+
+        The projection, the filters and the limit are part of the query, so DuckDB only
+        scans the columns and the row groups they need and the other tables are not read.
+
+        Args:
+            file_path (str): Path of the database file.
+            table_names (list, optional): Tables to read. Defaults to every table.
+            columns (list, optional): Columns to read from each table. Defaults to every column.
+            filters (dict, optional): Conditions on the rows of each table, see build_query, e.g.
+                {"country_region": ["India"], "date": ("2020-03-01", "2020-03-31")}.
+            limit (int, optional): Maximum number of rows of each table.
+            as_arrow (bool, optional): Return Arrow tables instead of DataFrames.
+
+        Returns:
+            dict: Dictionary where keys are the table names and values are the data.
+        """
+        connection = None
+        try:
+            connection = duckdb.connect(file_path, read_only=True)
+            if table_names is None:
+                table_names = [table_name for table_name, in connection.execute("SHOW TABLES").fetchall()]
+
+            data_frames = {}
+            for table_name in table_names:
+                sql, params = DataReading.build_query(
+                    table_name, DataReading.get_column_types(connection, table_name), columns, filters, limit
+                )
+                result = connection.execute(sql, params)
+                data_frames[table_name] = result.to_arrow_table() if as_arrow else result.df()
+            return data_frames
+
+        except Exception as e:
+            logging.info(f"Error reading data from duckdB: {e}")
+            raise
+
+        finally:
+            if connection:
+                connection.close()
+
+    @staticmethod
+    def read_batches_from_db(file_path: str, table_name: str, columns: list = None, filters: dict = None,
+                             limit: int = None, batch_size: int = 100000):
+        """
+        Read a table of a DuckDB database file as a stream of Arrow record batches.
+
+        Only one batch is held in memory at a time. The connection is closed once the
+        batches are exhausted or the generator is closed.
+
+        Args:
+            file_path (str): Path of the database file.
+            table_name (str): Name of the table.
+            columns (list, optional): Columns to read. Defaults to every column.
+            filters (dict, optional): Conditions on the rows, see build_query.
+            limit (int, optional): Maximum number of rows.
+            batch_size (int, optional): Number of rows of each batch.
+
+        Yields:
+            pa.RecordBatch: The next batch of rows.
+        """
+        connection = duckdb.connect(file_path, read_only=True)
+        try:
+            sql, params = DataReading.build_query(
+                table_name, DataReading.get_column_types(connection, table_name), columns, filters, limit
+            )
+            reader = connection.execute(sql, params).to_arrow_reader(batch_size)
+            for batch in reader:
+                yield batch
+        finally:
+            connection.close()
+
+    @staticmethod
+    def read_data_aws(bucket_name, prefix: str = "", as_arrow: bool = False, use_cache: bool = None):
+        '''
+        Read every csv and Parquet object of a bucket concurrently through S3Transfer.
+        Objects whose ETag did not change since the last read come from the local S3Cache.
+
+        Args:
+            bucket_name (str): Name of the bucket.
+            prefix (str, optional): Only read the keys starting with this prefix.
+            as_arrow (bool, optional): Return the Arrow tables instead of DataFrames.
+            use_cache (bool, optional): Read through the local cache. Defaults to Config.get_s3_cache().
+
+        Returns:
+            dict: Dictionary where keys are the lower case object keys and values are the data.
+        '''
+        from s3_transfer import S3Transfer
+        from s3_cache import S3Cache
+        from config import Config
+
+        if use_cache is None:
+            use_cache = Config.get_s3_cache()
+        try:
+            tables = S3Transfer().read_tables(bucket_name, prefix, cache=S3Cache() if use_cache else None)
+        except Exception as e:
+            logging.info(f"Error listing objects in bucket: {e}")
+            return {}
+        return {key.lower(): table if as_arrow else table.to_pandas() for key, table in tables.items()}
+
+    @staticmethod
+    def upload_data_aws(output_dir: str, bucket_name: str, sync: bool = True, delete: bool = False,
+                        dry_run: bool = False):
+        '''
+        Upload the output to a bucket through S3Transfer.
+
+        Args:
+            output_dir (str): Directory to upload.
+            bucket_name (str): Name of the bucket.
+            sync (bool, optional): Only upload the Parquet files which are new or changed.
+                Set to False to upload every file of the directory.
+            delete (bool, optional): In sync mode, delete the remote Parquet files which no
+                longer exist locally.
+            dry_run (bool, optional): In sync mode, only report what would change.
+
+        Returns:
+            dict | list: The sync report in sync mode, otherwise the uploaded keys.
+        '''
+        from s3_transfer import S3Transfer
+
+        try:
+            if sync:
+                return S3Transfer().sync_directory(output_dir, bucket_name, delete=delete, dry_run=dry_run)
+            return S3Transfer().upload_directory(output_dir, bucket_name)
+        except Exception as e:
+            logging.info(f"Error accessing directory {output_dir}: {e}")
+            return {} if sync else []
@@ -0,0 +1,214 @@
+import os
+import logging
+from datetime import timedelta
+from paths import path
+from instrumentation import Instrumentation
+
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+                    handlers=[
+                        logging.FileHandler(os.path.join(path.get_logs_path(), "data_injection.log")),
+                        logging.StreamHandler()
+                    ])
+
+
+class DataRollups:
+    """Summary tables of covid_19_db, built from the loaded tables after every load.
+
+    Each entry of ROLLUPS holds:
+        sources (list): Tables the rollup reads. Their names appear in the sql as {table}
+            placeholders, which are replaced by the table or, in an incremental refresh, by
+            the rows of its recent dates.
+        date_column (str): Date column of the rollup.
+        lookback_days (int): Days before the first new date which the rolling windows and
+            the day over day differences of the new dates read.
+        sort_by (list): Order of the rows of a full rebuild.
+        sql (str): The query of the rollup.
+
+    A rollup is rebuilt in full when one of its sources was reloaded. When its sources only
+    got new dates appended (the delta ingest mode), only the dates after the last date of the
+    rollup are computed and inserted. SOURCE_DATES holds the date column of the time series
+    sources, the other sources (worldometer) are always read in full.
+    """
+
+    SOURCE_DATES = {"full_grouped": "date", "usa_county_wise": "Date"}
+
+    # worldometer names of the countries of full_grouped which are spelled differently
+    COUNTRY_ALIASES = {
+        "Brunei": "Brunei ",
+        "Burma": "Myanmar",
+        "Central African Republic": "CAR",
+        "Congo (Brazzaville)": "Congo",
+        "Congo (Kinshasa)": "DRC",
+        "Cote d'Ivoire": "Ivory Coast",
+        "Holy See": "Vatican City",
+        "Saint Vincent and the Grenadines": "St. Vincent Grenadines",
+        "South Korea": "S. Korea",
+        "Taiwan*": "Taiwan",
+        "US": "USA",
+        "United Arab Emirates": "UAE",
+        "United Kingdom": "UK",
+        "West Bank and Gaza": "Palestine",
+    }
+
+    ROLLUPS = {
+        "rollup_global_daily": {
+            "sources": ["full_grouped"],
+            "date_column": "date",
+            "lookback_days": 6,
+            "sort_by": ["date"],
+            "sql": """
+                SELECT *,
+                    avg(new_cases) OVER week AS new_cases_7d_avg,
+                    avg(new_deaths) OVER week AS new_deaths_7d_avg
+                FROM (
+                    SELECT date, sum(confirmed) AS confirmed, sum(deaths) AS deaths, sum(recovered) AS recovered,
+                        sum(active) AS active, sum(new_cases) AS new_cases, sum(new_deaths) AS new_deaths,
+                        sum(new_recovered) AS new_recovered, count(DISTINCT country_region) AS countries
+                    FROM {full_grouped}
+                    GROUP BY date
+                )
+                WINDOW week AS (ORDER BY date RANGE BETWEEN INTERVAL 6 DAYS PRECEDING AND CURRENT ROW)
+            """,
+        },
+        "rollup_region_daily": {
+            "sources": ["full_grouped"],
+            "date_column": "date",
+            "lookback_days": 6,
+            "sort_by": ["date", "who_region"],
+            "sql": """
+                SELECT *,
+                    avg(new_cases) OVER week AS new_cases_7d_avg,
+                    avg(new_deaths) OVER week AS new_deaths_7d_avg
+                FROM (
+                    SELECT date, who_region, sum(confirmed) AS confirmed, sum(deaths) AS deaths,
+                        sum(recovered) AS recovered, sum(active) AS active, sum(new_cases) AS new_cases,
+                        sum(new_deaths) AS new_deaths, count(DISTINCT country_region) AS countries
+                    FROM {full_grouped}
+                    GROUP BY date, who_region
+                )
+                WINDOW week AS (PARTITION BY who_region ORDER BY date RANGE BETWEEN INTERVAL 6 DAYS PRECEDING AND CURRENT ROW)
+            """,
+        },
+        "rollup_country_daily": {
+            "sources": ["full_grouped", "worldometer"],
+            "date_column": "date",
+            "lookback_days": 6,
+            "sort_by": ["country_region", "date"],
+            "sql": """
+                SELECT f.date, f.country_region, f.who_region, f.confirmed, f.deaths, f.new_cases, f.new_deaths,
+                    avg(f.new_cases) OVER week AS new_cases_7d_avg,
+                    avg(f.new_deaths) OVER week AS new_deaths_7d_avg,
+                    w.population,
+                    round(f.confirmed * 1e6 / w.population, 2) AS confirmed_per_million,
+                    round(f.deaths * 1e6 / w.population, 2) AS deaths_per_million,
+                    round(avg(f.new_cases) OVER week * 1e6 / w.population, 2) AS new_cases_7d_avg_per_million
+                FROM {full_grouped} AS f
+                LEFT JOIN {country_aliases} AS a ON a.country_region = f.country_region
+                LEFT JOIN {worldometer} AS w ON w.country_region = coalesce(a.worldometer_name, f.country_region)
+                WINDOW week AS (PARTITION BY f.country_region ORDER BY f.date RANGE BETWEEN INTERVAL 6 DAYS PRECEDING AND CURRENT ROW)
+            """,
+        },
+        "rollup_state_daily": {
+            "sources": ["usa_county_wise"],
+            "date_column": "date",
+            "lookback_days": 7,
+            "sort_by": ["province_state", "date"],
+            "sql": """
+                SELECT *,
+                    avg(new_cases) OVER week AS new_cases_7d_avg,
+                    avg(new_deaths) OVER week AS new_deaths_7d_avg
+                FROM (
+                    SELECT *,
+                        confirmed - lag(confirmed) OVER state AS new_cases,
+                        deaths - lag(deaths) OVER state AS new_deaths
+                    FROM (
+                        SELECT "Date" AS date, province_state, sum(confirmed) AS confirmed, sum(deaths) AS deaths,
+                            count(*) AS counties
+                        FROM {usa_county_wise}
+                        GROUP BY ALL
+                    )
+                    WINDOW state AS (PARTITION BY province_state ORDER BY date)
+                )
+                WINDOW week AS (PARTITION BY province_state ORDER BY date RANGE BETWEEN INTERVAL 6 DAYS PRECEDING AND CURRENT ROW)
+            """,
+        },
+    }
+
+    @staticmethod
+    def get_tables(connection):
+        return {table_name for table_name, in connection.execute("SELECT table_name FROM duckdb_tables()").fetchall()}
+
+    @staticmethod
+    def get_sql(name: str, since=None):
+        """
+        Get the query of a rollup.
+
+        Args:
+            name (str): Name of the rollup in ROLLUPS.
+            since (datetime, optional): Only compute the dates after this one, reading the
+                time series sources from lookback_days before it. Defaults to None, which
+                computes every date.
+
+        Returns:
+            str: The query.
+        """
+        rollup = DataRollups.ROLLUPS[name]
+        aliases = ", ".join(
+            "('" + country.replace("'", "''") + "', '" + alias.replace("'", "''") + "')"
+            for country, alias in DataRollups.COUNTRY_ALIASES.items()
+        )
+        sources = {"country_aliases": f"(SELECT * FROM (VALUES {aliases}) AS aliases(country_region, worldometer_name))"}
+        for source in rollup["sources"]:
+            date_column = DataRollups.SOURCE_DATES.get(source)
+            if since is None or date_column is None:
+                sources[source] = source
+            else:
+                start = since - timedelta(days=rollup["lookback_days"])
+                sources[source] = f"(SELECT * FROM {source} WHERE \"{date_column}\" >= TIMESTAMP '{start}')"
+        sql = rollup["sql"].format(**sources)
+        if since is not None:
+            return f"SELECT * FROM ({sql}) WHERE {rollup['date_column']} > TIMESTAMP '{since}'"
+        return f"{sql} ORDER BY {', '.join(rollup['sort_by'])}"
+
+    @staticmethod
+    def refresh(connection, changes: dict = None):
+        """
+        Rebuild or extend the rollups whose sources changed.
+
+        Args:
+            connection (duckdb.DuckDBPyConnection): Connection to the database, in a transaction
+                of the caller.
+            changes (dict, optional): The changed tables mapped to "reloaded" or "appended".
+                Defaults to None, which rebuilds every rollup.
+
+        Returns:
+            dict: The refreshed rollups mapped to "full" or "incremental".
+        """
+        tables = DataRollups.get_tables(connection)
+        refreshed = {}
+        for name, rollup in DataRollups.ROLLUPS.items():
+            changed = {source: changes[source] for source in rollup["sources"] if source in changes} if changes is not None else None
+            if changed == {}:
+                continue
+            missing = [source for source in rollup["sources"] if source not in tables]
+            if missing:
+                logging.info(f"Rollup {name} skipped, {missing} not loaded")
+                continue
+
+            incremental = (
+                name in tables and changed is not None
+                and all(change == "appended" and source in DataRollups.SOURCE_DATES for source, change in changed.items())
+            )
+            with Instrumentation.stage("rollup", dataset=name) as record:
+                if incremental:
+                    since = connection.execute(f"SELECT max({rollup['date_column']}) FROM {name}").fetchone()[0]
+                    incremental = since is not None
+                if incremental:
+                    connection.execute(f"INSERT INTO {name} BY NAME {DataRollups.get_sql(name, since)}")
+                else:
+                    connection.execute(f"CREATE OR REPLACE TABLE {name} AS {DataRollups.get_sql(name)}")
+                record["rows_out"] = connection.execute(f"SELECT count(*) FROM {name}").fetchone()[0]
+            refreshed[name] = "incremental" if incremental else "full"
+            logging.info(f"Rollup {name} refreshed ({refreshed[name]}), {record['rows_out']} rows")
+        return refreshed
@@ -0,0 +1,205 @@
+class DataRules:
+    """Cleaning rules of every dataset, keyed by the names in FileName.get_files_name().
+
+    Each entry holds:
+        rename (dict): Column names of the csv file mapped to the column names of the output.
+        fill_null (dict): Column names mapped to the value used to fill the null values.
+        drop_null (bool): Drop the rows which still have null values after filling.
+        non_negative (list): Columns where negative values are replaced by zero.
+        between (dict): Column names mapped to the (min, max) range of compliant values,
+            non-compliant rows are moved to the intermediate folder.
+        unique (list): Columns whose combined values should be unique, duplicates are logged.
+        date_column (str): The date column (after the rename) of the time series datasets,
+            None for the datasets which are not keyed by date.
+    """
+
+    @staticmethod
+    def get_rules():
+        return {
+            "country_wise": {
+                "rename": {
+                    "Country/Region": "country_region",
+                    "Confirmed": "confirmed",
+                    "Deaths": "deaths",
+                    "Recovered": "recovered",
+                    "Active": "active",
+                    "New cases": "new_cases",
+                    "New deaths": "new_deaths",
+                    "New recovered": "new_recovered",
+                    "Deaths / 100 Cases": "deaths_per_100_cases",
+                    "Recovered / 100 Cases": "recovered_per_100_cases",
+                    "Deaths / 100 Recovered": "deaths_per_100_recovered",
+                    "Confirmed last week": "confirmed_last_week",
+                    "1 week change": "one_week_change",
+                    "1 week % increase": "one_week_percent_increase",
+                    "WHO Region": "who_region",
+                },
+                "fill_null": {},
+                "drop_null": True,
+                "non_negative": ["one_week_change", "one_week_percent_increase"],
+                "between": {"deaths": (0, 81985000)},
+                "unique": ["country_region"],
+                "date_column": None,
+            },
+            "covid_19_clean": {
+                "rename": {
+                    "Province/State": "province_state",
+                    "Country/Region": "country_region",
+                    "Lat": "lat",
+                    "Long": "long",
+                    "Date": "Date",
+                    "Confirmed": "confirmed",
+                    "Deaths": "deaths",
+                    "Recovered": "recovered",
+                    "Active": "active",
+                    "WHO Region": "who_region",
+                },
+                "fill_null": {"province_state": "Unknown"},
+                "drop_null": False,
+                "non_negative": ["confirmed", "deaths", "recovered", "active"],
+                "between": {},
+                "unique": ["province_state", "country_region", "Date"],
+                "date_column": "Date",
+            },
+            "day_wise": {
+                "rename": {
+                    "Date": "date",
+                    "Confirmed": "confirmed",
+                    "Deaths": "deaths",
+                    "Recovered": "recovered",
+                    "Active": "active",
+                    "New cases": "new_cases",
+                    "New deaths": "new_deaths",
+                    "New recovered": "new_recovered",
+                    "Deaths / 100 Cases": "deaths_per_100_cases",
+                    "Recovered / 100 Cases": "recovered_per_100_cases",
+                    "Deaths / 100 Recovered": "deaths_per_100_recovered",
+                    "No. of countries": "no_of_countries",
+                },
+                "fill_null": {},
+                "drop_null": False,
+                "non_negative": [
+                    "confirmed",
+                    "deaths",
+                    "recovered",
+                    "active",
+                    "new_cases",
+                    "new_deaths",
+                    "new_recovered",
+                    "deaths_per_100_cases",
+                    "recovered_per_100_cases",
+                    "deaths_per_100_recovered",
+                    "no_of_countries",
+                ],
+                "between": {},
+                "unique": ["date"],
+                "date_column": "date",
+            },
+            "full_grouped": {
+                "rename": {
+                    "Date": "date",
+                    "Province/State": "province_state",
+                    "Country/Region": "country_region",
+                    "Confirmed": "confirmed",
+                    "Deaths": "deaths",
+                    "Recovered": "recovered",
+                    "Active": "active",
+                    "New cases": "new_cases",
+                    "New deaths": "new_deaths",
+                    "New recovered": "new_recovered",
+                    "WHO Region": "who_region",
+                },
+                "fill_null": {},
+                "drop_null": False,
+                "non_negative": [
+                    "confirmed",
+                    "deaths",
+                    "recovered",
+                    "active",
+                    "new_cases",
+                    "new_deaths",
+                    "new_recovered",
+                ],
+                "between": {},
+                "unique": ["date", "country_region"],
+                "date_column": "date",
+            },
+            "usa_county_wise": {
+                "rename": {
+                    "Province_State": "province_state",
+                    "Country_Region": "country_region",
+                    "Admin2": "admin2",
+                    "Admin3": "admin3",
+                    "Admin4": "admin4",
+                    "FIPS": "fips",
+                    "Combined_Key": "combined_key",
+                    "Lat": "lat",
+                    "Long_": "long",
+                    "Confirmed": "confirmed",
+                    "Deaths": "deaths",
+                    "Recovered": "recovered",
+                    "Active": "active",
+                },
+                "fill_null": {"fips": 0, "admin2": "unknown"},
+                "drop_null": False,
+                "non_negative": ["deaths"],
+                "between": {},
+                "unique": ["combined_key", "Date"],
+                "date_column": "Date",
+            },
+            "worldometer": {
+                "rename": {
+                    "Country/Region": "country_region",
+                    "WHO Region": "who_region",
+                    "Confirmed": "confirmed",
+                    "Continent": "continent",
+                    "Population": "population",
+                    "TotalCases": "total_cases",
+                    "Deaths": "deaths",
+                    "Recovered": "recovered",
+                    "Active": "active",
+                    "NewCases": "new_cases",
+                    "TotalDeaths": "total_deaths",
+                    "NewDeaths": "new_deaths",
+                    "TotalRecovered": "total_recovered",
+                    "NewRecovered": "new_recovered",
+                    "ActiveCases": "active_cases",
+                    "Serious,Critical": "serious_critical",
+                    "Tot Cases/1M pop": "total_cases_per_million",
+                    "Deaths/1M pop": "deaths_per_million",
+                    "TotalTests": "total_tests",
+                    "Tests/1M pop": "tests_per_million",
+                },
+                "fill_null": {
+                    "population": 0,
+                    "total_cases": 0,
+                    "new_cases": 0,
+                    "total_deaths": 0,
+                    "new_deaths": 0,
+                    "total_recovered": 0,
+                    "new_recovered": 0,
+                    "active_cases": 0,
+                    "serious_critical": 0,
+                    "total_cases_per_million": 0,
+                    "deaths_per_million": 0,
+                    "total_tests": 0,
+                    "tests_per_million": 0,
+                    "continent": "Unknown",
+                    "who_region": "Unknown",
+                },
+                "drop_null": False,
+                "non_negative": [
+                    "population",
+                    "total_cases",
+                    "new_cases",
+                    "total_deaths",
+                    "new_deaths",
+                    "total_recovered",
+                    "new_recovered",
+                    "active_cases",
+                ],
+                "between": {},
+                "unique": ["country_region"],
+                "date_column": None,
+            },
+        }
@@ -0,0 +1,146 @@
+class DataSchemas:
+    """Column types of every input csv, keyed by the names in FileName.get_files_name().
+
+    The column names are the names in the csv files (before the rename in DataRules).
+    Each entry holds:
+        dtype (dict): Column names mapped to their pandas dtype.
+        categories (list): Low cardinality text columns read as the category dtype.
+        dates (list): Columns parsed as dates.
+        date_format (str, optional): strftime format of the date columns.
+    """
+
+    @staticmethod
+    def get_schemas():
+        return {
+            "country_wise": {
+                "dtype": {
+                    "Confirmed": "int64",
+                    "Deaths": "int64",
+                    "Recovered": "int64",
+                    "Active": "int64",
+                    "New cases": "int64",
+                    "New deaths": "int64",
+                    "New recovered": "int64",
+                    "Deaths / 100 Cases": "float64",
+                    "Recovered / 100 Cases": "float64",
+                    "Deaths / 100 Recovered": "float64",
+                    "Confirmed last week": "int64",
+                    "1 week change": "int64",
+                    "1 week % increase": "float64",
+                },
+                "categories": ["Country/Region", "WHO Region"],
+                "dates": [],
+            },
+            "covid_19_clean": {
+                "dtype": {
+                    "Lat": "float64",
+                    "Long": "float64",
+                    "Confirmed": "int64",
+                    "Deaths": "int64",
+                    "Recovered": "int64",
+                    "Active": "int64",
+                },
+                "categories": ["Province/State", "Country/Region", "WHO Region"],
+                "dates": ["Date"],
+                "date_format": "%Y-%m-%d",
+            },
+            "day_wise": {
+                "dtype": {
+                    "Confirmed": "int64",
+                    "Deaths": "int64",
+                    "Recovered": "int64",
+                    "Active": "int64",
+                    "New cases": "int64",
+                    "New deaths": "int64",
+                    "New recovered": "int64",
+                    "Deaths / 100 Cases": "float64",
+                    "Recovered / 100 Cases": "float64",
+                    "Deaths / 100 Recovered": "float64",
+                    "No. of countries": "int64",
+                },
+                "categories": [],
+                "dates": ["Date"],
+                "date_format": "%Y-%m-%d",
+            },
+            "full_grouped": {
+                "dtype": {
+                    "Confirmed": "int64",
+                    "Deaths": "int64",
+                    "Recovered": "int64",
+                    "Active": "int64",
+                    "New cases": "int64",
+                    "New deaths": "int64",
+                    "New recovered": "int64",
+                },
+                "categories": ["Country/Region", "WHO Region"],
+                "dates": ["Date"],
+                "date_format": "%Y-%m-%d",
+            },
+            "usa_county_wise": {
+                "dtype": {
+                    "UID": "int64",
+                    "code3": "int64",
+                    "FIPS": "float64",
+                    "Lat": "float64",
+                    "Long_": "float64",
+                    "Confirmed": "int64",
+                    "Deaths": "int64",
+                },
+                "categories": [
+                    "iso2",
+                    "iso3",
+                    "Admin2",
+                    "Province_State",
+                    "Country_Region",
+                    "Combined_Key",
+                ],
+                "dates": ["Date"],
+                "date_format": "%m/%d/%y",
+            },
+            "worldometer": {
+                "dtype": {
+                    "Population": "float64",
+                    "TotalCases": "int64",
+                    "NewCases": "float64",
+                    "TotalDeaths": "float64",
+                    "NewDeaths": "float64",
+                    "TotalRecovered": "float64",
+                    "NewRecovered": "float64",
+                    "ActiveCases": "float64",
+                    "Serious,Critical": "float64",
+                    "Tot Cases/1M pop": "float64",
+                    "Deaths/1M pop": "float64",
+                    "TotalTests": "float64",
+                    "Tests/1M pop": "float64",
+                },
+                "categories": ["Continent", "WHO Region"],
+                "dates": [],
+            },
+        }
+
+    @staticmethod
+    def get_read_options(name: str, engine: str = "pyarrow"):
+        """
+        Get the pandas read_csv options which apply the schema of a dataset.
+
+        Args:
+            name (str): Name of the dataset.
+            engine (str, optional): The read_csv parser engine. Defaults to "pyarrow".
+
+        Returns:
+            dict: Keyword arguments for read_csv, empty if the dataset has no schema.
+        """
+        schema = DataSchemas.get_schemas().get(name)
+        if schema is None:
+            return {}
+
+        dtype = dict(schema["dtype"])
+        dtype.update({column: "category" for column in schema["categories"]})
+        options = {"dtype": dtype}
+        if engine:
+            options["engine"] = engine
+        if schema["dates"]:
+            options["parse_dates"] = schema["dates"]
+            if schema.get("date_format"):
+                options["date_format"] = schema["date_format"]
+        return options
@@ -0,0 +1,212 @@
+import os
+import shutil
+import logging
+import duckdb
+from paths import path
+from config import Config
+from data_layouts import DataLayouts
+from data_rules import DataRules
+from data_schemas import DataSchemas
+
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+                    handlers=[
+                        logging.FileHandler(os.path.join(path.get_logs_path(), "data_analysis.log")),
+                        logging.StreamHandler()
+                    ])
+
+
+class SqlEngine:
+    """Cleans the datasets inside DuckDB instead of pandas.
+
+    The rules of a dataset in DataRules are turned into one SELECT over read_csv, which is
+    written to Parquet with a single COPY statement. DuckDB runs the read, the cleaning and
+    the write multithreaded without the rows ever passing through pandas. The COPY follows
+    the sort order, row group size, compression and partitioning of the dataset in DataLayouts.
+    """
+
+    DUCKDB_TYPES = {"int64": "BIGINT", "float64": "DOUBLE", "category": "VARCHAR"}
+
+    @staticmethod
+    def quote(identifier: str):
+        ''' quote a column name for DuckDB '''
+        return '"' + identifier.replace('"', '""') + '"'
+
+    @staticmethod
+    def literal(value):
+        ''' render a python value as a DuckDB literal '''
+        if isinstance(value, str):
+            return "'" + value.replace("'", "''") + "'"
+        return repr(value)
+
+    @staticmethod
+    def build_source(name: str, file_path: str):
+        """
+        Build the read_csv call of a dataset with the types declared in DataSchemas.
+
+        Args:
+            name (str): Name of the dataset.
+            file_path (str): Path of the input csv file.
+
+        Returns:
+            str: The read_csv table function.
+        """
+        options = [SqlEngine.literal(file_path.replace(os.sep, "/")), "header = true"]
+        schema = DataSchemas.get_schemas().get(name)
+        if schema is not None:
+            types = {column: SqlEngine.DUCKDB_TYPES[dtype] for column, dtype in schema["dtype"].items()}
+            types.update({column: "VARCHAR" for column in schema["categories"]})
+            types.update({column: "DATE" for column in schema["dates"]})
+            options.append("types = {" + ", ".join(
+                f"{SqlEngine.literal(column)}: {SqlEngine.literal(column_type)}" for column, column_type in types.items()
+            ) + "}")
+            if schema.get("date_format"):
+                options.append(f"dateformat = {SqlEngine.literal(schema['date_format'])}")
+        return f"read_csv({', '.join(options)})"
+
+    @staticmethod
+    def build_query(name: str, file_path: str, connection):
+        """
+        Build the cleaning query of a dataset from its rules.
+
+        Args:
+            name (str): Name of the dataset in DataRules.get_rules().
+            file_path (str): Path of the input csv file.
+            connection (duckdb.DuckDBPyConnection): Connection used to read the csv header.
+
+        Returns:
+            tuple: The query of the cleaned rows and the condition the compliant rows fulfil
+                (None if the dataset has no range rules).
+        """
+        rules = DataRules.get_rules()[name]
+        schema = DataSchemas.get_schemas().get(name) or {"dates": []}
+        source = SqlEngine.build_source(name, file_path)
+        columns = [row[0] for row in connection.execute(f"DESCRIBE SELECT * FROM {source}").fetchall()]
+
+        select = []
+        for column in columns:
+            new_name = rules["rename"].get(column, column)
+            expression = SqlEngine.quote(column)
+            if column in schema["dates"]:
+                expression = f"CAST({expression} AS TIMESTAMP)"
+            if new_name in rules["fill_null"]:
+                expression = f"COALESCE({expression}, {SqlEngine.literal(rules['fill_null'][new_name])})"
+            if new_name in rules["non_negative"]:
+                expression = f"CASE WHEN {expression} < 0 THEN 0 ELSE {expression} END"
+            select.append(f"{expression} AS {SqlEngine.quote(new_name)}")
+
+        query = f"SELECT {', '.join(select)} FROM {source}"
+        if rules["drop_null"]:
+            query = f"SELECT * FROM ({query}) WHERE COLUMNS(*) IS NOT NULL"
+
+        conditions = [
+            f"{SqlEngine.quote(column)} BETWEEN {SqlEngine.literal(min_value)} AND {SqlEngine.literal(max_value)}"
+            for column, (min_value, max_value) in rules["between"].items()
+        ]
+        condition = f"COALESCE({' AND '.join(conditions)}, false)" if conditions else None
+        return query, condition
+
+    @staticmethod
+    def build_copy(name: str, query: str, columns: list, target: str, partitioned: bool, profile: str = None):
+        """
+        Build the COPY statement which writes the rows of a query with the layout of a dataset.
+
+        Args:
+            name (str): Name of the dataset in DataLayouts.
+            query (str): Query of the rows to write.
+            columns (list): Columns of the query.
+            target (str): The Parquet file, or the directory of the partitioned layout.
+            partitioned (bool): Write a hive partitioned directory by the partition columns of the layout.
+            profile (str, optional): Encoding profile to use instead of the one of the dataset.
+
+        Returns:
+            str: The COPY statement.
+        """
+        layout = DataLayouts.get_layout(name)
+        settings = DataLayouts.PROFILES[profile or layout["profile"]]
+        partition_by = layout["partition_by"] if partitioned else []
+        if "month" in partition_by and layout.get("month_of") in columns:
+            query = f"SELECT *, strftime({SqlEngine.quote(layout['month_of'])}, '%Y-%m') AS month FROM ({query})"
+        sort_by = [column for column in layout["sort_by"] if column in columns]
+        if sort_by:
+            query += " ORDER BY " + ", ".join(SqlEngine.quote(column) for column in sort_by)
+
+        options = ["FORMAT parquet", f"COMPRESSION {settings['compression']}",
+                   f"ROW_GROUP_SIZE {layout['row_group_size']}"]
+        if settings.get("compression_level"):
+            options.append(f"COMPRESSION_LEVEL {settings['compression_level']}")
+        if partition_by:
+            options.append("PARTITION_BY (" + ", ".join(SqlEngine.quote(column) for column in partition_by) + ")")
+        return f"COPY ({query}) TO {SqlEngine.literal(target)} ({', '.join(options)})"
+
+    @staticmethod
+    def clean_dataset(name: str, file_path: str, output_dir: str = path.get_output_path(),
+                      intermediate_path: str = path.get_intermediate_path(), threads: int = None,
+                      partitioned: bool = None, profile: str = None):
+        """
+        Clean a dataset and write it to Parquet with DuckDB.
+
+        The compliant rows go to {output_dir}/{name}.parquet, or to the hive partitioned
+        directory {output_dir}/{name}/ in the partitioned layout, and the rows outside the range
+        rules are appended to the quarantine of the dataset in intermediate_path.
+
+        Args:
+            name (str): Name of the dataset in DataRules.get_rules().
+            file_path (str): Path of the input csv file.
+            output_dir (str, optional): Directory path to save the Parquet file.
+            intermediate_path (str, optional): Folder of the quarantine of the non-compliant rows.
+            threads (int, optional): Number of DuckDB threads, defaults to all cores.
+            partitioned (bool, optional): Use the partitioned layout.
+                Defaults to Config.get_output_layout() == "partitioned".
+            profile (str, optional): Encoding profile of DataLayouts.PROFILES.
+                Defaults to Config.get_parquet_profile(), None uses the profile of the dataset.
+
+        Returns:
+            int: Number of rows written, None if the processing failed.
+        """
+        logging.info(f"==============Starting {name} DuckDB analysis==============")
+        if partitioned is None:
+            partitioned = Config.get_output_layout() == "partitioned"
+        partitioned = partitioned and bool(DataLayouts.get_layout(name)["partition_by"])
+        if profile is None:
+            profile = Config.get_parquet_profile()
+        connection = duckdb.connect()
+        try:
+            if threads:
+                connection.execute(f"SET threads = {int(threads)}")
+            query, condition = SqlEngine.build_query(name, file_path, connection)
+            os.makedirs(output_dir, exist_ok=True)
+
+            if condition is not None:
+                # the csv is read and cleaned once, both splits are copied from the temp table
+                connection.execute(f"CREATE TEMP TABLE cleaned AS {query}")
+                from data_quarantine import Quarantine
+                Quarantine.append(connection.execute(f"SELECT * FROM cleaned WHERE NOT {condition}").df(),
+                                  name, intermediate_path)
+                query = f"SELECT * FROM cleaned WHERE {condition}"
+
+            columns = [row[0] for row in connection.execute(f"DESCRIBE {query}").fetchall()]
+            dataset_dir = os.path.join(output_dir, name)
+            temp_dir = os.path.join(output_dir, f"_{name}.tmp")
+            output_path = os.path.join(output_dir, f"{name}.parquet")
+            copy = SqlEngine.build_copy(
+                name, query, columns, (temp_dir if partitioned else output_path).replace(os.sep, "/"),
+                partitioned, profile
+            )
+            if partitioned:
+                shutil.rmtree(temp_dir, ignore_errors=True)
+            rows = connection.execute(copy).fetchone()[0]
+
+            from data_conversion import DataConvert
+            if partitioned:
+                # swapped in once complete, like the partitioned output of the pandas engine
+                shutil.rmtree(dataset_dir, ignore_errors=True)
+                os.replace(temp_dir, dataset_dir)
+                output_path = dataset_dir
+            DataConvert.remove_output(name, output_dir, partitioned=not partitioned)
+            logging.info(f"Converted {rows} rows of {name} to Parquet at {output_path}")
+            return rows
+        except Exception as e:
+            logging.error(f"Error in the DuckDB analysis of {name}: {e}")
+        finally:
+            connection.close()
@@ -1,251 +1,354 @@
-import os
-import logging
-import pandas as pd
-from paths import path
-import great_expectations as ge
-
-
-
-
-# Configure logging
-logging.basicConfig(level=logging.INFO,
-                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-                    handlers=[
-                        logging.FileHandler(os.path.join(path.get_logs_path(), "data_validations.log")),
-                        logging.StreamHandler()
-                    ]
-                    )
-
-class Validate:
-
-    
-
-    @staticmethod
-    def fill_null_values(data_frame, columns_list_with_fill: dict):
-        """
-        Fill null values in specified columns of a DataFrame.
-
-        input:
-            data_frame (pd.DataFrame): The DataFrame containing null values.
-            columns_list_with_fill (dict): Dictionary where keys are column names and values are fill values.
-
-        output:
-            pd.DataFrame: DataFrame with null values filled.
-
-        """
-
-        for column, fill_value in columns_list_with_fill.items():
-            if column in data_frame.columns:
-                data_frame = data_frame.fillna({column: fill_value})
-            else:
-                print(f"Column '{column}' not found in DataFrame.")
-        
-        return data_frame
-
-
-    @staticmethod
-    def column_values_negative(data_frame_dict: dict, Columns: list):
-        '''
-        Replace negative values with zero in specified columns of DataFrames.
-
-        input:
-            data_frame_dict (dict): Dictionary of DataFrames where keys are names and values are DataFrames.
-            Columns (list): List of column names to check for negative values.
-
-        output:
-            pd.DataFrame: DataFrame with negative values replaced by zero.
-
-        '''
-        for key, df in data_frame_dict.items():
-            for col in Columns:
-                if col in df.columns:
-                    condition = df[col] < 0
-                
-                    if condition.any():
-                        logging.info(f"Found negative values in column '{col}'. Setting those values to zero.")
-                    
-                    # Replace negative values with zero
-                        df.loc[condition, col] = 0
-            return df
-
-    @staticmethod
-    def dimensions(data_frame_dict: dict):
-        """
-         gives the dimensions (shape) of each DataFrame
-
-        input:
-            data_frame_dict (dict): Dictionary of DataFrames where keys are names and values are DataFrames.
-
-        output:
-            return the shape of the dataframe
-        """
-        for key, data_frame in data_frame_dict.items():
-            logging.info(f'Size of {key} is {data_frame.shape}')
-
-
-    @staticmethod
-    def check_null_get_col_list(data_frame: pd.DataFrame):
-        """
-        Get a list of columns with null values in a DataFrame.
-
-        Args:
-            data_frame (pd.DataFrame): The DataFrame to check.
-
-        Returns:
-            list: List of column names with null values.
-        """
-        null_dict=dict(data_frame.isnull().sum())
-        null_cols=[]
-        for name,sum in null_dict.items():
-            if sum > 0:
-                null_cols.append(name)
-        return null_cols
-    
-    @staticmethod
-    def check_null(data_frame_dict: dict):
-        """
-        Log the number of null values in each DataFrame in a dictionary.
-
-        input:
-            data_frame_dict (dict): Dictionary of DataFrames where keys are names and values are DataFrames.
-
-        output:
-            returns dictionary of keys as column names and null sum as values
-
-        """
-
-        for key, data_frame in data_frame_dict.items():
-            logging.info(f'Null values in {key}:\n{data_frame.isnull().sum()}')
-
-        return {data_frame.isnull().sum()}
-
-    @staticmethod
-    def column_value_unique(data_frame_dict: dict, column_name: str):
-
-        """
-        Check if all values in a column across multiple DataFrames are unique.
-
-        Args:
-            data_frame_dict (dict): Dictionary of DataFrames where keys are names and values are DataFrames.
-            column_name (str): Name of the column to check.
-
-        """
-
-        for key, data_frame in data_frame_dict.items():
-            is_unique = data_frame[column_name].is_unique
-            logging.info(f'Column "{column_name}" in {key} has all unique values: {is_unique}')
-
-
-    @staticmethod
-    def column_values_between(data_frame_dict: dict, column_name: str, min_value: int, max_value: int, intermediate_path: str=None):
-        """
-         Check if values in a column of DataFrames are within a specified range.
-        Non-compliant rows are saved to CSV.
-
-        Args:
-            data_frame_dict (dict): Dictionary of DataFrames where keys are names and values are DataFrames.
-            column_name (str): Name of the column to check.
-            min_value (int): Minimum acceptable value.
-            max_value (int): Maximum acceptable value.
-            intermediate_path (str, optional): Path to save non-compliant rows.
-
-        Returns:
-            pd.DataFrame: DataFrame with compliant rows.
-        """
-
-        for key, data_frame in data_frame_dict.items():
-            condition = data_frame[column_name].between(min_value, max_value)
-            if condition.all():
-                logging.info(f'All values in column "{column_name}" of {key} are between {min_value} and {max_value}.')
-            else:
-                logging.info(f'Not all values in column "{column_name}" of {key} are between {min_value} and {max_value}.')
-                non_compliant_df = data_frame[~condition]
-                data_frame=data_frame[condition]
-                Validate.data_convert.save_to_csv(non_compliant_df, key, intermediate_path)
-        
-        return data_frame
-    
-
-    @staticmethod
-    def multiple_column_values_between(data_frame_dict: dict, column_names: list, min_value: int, max_value: int, intermediate_path: str):
-        
-        """
-        Check if values in multiple columns of DataFrames are within a specified range.
-        Non-compliant rows are saved to CSV.
-
-        Args:
-            data_frame_dict (dict): Dictionary of DataFrames where keys are names and values are DataFrames.
-            column_names (list): List of column names to check.
-            min_value (int): Minimum acceptable value.
-            max_value (int): Maximum acceptable value.
-            intermediate_path (str): Path to save non-compliant rows.
-
-        Returns:
-            pd.DataFrame: DataFrame with compliant rows.
-
-        """
-
-        for key, data_frame in data_frame_dict.items():
-            for column in column_names:
-                condition = data_frame[column].between(min_value, max_value)
-                if condition.all():
-                    logging.info(f'All values in column "{column}" of {key} are between {min_value} and {max_value}.')
-                else:
-                    logging.info(f'Not all values in column "{column}" of {key} are between {min_value} and {max_value}.')
-                    non_compliant_df = data_frame[~condition]
-                    data_frame=data_frame[condition]
-                    Validate.save_to_csv(non_compliant_df, key, intermediate_path)
-            return data_frame
-    @staticmethod
-    def check_null_sum(data_frame):
-        """
-        Calculate the total number of null values in a DataFrame.
-
-        Args:
-            data_frame (pd.DataFrame): The DataFrame to check.
-
-        Returns:
-            int: Total number of null values.
-
-        """
-
-        null_values=data_frame.isnull().sum()
-        return null_values.sum()
-    
-    @staticmethod
-    def validate_column_types(data_frame: pd.DataFrame, columns_to_check: list):
-
-        """
-        Validate and convert column types in a DataFrame.
-
-        Args:
-            data_frame (pd.DataFrame): The DataFrame to validate.
-            columns_to_check (list): List of column names to check and potentially convert.
-
-        Returns:
-            pd.DataFrame: DataFrame with potentially converted column types.
-
-        """
-        ge_df = ge.from_pandas(data_frame)
-        updated = False
-        for column in columns_to_check:
-            result = ge_df.expect_column_values_to_be_in_type_list(column, ['int', 'float', 'str','datetime'])
-            if not result['success']:
-                logging.info(f'Column "{column}" has incorrect type. Attempting to convert.')
-                try:
-                    data_frame[column] = pd.to_numeric(data_frame[column], errors='coerce')
-                    updated = True
-                    logging.info(f'Column "{column}" converted to numeric type.')
-                except Exception as e:
-                    logging.error(f'Error converting column "{column}": {e}')
-        if updated:
-            ge_df = ge.from_pandas(data_frame)
-            logging.info(f'Updated DataFrame with converted column types.')
-        validation_results = ge_df.validate()
-        logging.info(validation_results)
-        return data_frame
-    
-
-   
-        
-
+import os
+import logging
+import numpy as np
+import pandas as pd
+from paths import path
+from data_conversion import DataConvert
+from data_expectations import Expectations
+from instrumentation import Instrumentation
+
+
+
+
+# Configure logging
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+                    handlers=[
+                        logging.FileHandler(os.path.join(path.get_logs_path(), "data_validations.log")),
+                        logging.StreamHandler()
+                    ]
+                    )
+
+class Validate:
+
+    # bits of the per row violation mask returned by apply_rule_set
+    NULL_VALUE = 1
+    NEGATIVE_VALUE = 2
+    OUT_OF_RANGE = 4
+    DUPLICATE = 8
+
+    @staticmethod
+    @Instrumentation.timed("validation")
+    def apply_rule_set(data_frame: pd.DataFrame, rule_set: dict):
+        """
+        Apply a declarative rule set to a DataFrame in one vectorized pass.
+
+        The numeric columns named by the rules are copied once into a NumPy block and every
+        rule is evaluated on that block with broadcasting, instead of building a mask and a
+        copy of the frame for every column.
+
+        Args:
+            data_frame (pd.DataFrame): The DataFrame to validate.
+            rule_set (dict): The rules, any of:
+                fill_null (dict): Column names mapped to the value used to fill the null values.
+                non_negative (list): Columns where negative values are replaced by zero.
+                between (dict): Column names mapped to the (min, max) range of compliant values,
+                    rows outside the range are removed.
+                unique (list): Columns whose combined values should be unique, duplicates are flagged.
+
+        Returns:
+            tuple: The cleaned DataFrame, a NumPy array with the violation bits
+                (NULL_VALUE, NEGATIVE_VALUE, OUT_OF_RANGE, DUPLICATE) of every input row,
+                and a dictionary with the number of violations of every rule and column.
+        """
+        columns = data_frame.columns
+        fill_null = {column: value for column, value in rule_set.get("fill_null", {}).items() if column in columns}
+        non_negative = [column for column in rule_set.get("non_negative", []) if column in columns]
+        between = {column: limits for column, limits in rule_set.get("between", {}).items() if column in columns}
+        unique = [column for column in rule_set.get("unique", []) if column in columns]
+
+        numeric_columns = [
+            column for column in dict.fromkeys(list(fill_null) + non_negative + list(between))
+            if pd.api.types.is_numeric_dtype(data_frame[column]) and not pd.api.types.is_bool_dtype(data_frame[column])
+        ]
+        text_fill = {column: value for column, value in fill_null.items() if column not in numeric_columns}
+
+        rows = len(data_frame)
+        violations = np.zeros(rows, dtype=np.uint8)
+        counts = {}
+
+        # one copy of the numeric columns, every rule is a vector over the columns
+        block = data_frame[numeric_columns].to_numpy(dtype="float64", na_value=np.nan)
+        fill_vector = np.array([fill_null.get(column, np.nan) for column in numeric_columns], dtype="float64")
+        non_negative_vector = np.array([column in non_negative for column in numeric_columns], dtype=bool)
+        min_vector = np.array([between.get(column, (-np.inf, np.inf))[0] for column in numeric_columns], dtype="float64")
+        max_vector = np.array([between.get(column, (-np.inf, np.inf))[1] for column in numeric_columns], dtype="float64")
+        range_vector = np.array([column in between for column in numeric_columns], dtype=bool)
+
+        null_mask = np.isnan(block) & ~np.isnan(fill_vector)
+        block = np.where(null_mask, fill_vector, block)
+        negative_mask = (block < 0) & non_negative_vector
+        block = np.where(negative_mask, 0, block)
+        with np.errstate(invalid="ignore"):
+            out_of_range_mask = ~((block >= min_vector) & (block <= max_vector)) & range_vector
+
+        violations[null_mask.any(axis=1)] |= Validate.NULL_VALUE
+        violations[negative_mask.any(axis=1)] |= Validate.NEGATIVE_VALUE
+        violations[out_of_range_mask.any(axis=1)] |= Validate.OUT_OF_RANGE
+        for position, column in enumerate(numeric_columns):
+            if column in fill_null:
+                counts[f"not_null:{column}"] = int(null_mask[:, position].sum())
+            if column in non_negative:
+                counts[f"non_negative:{column}"] = int(negative_mask[:, position].sum())
+            if column in between:
+                counts[f"between:{column}"] = int(out_of_range_mask[:, position].sum())
+
+        # write back only the columns which changed, keeping their dtypes
+        changed = null_mask.any(axis=0) | negative_mask.any(axis=0)
+        updates = {
+            column: block[:, position].astype(data_frame[column].dtype)
+            for position, column in enumerate(numeric_columns) if changed[position]
+        }
+        df = data_frame.assign(**updates) if updates else data_frame
+
+        if text_fill:
+            text_nulls = df[list(text_fill)].isna()
+            violations[text_nulls.to_numpy().any(axis=1)] |= Validate.NULL_VALUE
+            counts.update({f"not_null:{column}": int(count) for column, count in text_nulls.sum().items()})
+            df = Validate.fill_null_values(df, text_fill)
+
+        if unique:
+            duplicated = df.duplicated(subset=unique).to_numpy()
+            violations[duplicated] |= Validate.DUPLICATE
+            counts[f"unique:{','.join(unique)}"] = int(duplicated.sum())
+
+        keep = (violations & Validate.OUT_OF_RANGE) == 0
+        if not keep.all():
+            df = df[keep]
+        return df, violations, counts
+
+    @staticmethod
+    @Instrumentation.timed("null_handling")
+    def fill_null_values(data_frame, columns_list_with_fill: dict):
+        """
+        Fill null values in specified columns of a DataFrame.
+
+        input:
+            data_frame (pd.DataFrame): The DataFrame containing null values.
+            columns_list_with_fill (dict): Dictionary where keys are column names and values are fill values.
+
+        output:
+            pd.DataFrame: DataFrame with null values filled.
+
+        """
+
+        fill_values = {}
+        categories = {}
+        for column, fill_value in columns_list_with_fill.items():
+            if column in data_frame.columns:
+                if isinstance(data_frame[column].dtype, pd.CategoricalDtype) and fill_value not in data_frame[column].cat.categories:
+                    categories[column] = data_frame[column].cat.add_categories([fill_value])
+                fill_values[column] = fill_value
+            else:
+                print(f"Column '{column}' not found in DataFrame.")
+
+        # the categories are added on a new frame, the caller's frame is left as it is
+        if categories:
+            data_frame = data_frame.assign(**categories)
+        # a single fillna call fills every column at once
+        if fill_values:
+            data_frame = data_frame.fillna(fill_values)
+        return data_frame
+
+
+    @staticmethod
+    def column_values_negative(data_frame_dict: dict, Columns: list):
+        '''
+        Replace negative values with zero in specified columns of DataFrames.
+
+        input:
+            data_frame_dict (dict): Dictionary of DataFrames where keys are names and values are DataFrames.
+            Columns (list): List of column names to check for negative values.
+
+        output:
+            pd.DataFrame: DataFrame with negative values replaced by zero.
+
+        '''
+        for key, df in data_frame_dict.items():
+            # Replace negative values with zero in a single pass over the columns
+            df, _, counts = Validate.apply_rule_set(df, {"non_negative": Columns})
+            for rule, count in counts.items():
+                if count:
+                    logging.info(f"Found negative values in column '{rule.split(':', 1)[1]}'. Setting those values to zero.")
+            return df
+
+    @staticmethod
+    def dimensions(data_frame_dict: dict):
+        """
+         gives the dimensions (shape) of each DataFrame
+
+        input:
+            data_frame_dict (dict): Dictionary of DataFrames where keys are names and values are DataFrames.
+
+        output:
+            return the shape of the dataframe
+        """
+        for key, data_frame in data_frame_dict.items():
+            logging.info(f'Size of {key} is {data_frame.shape}')
+
+
+    @staticmethod
+    def check_null_get_col_list(data_frame: pd.DataFrame):
+        """
+        Get a list of columns with null values in a DataFrame.
+
+        Args:
+            data_frame (pd.DataFrame): The DataFrame to check.
+
+        Returns:
+            list: List of column names with null values.
+        """
+        return data_frame.columns[data_frame.isnull().any()].tolist()
+    
+    @staticmethod
+    def check_null(data_frame_dict: dict):
+        """
+        Log the number of null values in each DataFrame in a dictionary.
+
+        input:
+            data_frame_dict (dict): Dictionary of DataFrames where keys are names and values are DataFrames.
+
+        output:
+            returns dictionary of keys as column names and null sum as values
+
+        """
+
+        for key, data_frame in data_frame_dict.items():
+            logging.info(f'Null values in {key}:\n{data_frame.isnull().sum()}')
+
+        return {data_frame.isnull().sum()}
+
+    @staticmethod
+    def column_value_unique(data_frame_dict: dict, column_name: str):
+
+        """
+        Check if all values in a column across multiple DataFrames are unique.
+
+        Args:
+            data_frame_dict (dict): Dictionary of DataFrames where keys are names and values are DataFrames.
+            column_name (str): Name of the column to check.
+
+        """
+
+        for key, data_frame in data_frame_dict.items():
+            is_unique = data_frame[column_name].is_unique
+            logging.info(f'Column "{column_name}" in {key} has all unique values: {is_unique}')
+
+
+    @staticmethod
+    def column_values_between(data_frame_dict: dict, column_name: str, min_value: int, max_value: int, intermediate_path: str=None):
+        """
+         Check if values in a column of DataFrames are within a specified range.
+        Non-compliant rows are saved to CSV.
+
+        Args:
+            data_frame_dict (dict): Dictionary of DataFrames where keys are names and values are DataFrames.
+            column_name (str): Name of the column to check.
+            min_value (int): Minimum acceptable value.
+            max_value (int): Maximum acceptable value.
+            intermediate_path (str, optional): Path to save non-compliant rows.
+
+        Returns:
+            pd.DataFrame: DataFrame with compliant rows.
+        """
+
+        return Validate.multiple_column_values_between(data_frame_dict, [column_name], min_value, max_value, intermediate_path)
+    
+
+    @staticmethod
+    def multiple_column_values_between(data_frame_dict: dict, column_names: list, min_value: int, max_value: int, intermediate_path: str):
+        
+        """
+        Check if values in multiple columns of DataFrames are within a specified range.
+        Non-compliant rows are saved to CSV.
+
+        Args:
+            data_frame_dict (dict): Dictionary of DataFrames where keys are names and values are DataFrames.
+            column_names (list): List of column names to check.
+            min_value (int): Minimum acceptable value.
+            max_value (int): Maximum acceptable value.
+            intermediate_path (str): Path to save non-compliant rows.
+
+        Returns:
+            pd.DataFrame: DataFrame with compliant rows.
+
+        """
+
+        for key, data_frame in data_frame_dict.items():
+            # every column is checked in the same pass, the failing rows are saved once
+            rule_set = {"between": {column: (min_value, max_value) for column in column_names}}
+            compliant_df, violations, counts = Validate.apply_rule_set(data_frame, rule_set)
+            for rule, count in counts.items():
+                column = rule.split(':', 1)[1]
+                if count:
+                    logging.info(f'Not all values in column "{column}" of {key} are between {min_value} and {max_value}.')
+                else:
+                    logging.info(f'All values in column "{column}" of {key} are between {min_value} and {max_value}.')
+            if len(compliant_df) < len(data_frame):
+                non_compliant_df = data_frame[(violations & Validate.OUT_OF_RANGE) != 0]
+                DataConvert.save_non_compliant(non_compliant_df, key, intermediate_path)
+            return compliant_df
+    @staticmethod
+    def check_null_sum(data_frame):
+        """
+        Calculate the total number of null values in a DataFrame.
+
+        Args:
+            data_frame (pd.DataFrame): The DataFrame to check.
+
+        Returns:
+            int: Total number of null values.
+
+        """
+
+        null_values=data_frame.isnull().sum()
+        return null_values.sum()
+    
+    @staticmethod
+    def validate_column_types(data_frame: pd.DataFrame, columns_to_check: list):
+
+        """
+        Validate and convert column types in a DataFrame.
+        Columns already read with a numeric, date or category type are not checked again.
+
+        Args:
+            data_frame (pd.DataFrame): The DataFrame to validate.
+            columns_to_check (list): List of column names to check and potentially convert.
+
+        Returns:
+            pd.DataFrame: DataFrame with potentially converted column types.
+
+        """
+        updated = False
+        for column in columns_to_check:
+            column_type = data_frame[column].dtype
+            if (pd.api.types.is_numeric_dtype(column_type)
+                    or pd.api.types.is_datetime64_any_dtype(column_type)
+                    or isinstance(column_type, pd.CategoricalDtype)):
+                continue
+            expectation = Expectations.expectation("expect_column_values_to_be_in_type_list", column=column,
+                                                   type_list=['int', 'float', 'str', 'datetime'])
+            result = Expectations.run(data_frame[[column]], [expectation])
+            if not result['success']:
+                logging.info(f'Column "{column}" has incorrect type. Attempting to convert.')
+                try:
+                    data_frame[column] = pd.to_numeric(data_frame[column], errors='coerce')
+                    updated = True
+                    logging.info(f'Column "{column}" converted to numeric type.')
+                except Exception as e:
+                    logging.error(f'Error converting column "{column}": {e}')
+        if updated:
+            logging.info(f'Updated DataFrame with converted column types.')
+        expectations = [
+            Expectations.expectation("expect_column_values_to_be_in_type_list", column=column,
+                                     type_list=['int', 'float', 'str', 'datetime'])
+            for column in columns_to_check
+        ]
+        validation_results = Expectations.run(data_frame, expectations)
+        logging.info(validation_results["statistics"])
+        return data_frame
+    
+
+   
+        
+
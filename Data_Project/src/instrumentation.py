@@ -0,0 +1,237 @@
+import os
+import sys
+import json
+import time
+import logging
+import functools
+import threading
+import contextvars
+from contextlib import contextmanager
+from datetime import datetime
+from paths import path
+
+try:
+    import resource
+except ImportError:  # not available on Windows, the memory figures are left empty there
+    resource = None
+
+
+class Instrumentation:
+    """Wall time, CPU time, peak memory and row counts of the pipeline stages.
+
+    Every stage run inside Instrumentation.stage (or a function decorated with
+    Instrumentation.timed) appends a record to the list of the enclosing
+    Instrumentation.collect block, or to Instrumentation.records outside of one. The records
+    of the datasets processed in worker processes are returned with their results and merged
+    by the main process, which writes them as a json run report next to the logs.
+
+    The enclosing stage, dataset and collect block are context variables. Threads only see
+    them when their tasks run in a copy of the submitting context, see Instrumentation.in_context.
+
+    Each record holds the stage, the dataset and the parent stage, the wall and CPU seconds,
+    the increase of the peak RSS of the process in bytes and the rows in and out.
+    """
+
+    records = []
+    _lock = threading.Lock()
+    _collector = contextvars.ContextVar("collector", default=None)
+    _dataset = contextvars.ContextVar("dataset", default=None)
+    _parent = contextvars.ContextVar("parent", default=None)
+
+    @staticmethod
+    def get_peak_rss():
+        ''' peak resident memory of the process in bytes, None where resource is not available '''
+        if resource is None:
+            return None
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+        return peak if sys.platform == "darwin" else peak * 1024
+
+    @staticmethod
+    def count_rows(value):
+        ''' rows of a DataFrame or Arrow table, of all the values of a dict, or of the first item of a tuple,
+        a returned int is taken as a number of rows '''
+        if isinstance(value, int) and not isinstance(value, bool):
+            return value
+        if isinstance(value, dict):
+            counts = [Instrumentation.count_rows(item) for item in value.values()]
+            return sum(counts) if counts and None not in counts else None
+        if isinstance(value, tuple):
+            return Instrumentation.count_rows(value[0]) if value else None
+        if hasattr(value, "num_rows"):
+            return value.num_rows
+        if hasattr(value, "shape") and hasattr(value, "columns"):
+            return len(value)
+        return None
+
+    @staticmethod
+    @contextmanager
+    def stage(name: str, dataset: str = None, rows_in: int = None):
+        """
+        Measure a stage of the pipeline.
+
+        Args:
+            name (str): Name of the stage, such as "read" or "write_parquet".
+            dataset (str, optional): Dataset of the stage. Defaults to the dataset of the
+                enclosing stage.
+            rows_in (int, optional): Number of rows the stage starts with.
+
+        Yields:
+            dict: The record of the stage, the caller can set its "rows_out".
+        """
+        dataset = dataset or Instrumentation._dataset.get()
+        record = {
+            "stage": name,
+            "dataset": dataset,
+            "parent": Instrumentation._parent.get(),
+            "rows_in": rows_in,
+            "rows_out": None,
+        }
+        dataset_token = Instrumentation._dataset.set(dataset)
+        parent_token = Instrumentation._parent.set(name)
+        peak_rss = Instrumentation.get_peak_rss()
+        cpu_start = time.process_time()
+        wall_start = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record["wall_seconds"] = round(time.perf_counter() - wall_start, 6)
+            record["cpu_seconds"] = round(time.process_time() - cpu_start, 6)
+            record["peak_rss_delta_bytes"] = (
+                Instrumentation.get_peak_rss() - peak_rss if peak_rss is not None else None
+            )
+            Instrumentation._dataset.reset(dataset_token)
+            Instrumentation._parent.reset(parent_token)
+            Instrumentation.add(record)
+            logging.debug(f"Stage {name} of {dataset} took {record['wall_seconds']}s")
+
+    @staticmethod
+    def add(record: dict):
+        ''' append a record to the list of the enclosing collect block, or to Instrumentation.records '''
+        collected = Instrumentation._collector.get()
+        with Instrumentation._lock:
+            (Instrumentation.records if collected is None else collected).append(record)
+
+    @staticmethod
+    def in_context(function, *args, **kwargs):
+        """
+        Wrap a call in a copy of the current context, to submit it to a thread executor.
+
+        The stages run by the call keep the dataset, the parent stage and the collect block
+        of the caller. Every task needs its own copy, a context cannot run in two threads at once.
+
+        Args:
+            function (function): The function to call.
+            *args: Positional arguments of the call.
+            **kwargs: Keyword arguments of the call.
+
+        Returns:
+            function: A function without arguments which makes the call.
+        """
+        return functools.partial(contextvars.copy_context().run, function, *args, **kwargs)
+
+    @staticmethod
+    def timed(name: str):
+        """
+        Decorator measuring every call of a function as a stage.
+
+        The rows in are counted on the first argument and the rows out on the return value.
+
+        Args:
+            name (str): Name of the stage.
+
+        Returns:
+            function: The decorator.
+        """
+        def decorator(function):
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                rows_in = Instrumentation.count_rows(args[0]) if args else None
+                with Instrumentation.stage(name, rows_in=rows_in) as record:
+                    result = function(*args, **kwargs)
+                    record["rows_out"] = Instrumentation.count_rows(result)
+                    return result
+            return wrapper
+        return decorator
+
+    @staticmethod
+    @contextmanager
+    def collect():
+        """
+        Collect the records of the stages run inside the block, instead of in Instrumentation.records.
+
+        The stages of other threads and tasks are only collected when they run in a copy of
+        the context of the block.
+
+        Yields:
+            list: The records of the stages run inside the block.
+        """
+        collected = []
+        token = Instrumentation._collector.set(collected)
+        try:
+            yield collected
+        finally:
+            Instrumentation._collector.reset(token)
+
+    @staticmethod
+    def drain():
+        ''' remove and return the records collected so far '''
+        with Instrumentation._lock:
+            records = Instrumentation.records[:]
+            del Instrumentation.records[:]
+        return records
+
+    @staticmethod
+    def summarize(records: list):
+        """
+        Sum the records of every stage.
+
+        Args:
+            records (list): The stage records.
+
+        Returns:
+            dict: Totals keyed by stage with the calls, wall and CPU seconds, the largest peak
+                RSS increase and the rows out.
+        """
+        summary = {}
+        for record in records:
+            total = summary.setdefault(record["stage"], {
+                "calls": 0, "wall_seconds": 0.0, "cpu_seconds": 0.0, "max_peak_rss_delta_bytes": None, "rows_out": 0,
+            })
+            total["calls"] += 1
+            total["wall_seconds"] = round(total["wall_seconds"] + record["wall_seconds"], 6)
+            total["cpu_seconds"] = round(total["cpu_seconds"] + record["cpu_seconds"], 6)
+            if record["peak_rss_delta_bytes"] is not None:
+                total["max_peak_rss_delta_bytes"] = max(total["max_peak_rss_delta_bytes"] or 0, record["peak_rss_delta_bytes"])
+            total["rows_out"] += record["rows_out"] or 0
+        return summary
+
+    @staticmethod
+    def write_report(records: list, run_info: dict = None, logs_dir: str = path.get_logs_path()):
+        """
+        Write the json run report of a run.
+
+        The report of the last run is written to run_report.json and appended as one line
+        to run_reports.jsonl, which keeps the history of the runs.
+
+        Args:
+            records (list): The stage records of the run.
+            run_info (dict, optional): Settings and results of the run added to the report.
+            logs_dir (str, optional): Folder of the reports. Defaults to path.get_logs_path().
+
+        Returns:
+            dict: The report.
+        """
+        report = {
+            "finished_at": datetime.now().isoformat(timespec="seconds"),
+            "run": run_info or {},
+            "summary": Instrumentation.summarize(records),
+            "stages": records,
+        }
+        os.makedirs(logs_dir, exist_ok=True)
+        with open(os.path.join(logs_dir, "run_report.json"), "w") as f:
+            json.dump(report, f, indent=2, default=str)
+        with open(os.path.join(logs_dir, "run_reports.jsonl"), "a") as f:
+            f.write(json.dumps(report, default=str) + "\n")
+        logging.info(f"Run report saved to {os.path.join(logs_dir, 'run_report.json')}")
+        return report
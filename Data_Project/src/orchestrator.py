@@ -0,0 +1,203 @@
+import os
+import time
+import asyncio
+import logging
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from paths import path
+from config import Config
+from instrumentation import Instrumentation
+from data_pipeline import Pipeline
+
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+                    handlers=[
+                        logging.FileHandler(os.path.join(path.get_logs_path(), "data_pipeline.log")),
+                        logging.StreamHandler()
+                    ])
+
+
+class Orchestrator:
+    """Runs the stages of every dataset as a DAG on asyncio, so the datasets overlap.
+
+    STAGES declares the DAG of a dataset. Each stage holds:
+        after (str): The stage it follows, None for the first stage.
+        executor (str): "process" runs the stage in a process pool, for the CPU-heavy steps,
+            "thread" in a thread pool of the stage, for the steps waiting on DuckDB or S3.
+        workers (int): Number of datasets the stage runs at the same time, None uses
+            max_workers.
+
+    Every stage has a bounded queue of the datasets waiting for it. A dataset is put on the
+    queues of the next stages as soon as a stage is done with it, so the small datasets are
+    loaded while usa_county_wise is still cleaned, and a full queue holds back the stage
+    before it: at most queue_size cleaned tables wait in memory for the DuckDB writer, which
+    is a single thread as DuckDB allows one writer. A failed stage leaves out the next ones.
+
+    The "process" stage reads, cleans and writes a dataset to Parquet with
+    Pipeline.process_dataset in one worker process task, as sending the DataFrames between
+    processes would cost more than these steps save by overlapping.
+    """
+
+    STAGES = {
+        "process": {"after": None, "executor": "process", "workers": None},
+        "load": {"after": "process", "executor": "thread", "workers": 1},
+        "upload": {"after": "load", "executor": "thread", "workers": 2},
+    }
+
+    def __init__(self, injector, max_workers: int = None, queue_size: int = None, upload_bucket: str = None,
+                 output_dir: str = path.get_output_path(), **options):
+        """Initializes the Orchestrator class.
+
+        Args:
+            injector (DataInjection): Injector with an open database connection.
+            max_workers (int, optional): Number of worker processes. Defaults to the number of CPUs.
+            queue_size (int, optional): Size of the queue of every stage. Defaults to Config.get_queue_size().
+            upload_bucket (str, optional): Bucket the loaded datasets are uploaded to. Defaults to
+                None, which leaves out the upload stage.
+            output_dir (str, optional): Directory of the Parquet files.
+            **options: batch_size, engine and direct, passed to Pipeline.process_dataset.
+        """
+        self.injector = injector
+        self.max_workers = max_workers or os.cpu_count()
+        self.queue_size = queue_size or Config.get_queue_size()
+        self.upload_bucket = upload_bucket
+        self.output_dir = output_dir
+        self.options = options
+        self.results = {}
+        self._transfer = None
+
+    def get_stages(self):
+        ''' the stages of this run, the upload only runs with a bucket '''
+        return {
+            stage: spec for stage, spec in self.STAGES.items()
+            if stage != "upload" or self.upload_bucket
+        }
+
+    @staticmethod
+    def process(name: str, file_path: str, options: dict):
+        ''' read, clean and write a dataset to parquet, in a worker process '''
+        return Pipeline.process_dataset(name, file_path, **options)
+
+    def load(self, name: str, result: dict):
+        ''' load a processed dataset into the database, from memory in the direct load mode '''
+        with Instrumentation.stage("load", dataset=name):
+            if "table" in result:
+                Pipeline.load_direct({name: result.pop("table")}, self.injector,
+                                     export_parquet=Config.get_export_parquet(), output_dir=self.output_dir)
+            else:
+                self.injector.inject_data_from_parquet(table_names=[name], parquet_folder=self.output_dir)
+        result["loaded"] = True
+        return result
+
+    def upload(self, name: str, result: dict):
+        ''' sync the parquet files of a loaded dataset to the bucket '''
+        from s3_transfer import S3Transfer
+
+        if self._transfer is None:
+            self._transfer = S3Transfer()
+        with Instrumentation.stage("upload", dataset=name):
+            report = self._transfer.sync_directory(self.output_dir, self.upload_bucket, names=[name])
+        result["uploaded"] = report["uploaded"]
+        return result
+
+    async def run_task(self, stage: str, executor, name: str, item):
+        """
+        Run a stage of a dataset on the executor of the stage.
+
+        Returns:
+            dict: The result of the dataset.
+
+        Raises:
+            RuntimeError: If the stage did not succeed.
+        """
+        loop = asyncio.get_running_loop()
+        start = time.perf_counter()
+        if self.STAGES[stage]["executor"] == "process":
+            result = await loop.run_in_executor(executor, type(self).process, name, item, self.options)
+        else:
+            # in a copy of the context, so the stages of the thread keep the dataset and parent stage
+            result = await loop.run_in_executor(executor, Instrumentation.in_context(getattr(self, stage), name, item))
+        self.results[name] = result
+        if not result["success"]:
+            raise RuntimeError(result["error"])
+        logging.info(f"Stage {stage} of {name} done in {time.perf_counter() - start:.2f}s")
+        return result
+
+    async def run_stage(self, stage: str, executor, queues: dict, workers: dict, children: list):
+        """
+        Run the workers of a stage until its queue is closed, then close the queues of the next stages.
+
+        Args:
+            stage (str): Name of the stage.
+            executor (Executor): The executor of the stage.
+            queues (dict): Queues of the stages, keyed by stage.
+            workers (dict): Number of workers of the stages, keyed by stage.
+            children (list): The stages which follow this one.
+        """
+        async def worker():
+            while True:
+                entry = await queues[stage].get()
+                if entry is None:
+                    return
+                name, item = entry
+                try:
+                    result = await self.run_task(stage, executor, name, item)
+                except Exception as e:
+                    result = self.results.setdefault(name, {"name": name})
+                    result.pop("table", None)
+                    result.update(success=False, error=f"{stage} of {name} failed: {e}")
+                    logging.error(result["error"])
+                    continue
+                for child in children:
+                    await queues[child].put((name, result))
+
+        await asyncio.gather(*(worker() for _ in range(workers[stage])))
+        for child in children:
+            for _ in range(workers[child]):
+                await queues[child].put(None)
+
+    async def run_async(self, file_names: dict):
+        """
+        Run the DAG of every dataset.
+
+        Args:
+            file_names (dict): Dictionary where keys are dataset names and values are file paths.
+
+        Returns:
+            dict: Dictionary where keys are dataset names and values are the results.
+        """
+        stages = self.get_stages()
+        queues = {stage: asyncio.Queue(maxsize=self.queue_size) for stage in stages}
+        workers = {stage: spec["workers"] or self.max_workers for stage, spec in stages.items()}
+        children = {stage: [child for child, spec in stages.items() if spec["after"] == stage] for stage in stages}
+        roots = [stage for stage, spec in stages.items() if spec["after"] is None]
+        executors = {
+            stage: ProcessPoolExecutor(max_workers=workers[stage]) if spec["executor"] == "process"
+            else ThreadPoolExecutor(max_workers=workers[stage], thread_name_prefix=stage)
+            for stage, spec in stages.items()
+        }
+
+        async def feed():
+            # the largest inputs first, so the small datasets fill the other workers meanwhile
+            for name in sorted(file_names, key=lambda name: -os.path.getsize(file_names[name])):
+                for root in roots:
+                    await queues[root].put((name, file_names[name]))
+            for root in roots:
+                for _ in range(workers[root]):
+                    await queues[root].put(None)
+
+        try:
+            await asyncio.gather(feed(), *(
+                self.run_stage(stage, executors[stage], queues, workers, children[stage]) for stage in stages
+            ))
+        finally:
+            for executor in executors.values():
+                executor.shutdown()
+        return {
+            name: self.results.get(name, {"name": name, "success": False, "error": f"{name} was not processed"})
+            for name in file_names
+        }
+
+    def run(self, file_names: dict):
+        ''' run the DAG of every dataset, see run_async '''
+        logging.info(f"Running {len(file_names)} datasets through {list(self.get_stages())} with max_workers={self.max_workers}")
+        return asyncio.run(self.run_async(file_names))
@@ -0,0 +1,380 @@
+import os
+import json
+import queue
+import logging
+import argparse
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from urllib.parse import urlparse, parse_qs
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import duckdb
+from paths import path
+from config import Config
+from data_injection import DataInjection
+
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+                    handlers=[
+                        logging.FileHandler(os.path.join(path.get_logs_path(), "query_service.log")),
+                        logging.StreamHandler()
+                    ])
+
+
+class QueryService:
+    """Read-only queries on covid_19_db through a pool of DuckDB connections, with an LRU result cache.
+
+    The named queries in QUERIES are the common lookups of the dashboards. Their SQL is
+    fixed and only their parameters change, which DuckDB binds as prepared statement
+    parameters, so no value is ever pasted into the SQL. Each result is kept as an Arrow
+    table in an LRU cache keyed by the query and its parameters. The time series and per
+    capita lookups read the rollup tables of DataRollups, not the raw tables.
+
+    The cache follows the loads of DataInjection: every query first compares the versions
+    file of the database (one stat call) and, when tables were reloaded, drops the results
+    which read them and reopens the connections so they see the new tables. Loads in the same
+    process are also reported through DataInjection.listeners.
+
+    DuckDB lets either one process write a database file or any number of processes read
+    it, so the connections are opened lazily and close() releases them for a load by
+    another process. The connections are pooled by generation: close() retires the current
+    pool, the next query opens a new one, and the retired pool is only closed once its
+    borrowed cursors are returned, so the queries running in other threads are not cut off.
+
+    Attributes:
+        db_file (str): The database file.
+        pool_size (int): Number of pooled connections.
+        cache_size (int): Number of cached results.
+        hits (int): Queries answered from the cache.
+        misses (int): Queries run on the database.
+    """
+
+    QUERIES = {
+        "country_time_series": {
+            "sql": "SELECT date, confirmed, deaths, recovered, active, new_cases, new_deaths, new_recovered "
+                   "FROM full_grouped WHERE country_region = $country ORDER BY date",
+            "tables": ["full_grouped"],
+            "params": {"country": str},
+            "defaults": {},
+        },
+        "state_time_series": {
+            "sql": "SELECT date, confirmed, deaths, new_cases, new_deaths, new_cases_7d_avg, new_deaths_7d_avg "
+                   "FROM rollup_state_daily WHERE province_state = $state ORDER BY date",
+            "tables": ["rollup_state_daily"],
+            "params": {"state": str},
+            "defaults": {},
+        },
+        "top_deaths": {
+            "sql": "SELECT country_region, who_region, deaths, confirmed, deaths_per_100_cases "
+                   "FROM country_wise ORDER BY deaths DESC, country_region LIMIT $limit",
+            "tables": ["country_wise"],
+            "params": {"limit": int},
+            "defaults": {"limit": 10},
+        },
+        "region_totals": {
+            "sql": "SELECT who_region, count(*) AS countries, sum(confirmed) AS confirmed, sum(deaths) AS deaths, "
+                   "sum(recovered) AS recovered, sum(active) AS active "
+                   "FROM country_wise GROUP BY who_region ORDER BY confirmed DESC",
+            "tables": ["country_wise"],
+            "params": {},
+            "defaults": {},
+        },
+        "region_time_series": {
+            "sql": "SELECT date, confirmed, deaths, new_cases, new_deaths, new_cases_7d_avg, new_deaths_7d_avg "
+                   "FROM rollup_region_daily WHERE who_region = $region ORDER BY date",
+            "tables": ["rollup_region_daily"],
+            "params": {"region": str},
+            "defaults": {},
+        },
+        "country_per_capita": {
+            "sql": "SELECT date, population, confirmed_per_million, deaths_per_million, new_cases_7d_avg_per_million "
+                   "FROM rollup_country_daily WHERE country_region = $country ORDER BY date",
+            "tables": ["rollup_country_daily"],
+            "params": {"country": str},
+            "defaults": {},
+        },
+        "global_time_series": {
+            "sql": "SELECT date, confirmed, deaths, recovered, active, new_cases, new_deaths, new_cases_7d_avg, new_deaths_7d_avg "
+                   "FROM rollup_global_daily ORDER BY date",
+            "tables": ["rollup_global_daily"],
+            "params": {},
+            "defaults": {},
+        },
+    }
+
+    def __init__(self, db_file: str = None, pool_size: int = None, cache_size: int = None):
+        """Initializes the QueryService class.
+
+        Args:
+            db_file (str, optional): The database file. Defaults to covid_19_db.duckdb in
+                path.get_db_files_path().
+            pool_size (int, optional): Number of pooled connections. Defaults to Config.get_query_pool_size().
+            cache_size (int, optional): Number of cached results. Defaults to Config.get_query_cache_size().
+        """
+        self.db_file = db_file or os.path.join(path.get_db_files_path(), "covid_19_db.duckdb")
+        self.pool_size = pool_size or Config.get_query_pool_size()
+        self.cache_size = cache_size or Config.get_query_cache_size()
+        self.hits = 0
+        self.misses = 0
+        self._cache = OrderedDict()
+        # reentrant, as check_versions invalidates and closes while holding it
+        self._lock = threading.RLock()
+        self._pool = None
+        self._versions = DataInjection.read_versions(self.db_file)
+        self._versions_mtime = self.get_versions_mtime()
+        DataInjection.listeners.append(self.on_reload)
+
+    def get_versions_mtime(self):
+        try:
+            return os.stat(DataInjection.get_versions_file(self.db_file)).st_mtime_ns
+        except OSError:
+            return None
+
+    def open_pool(self):
+        ''' the current pool with the read-only database, its cursors and the number borrowed, opened once '''
+        with self._lock:
+            if self._pool is None:
+                connection = duckdb.connect(self.db_file, read_only=True)
+                cursors = queue.LifoQueue()
+                for _ in range(self.pool_size):
+                    cursors.put(connection.cursor())
+                self._pool = {"connection": connection, "cursors": cursors, "borrowed": 0, "retired": False}
+                logging.info(f"Opened {self.pool_size} read-only connections to {self.db_file}")
+            return self._pool
+
+    @contextmanager
+    def connection(self):
+        ''' borrow a connection of the current pool, waiting for one when all are in use '''
+        with self._lock:
+            pool = self.open_pool()
+            pool["borrowed"] += 1
+        try:
+            cursor = pool["cursors"].get()
+            try:
+                yield cursor
+            finally:
+                pool["cursors"].put(cursor)
+        finally:
+            with self._lock:
+                pool["borrowed"] -= 1
+                release = pool["retired"] and pool["borrowed"] == 0
+            if release:
+                self.release(pool)
+
+    def release(self, pool: dict):
+        ''' close the cursors and the database of a retired pool '''
+        while not pool["cursors"].empty():
+            pool["cursors"].get_nowait().close()
+        pool["connection"].close()
+        logging.info(f"Closed the connections to {self.db_file}")
+
+    def close(self):
+        ''' retire the pool, it is closed once its borrowed connections are returned and the next query opens a new one '''
+        with self._lock:
+            pool, self._pool = self._pool, None
+            if pool is None:
+                return
+            pool["retired"] = True
+            release = pool["borrowed"] == 0
+        if release:
+            self.release(pool)
+
+    def invalidate(self, table_names=None):
+        """
+        Drop the cached results which read the given tables.
+
+        Args:
+            table_names (list, optional): The reloaded tables. Defaults to None, which drops
+                every result.
+
+        Returns:
+            int: Number of dropped results.
+        """
+        with self._lock:
+            stale = [
+                key for key, (tables, _) in self._cache.items()
+                if table_names is None or tables is None or set(tables) & set(table_names)
+            ]
+            for key in stale:
+                del self._cache[key]
+        if stale:
+            logging.info(f"Dropped {len(stale)} cached results of {table_names or 'every table'}")
+        return len(stale)
+
+    def on_reload(self, db_file: str, table_names: list):
+        ''' listener of DataInjection, called after tables of a database were reloaded in this process '''
+        if os.path.abspath(db_file) == os.path.abspath(self.db_file):
+            self.invalidate(table_names)
+
+    def check_versions(self):
+        ''' drop the results of the tables reloaded since the last check and reopen the connections '''
+        with self._lock:
+            mtime = self.get_versions_mtime()
+            if mtime == self._versions_mtime:
+                return
+            versions = DataInjection.read_versions(self.db_file)
+            changed = [table for table, version in versions.items() if self._versions.get(table) != version]
+            self._versions, self._versions_mtime = versions, mtime
+            self.invalidate(changed)
+            self.close()
+
+    def get_params(self, name: str, params: dict):
+        """
+        Check and convert the parameters of a named query.
+
+        Args:
+            name (str): Name of the query in QUERIES.
+            params (dict): The parameters, such as the strings of a query string.
+
+        Returns:
+            dict: The parameters converted to their types, with the defaults.
+
+        Raises:
+            KeyError: If the query does not exist.
+            ValueError: If a parameter is missing, unknown or of the wrong type.
+        """
+        spec = QueryService.QUERIES[name]
+        unknown = set(params) - set(spec["params"])
+        if unknown:
+            raise ValueError(f"Unknown parameters {sorted(unknown)} of {name}")
+        values = dict(spec["defaults"])
+        values.update(params)
+        missing = set(spec["params"]) - set(values)
+        if missing:
+            raise ValueError(f"Missing parameters {sorted(missing)} of {name}")
+        return {param: spec["params"][param](value) for param, value in values.items()}
+
+    def execute(self, sql: str, params: dict = None, tables: list = None):
+        """
+        Run a read-only query through the cache.
+
+        Args:
+            sql (str): The query, with $name placeholders for the parameters.
+            params (dict, optional): The parameter values.
+            tables (list, optional): The tables the query reads, its result is dropped when
+                one of them is reloaded. Defaults to None, which drops it on any reload.
+
+        Returns:
+            pa.Table: The result. It is shared with the cache and must not be modified.
+        """
+        self.check_versions()
+        params = params or {}
+        key = (sql, tuple(sorted(params.items())))
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return cached[1]
+            self.misses += 1
+
+        with self.connection() as cursor:
+            relation = cursor.execute(sql, params) if params else cursor.execute(sql)
+            result = relation.to_arrow_table()
+
+        with self._lock:
+            self._cache[key] = (tables, result)
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return result
+
+    def query(self, name: str, **params):
+        """
+        Run a named query of QUERIES.
+
+        Args:
+            name (str): Name of the query, such as "country_time_series".
+            **params: The parameters of the query, such as country="India".
+
+        Returns:
+            pa.Table: The result.
+        """
+        spec = QueryService.QUERIES[name]
+        return self.execute(spec["sql"], self.get_params(name, params), spec["tables"])
+
+    def get_stats(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "cached": len(self._cache),
+                    "cache_size": self.cache_size, "pool_size": self.pool_size, "open": self._pool is not None}
+
+
+def get_handler(service: QueryService):
+    """
+    Get the request handler of the HTTP endpoint of a service.
+
+    GET /queries lists the named queries and their parameters, GET /query/<name>?<params>
+    returns the rows of a named query as json, GET /stats the cache statistics and
+    POST /release closes the connections so another process can load the database.
+
+    Args:
+        service (QueryService): The service answering the requests.
+
+    Returns:
+        type: A BaseHTTPRequestHandler subclass.
+    """
+    class QueryHandler(BaseHTTPRequestHandler):
+        def send_json(self, status, body):
+            payload = json.dumps(body, default=str).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            parts = [part for part in url.path.split("/") if part]
+            if parts == ["queries"]:
+                return self.send_json(200, {
+                    name: {"params": list(spec["params"]), "defaults": spec["defaults"]}
+                    for name, spec in QueryService.QUERIES.items()
+                })
+            if parts == ["stats"]:
+                return self.send_json(200, service.get_stats())
+            if len(parts) == 2 and parts[0] == "query":
+                if parts[1] not in QueryService.QUERIES:
+                    return self.send_json(404, {"error": f"Unknown query {parts[1]}"})
+                params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+                try:
+                    table = service.query(parts[1], **params)
+                except ValueError as e:
+                    return self.send_json(400, {"error": str(e)})
+                except duckdb.Error as e:
+                    return self.send_json(503, {"error": str(e)})
+                return self.send_json(200, {"columns": table.column_names, "rows": table.to_pylist()})
+            self.send_json(404, {"error": "Not found"})
+
+        def do_POST(self):
+            if urlparse(self.path).path.strip("/") == "release":
+                service.close()
+                return self.send_json(200, {"released": True})
+            self.send_json(404, {"error": "Not found"})
+
+        def log_message(self, format, *args):
+            logging.debug(f"{self.address_string()} {format % args}")
+
+    return QueryHandler
+
+
+def serve(service: QueryService, host: str = "127.0.0.1", port: int = 8080):
+    ''' serve the HTTP endpoint of a service until interrupted '''
+    server = ThreadingHTTPServer((host, port), get_handler(service))
+    logging.info(f"Query service listening on http://{host}:{port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Read-only query service over covid_19_db")
+    parser.add_argument("--db-file", help="database file, covid_19_db.duckdb by default")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    args = parser.parse_args()
+
+    serve(QueryService(args.db_file), args.host, args.port)
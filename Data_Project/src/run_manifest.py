@@ -0,0 +1,261 @@
+import os
+import json
+import hashlib
+import logging
+from paths import path
+from config import Config
+from data_rules import DataRules
+from data_schemas import DataSchemas
+
+
+class RunManifest:
+    """Keeps track of the inputs which were already processed and loaded to the database.
+
+    The manifest is a json file next to the output, with an entry for every dataset holding
+    the content hash, size and mtime of its input csv plus the code and schema version, the
+    output layout, the engine and the load mode used to process it. A dataset whose entry still
+    matches, and whose output still exists, can skip the read, analysis, parquet write and
+    database reload. The output is the Parquet file or directory, or the table in the database
+    when the run loads the tables directly without exporting them to Parquet.
+
+    Attributes:
+        manifest_file (str): The full path to the manifest file.
+        entries (dict): Dictionary where keys are dataset names and values are their entries.
+    """
+
+    # source files whose changes alter the processed output
+    CODE_FILES = [
+        "data_reading.py",
+        "data_analysis.py",
+        "data_validations.py",
+        "data_conversion.py",
+        "data_rules.py",
+        "data_schemas.py",
+        "data_layouts.py",
+        "data_pipeline.py",
+        "data_injection.py",
+        "data_sql_engine.py",
+        "data_polars_engine.py",
+    ]
+
+    # entry keys which have to match for a dataset to be skipped
+    KEYS = ["content_hash", "code_version", "schema_version", "output_layout", "engine", "direct", "load_mode"]
+
+    def __init__(self, output_dir=path.get_output_path(), manifest_name="_manifest.json", engine=None, load_mode=None,
+                 export_parquet=None, db_file=None):
+        """Initializes the RunManifest class and loads the existing manifest.
+
+        Args:
+            output_dir (str, optional): The folder where the manifest file is stored.
+                Defaults to path.get_output_path().
+            manifest_name (str, optional): The name of the manifest file.
+            engine (str, optional): Engine of the run. Defaults to Config.get_engine().
+            load_mode (str, optional): Load mode of the run. Defaults to Config.get_load_mode().
+            export_parquet (bool, optional): The direct load mode also writes the Parquet files.
+                Defaults to Config.get_export_parquet().
+            db_file (str, optional): The database file the datasets are loaded into.
+                Defaults to covid_19_db.duckdb in path.get_db_files_path().
+        """
+        self.output_dir = output_dir
+        self.engine = engine or Config.get_engine()
+        self.load_mode = load_mode or Config.get_load_mode()
+        self.export_parquet = Config.get_export_parquet() if export_parquet is None else export_parquet
+        self.db_file = db_file or os.path.join(path.get_db_files_path(), "covid_19_db.duckdb")
+        self._tables = None
+        self.manifest_file = os.path.join(output_dir, manifest_name)
+        self.entries = {}
+        self._code_version = None
+        if os.path.exists(self.manifest_file):
+            try:
+                with open(self.manifest_file) as f:
+                    self.entries = json.load(f).get("datasets", {})
+            except (ValueError, OSError) as e:
+                logging.info(f"Manifest {self.manifest_file} could not be read, processing every dataset: {e}")
+
+    @staticmethod
+    def hash_file(file_path: str, block_size: int = 1 << 20):
+        """
+        Calculate the sha256 hash of a file without loading it fully into memory.
+
+        Args:
+            file_path (str): Path of the file.
+            block_size (int, optional): Number of bytes read at a time.
+
+        Returns:
+            str: The hex digest of the file.
+        """
+        digest = hashlib.sha256()
+        with open(file_path, "rb") as f:
+            for block in iter(lambda: f.read(block_size), b""):
+                digest.update(block)
+        return digest.hexdigest()
+
+    def get_code_version(self):
+        """
+        Get the hash of the source files which produce the output.
+
+        Returns:
+            str: The hex digest of the source files.
+        """
+        if self._code_version is None:
+            digest = hashlib.sha256()
+            for file_name in RunManifest.CODE_FILES:
+                file_path = os.path.join(path.get_src_path(), file_name)
+                if os.path.exists(file_path):
+                    with open(file_path, "rb") as f:
+                        digest.update(f.read())
+            self._code_version = digest.hexdigest()
+        return self._code_version
+
+    @staticmethod
+    def get_schema_version(name: str):
+        """
+        Get the hash of the schema and cleaning rules of a dataset.
+
+        Args:
+            name (str): Name of the dataset.
+
+        Returns:
+            str: The hex digest of the schema and rules.
+        """
+        schema = {
+            "schema": DataSchemas.get_schemas().get(name),
+            "rules": DataRules.get_rules().get(name),
+        }
+        return hashlib.sha256(json.dumps(schema, sort_keys=True, default=str).encode()).hexdigest()
+
+    def build_entry(self, name: str, file_path: str):
+        """
+        Build the manifest entry of a dataset from its current input file.
+
+        The content hash is reused from the existing entry when the size and mtime of the
+        file did not change, so unchanged inputs are not read again.
+
+        Args:
+            name (str): Name of the dataset.
+            file_path (str): Path of the input csv file.
+
+        Returns:
+            dict: The manifest entry.
+        """
+        stat = os.stat(file_path)
+        previous = self.entries.get(name, {})
+        if previous.get("size") == stat.st_size and previous.get("mtime_ns") == stat.st_mtime_ns:
+            content_hash = previous["content_hash"]
+        else:
+            content_hash = RunManifest.hash_file(file_path)
+        return {
+            "file_path": file_path,
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "content_hash": content_hash,
+            "code_version": self.get_code_version(),
+            "schema_version": RunManifest.get_schema_version(name),
+            "output_layout": Config.get_output_layout(),
+            "engine": self.engine,
+            "direct": self.load_mode == "direct",
+            "load_mode": self.load_mode,
+        }
+
+    def get_loaded_tables(self):
+        """
+        Get the names of the tables in the database, read once per manifest.
+
+        Returns:
+            set: The table names, empty if the database does not exist or cannot be opened.
+        """
+        if self._tables is None:
+            self._tables = set()
+            if os.path.exists(self.db_file):
+                import duckdb
+                try:
+                    connection = duckdb.connect(self.db_file, read_only=True)
+                    try:
+                        self._tables = {
+                            row[0] for row in connection.execute("SELECT table_name FROM information_schema.tables").fetchall()
+                        }
+                    finally:
+                        connection.close()
+                except duckdb.Error as e:
+                    logging.info(f"Database {self.db_file} could not be read, processing every dataset: {e}")
+        return self._tables
+
+    def has_output(self, name: str):
+        """
+        Check if the output of a dataset still exists.
+
+        Args:
+            name (str): Name of the dataset.
+
+        Returns:
+            bool: True if the Parquet output exists, or the table in the database when the
+                direct load mode does not export the Parquet files.
+        """
+        if self.load_mode == "direct" and not self.export_parquet:
+            return name in self.get_loaded_tables()
+        return os.path.exists(os.path.join(self.output_dir, f"{name}.parquet")) \
+            or os.path.isdir(os.path.join(self.output_dir, name))
+
+    def is_unchanged(self, name: str, file_path: str):
+        """
+        Check if a dataset was already processed from the same input, code, schema and options.
+
+        Args:
+            name (str): Name of the dataset.
+            file_path (str): Path of the input csv file.
+
+        Returns:
+            bool: True if the dataset can be skipped.
+        """
+        previous = self.entries.get(name)
+        if previous is None or not os.path.exists(file_path):
+            return False
+        if not self.has_output(name):
+            return False
+        current = self.build_entry(name, file_path)
+        return all(previous.get(key) == current[key] for key in RunManifest.KEYS)
+
+    def get_changed(self, file_names: dict):
+        """
+        Get the datasets which have to be processed again.
+
+        Args:
+            file_names (dict): Dictionary where keys are dataset names and values are file paths.
+
+        Returns:
+            dict: The datasets of file_names which changed since the last run.
+        """
+        changed = {}
+        for name, file_path in file_names.items():
+            if self.is_unchanged(name, file_path):
+                logging.info(f"{name} is unchanged since the last run, skipping it")
+            else:
+                changed[name] = file_path
+        return changed
+
+    def update(self, name: str, file_path: str):
+        """
+        Record a dataset as processed and loaded.
+
+        Args:
+            name (str): Name of the dataset.
+            file_path (str): Path of the input csv file.
+        """
+        self.entries[name] = self.build_entry(name, file_path)
+
+    def clear(self):
+        """
+        Forget every dataset, so the next run processes all of them.
+        """
+        self.entries = {}
+
+    def save(self):
+        """
+        Write the manifest to its file.
+        """
+        os.makedirs(self.output_dir, exist_ok=True)
+        temp_file = f"{self.manifest_file}.tmp"
+        with open(temp_file, "w") as f:
+            json.dump({"datasets": self.entries}, f, indent=2, sort_keys=True)
+        os.replace(temp_file, self.manifest_file)
+        logging.info(f"Run manifest saved to {self.manifest_file}")
@@ -0,0 +1,129 @@
+import os
+import hashlib
+import logging
+import threading
+from config import Config
+from paths import path
+
+
+class S3Cache:
+    """Read-through local cache of S3 objects, keyed by bucket, key and ETag.
+
+    The ETag of an object comes with the bucket listing, so an unchanged object is found in
+    the cache without any request for it. A new ETag means the object changed, its stale
+    copy is removed and the new version downloaded. The cache is bounded in size and evicts
+    the least recently used files first, with the file mtime as the last use time.
+
+    Attributes:
+        cache_dir (str): The folder of the cached files.
+        max_bytes (int): The size limit of the cache.
+    """
+
+    def __init__(self, cache_dir: str = path.get_s3_cache_path(), max_bytes: int = None):
+        """Initializes the S3Cache class.
+
+        Args:
+            cache_dir (str, optional): The folder of the cached files.
+                Defaults to path.get_s3_cache_path().
+            max_bytes (int, optional): The size limit of the cache.
+                Defaults to Config.get_s3_cache_max_bytes().
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes or Config.get_s3_cache_max_bytes()
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+
+    @staticmethod
+    def get_key_prefix(bucket_name: str, key: str):
+        ''' file name prefix shared by every cached version of an object '''
+        return hashlib.sha256(f"{bucket_name}/{key}".encode()).hexdigest()[:32]
+
+    def get_cache_file(self, bucket_name: str, key: str, etag: str):
+        """
+        Get the cache file path of a version of an object.
+
+        Args:
+            bucket_name (str): Name of the bucket.
+            key (str): Key of the object.
+            etag (str): ETag of the object version.
+
+        Returns:
+            str: The path of the cache file.
+        """
+        extension = os.path.splitext(key)[1].lower()
+        etag = etag.strip('"').replace("-", "_")
+        return os.path.join(self.cache_dir, f"{S3Cache.get_key_prefix(bucket_name, key)}_{etag}{extension}")
+
+    def get_file(self, transfer, bucket_name: str, key: str, etag: str):
+        """
+        Get the local copy of an object, downloading it only if the cache has no copy of this ETag.
+
+        Args:
+            transfer (S3Transfer): Transfer used to download the missing objects.
+            bucket_name (str): Name of the bucket.
+            key (str): Key of the object.
+            etag (str): ETag of the object from the bucket listing.
+
+        Returns:
+            str: The path of the local copy.
+        """
+        cache_file = self.get_cache_file(bucket_name, key, etag)
+        if os.path.exists(cache_file):
+            os.utime(cache_file)
+            logging.info(f"Cache hit for s3://{bucket_name}/{key}")
+            return cache_file
+
+        temp_file = f"{cache_file}.{threading.get_ident()}.tmp"
+        try:
+            transfer.client.download_file(bucket_name, key, temp_file, Config=transfer.transfer_config)
+            os.replace(temp_file, cache_file)
+        finally:
+            if os.path.exists(temp_file):
+                os.remove(temp_file)
+        logging.info(f"Cached s3://{bucket_name}/{key} at {cache_file}")
+        self.remove_stale(bucket_name, key, cache_file)
+        self.evict(keep=cache_file)
+        return cache_file
+
+    def remove_stale(self, bucket_name: str, key: str, cache_file: str):
+        ''' remove the cached versions of an object other than cache_file '''
+        prefix = S3Cache.get_key_prefix(bucket_name, key) + "_"
+        for file_name in os.listdir(self.cache_dir):
+            file_path = os.path.join(self.cache_dir, file_name)
+            if file_name.startswith(prefix) and not file_name.endswith(".tmp") and file_path != cache_file:
+                try:
+                    os.remove(file_path)
+                except OSError as e:
+                    logging.info(f"Could not remove the stale cache file {file_path}: {e}")
+
+    def evict(self, keep: str = None):
+        """
+        Remove the least recently used files until the cache fits in max_bytes.
+
+        Args:
+            keep (str, optional): A file which is never removed, such as the one just downloaded.
+        """
+        with self._lock:
+            entries = []
+            for file_name in os.listdir(self.cache_dir):
+                if file_name.endswith(".tmp"):
+                    continue
+                file_path = os.path.join(self.cache_dir, file_name)
+                try:
+                    stat = os.stat(file_path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime_ns, stat.st_size, file_path))
+
+            total = sum(size for _, size, _ in entries)
+            for _, size, file_path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                if file_path == keep:
+                    continue
+                try:
+                    os.remove(file_path)
+                    total -= size
+                    logging.info(f"Evicted {file_path} from the S3 cache")
+                except OSError as e:
+                    logging.info(f"Could not evict {file_path}: {e}")
@@ -0,0 +1,400 @@
+import io
+import os
+import hashlib
+import logging
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import boto3
+from boto3.s3.transfer import TransferConfig
+from s3transfer.utils import ChunksizeAdjuster
+from botocore.config import Config as BotoConfig
+import pyarrow.csv as pv
+import pyarrow.parquet as pq
+from creds import Creds
+from config import Config
+from paths import path
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    handlers=[
+        logging.FileHandler(
+            os.path.join(path.get_logs_path(), "data_reading.log")
+        ),
+        logging.StreamHandler(),
+    ],
+)
+
+
+class S3RangeReader(io.RawIOBase):
+    """Read-only, seekable file over an S3 object which fetches only the requested byte ranges.
+
+    Parquet readers jump to the footer and then to the column chunks they need, so passing
+    this file to pyarrow reads a Parquet object without downloading it into memory first.
+    """
+
+    def __init__(self, client, bucket_name: str, key: str, size: int):
+        self.client = client
+        self.bucket_name = bucket_name
+        self.key = key
+        self.size = size
+        self.position = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self.position
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_SET:
+            self.position = offset
+        elif whence == io.SEEK_CUR:
+            self.position += offset
+        elif whence == io.SEEK_END:
+            self.position = self.size + offset
+        else:
+            raise ValueError(f"Invalid whence {whence}")
+        return self.position
+
+    def readinto(self, buffer):
+        if self.position >= self.size or len(buffer) == 0:
+            return 0
+        end = min(self.position + len(buffer), self.size) - 1
+        response = self.client.get_object(Bucket=self.bucket_name, Key=self.key,
+                                          Range=f"bytes={self.position}-{end}")
+        data = response["Body"].read()
+        buffer[:len(data)] = data
+        self.position += len(data)
+        return len(data)
+
+
+class S3Transfer:
+    """Concurrent S3 transfers over one shared, connection-pooled boto3 client.
+
+    Objects are transferred on a thread pool of max_concurrency workers, and files above
+    the multipart chunk size are split into parts sent part_concurrency at a time. The
+    connection pool of the client is sized for both, so no request waits for a socket.
+
+    Attributes:
+        client (botocore.client.S3): The S3 client, shared by every S3Transfer by default.
+        max_concurrency (int): Number of objects transferred at the same time.
+        transfer_config (TransferConfig): Multipart settings of the uploads and downloads.
+    """
+
+    _client = None
+    _client_lock = threading.Lock()
+
+    def __init__(self, client=None, max_concurrency: int = None, part_concurrency: int = None,
+                 multipart_chunksize: int = None):
+        """Initializes the S3Transfer class.
+
+        Args:
+            client (botocore.client.S3, optional): Client to use instead of the shared one.
+            max_concurrency (int, optional): Objects transferred at the same time.
+                Defaults to Config.get_s3_max_concurrency().
+            part_concurrency (int, optional): Parts of one object transferred at the same time.
+                Defaults to Config.get_s3_part_concurrency().
+            multipart_chunksize (int, optional): Size in bytes of the multipart threshold and parts.
+                Defaults to Config.get_s3_multipart_chunksize().
+        """
+        self.max_concurrency = max_concurrency or Config.get_s3_max_concurrency()
+        part_concurrency = part_concurrency or Config.get_s3_part_concurrency()
+        multipart_chunksize = multipart_chunksize or Config.get_s3_multipart_chunksize()
+        self.transfer_config = TransferConfig(
+            multipart_threshold=multipart_chunksize,
+            multipart_chunksize=multipart_chunksize,
+            max_concurrency=part_concurrency,
+        )
+        self.client = client or S3Transfer.get_client(self.max_concurrency * part_concurrency)
+
+    @staticmethod
+    def get_client(max_pool_connections: int = 16):
+        """
+        Get the shared S3 client, creating it on the first call.
+
+        boto3 clients are thread safe, so every transfer reuses the same client and its
+        pool of open connections instead of paying a new TLS handshake per call.
+
+        Args:
+            max_pool_connections (int, optional): Size of the connection pool of a new client.
+
+        Returns:
+            botocore.client.S3: The shared client.
+        """
+        with S3Transfer._client_lock:
+            if S3Transfer._client is None:
+                S3Transfer._client = boto3.client(
+                    service_name=os.getenv("service_name") or "s3",
+                    region_name=os.getenv("region_name"),
+                    endpoint_url=Config.get_s3_endpoint_url(),
+                    aws_access_key_id=Creds.get_Access_Key(),
+                    aws_secret_access_key=Creds.get_Access_Secret_Key(),
+                    config=BotoConfig(max_pool_connections=max_pool_connections,
+                                      retries={"max_attempts": 5, "mode": "adaptive"}),
+                )
+            return S3Transfer._client
+
+    def list_objects(self, bucket_name: str, prefix: str = "", page_size: int = None):
+        """
+        List every object of a bucket, following the pagination of list_objects_v2.
+
+        Args:
+            bucket_name (str): Name of the bucket.
+            prefix (str, optional): Only list the keys starting with this prefix.
+            page_size (int, optional): Number of keys requested per page, 1000 by default.
+
+        Yields:
+            dict: The listing entry of each object, with its Key, Size and ETag.
+        """
+        paginator = self.client.get_paginator("list_objects_v2")
+        pagination = {"PageSize": page_size} if page_size else {}
+        for page in paginator.paginate(Bucket=bucket_name, Prefix=prefix, PaginationConfig=pagination):
+            yield from page.get("Contents", [])
+
+    @staticmethod
+    def read_file(file_path: str, file_type: str):
+        ''' read a local csv or Parquet file into an Arrow table '''
+        if file_type == "parquet":
+            return pq.read_table(file_path, memory_map=True)
+        return pv.read_csv(file_path)
+
+    def read_table(self, bucket_name: str, key: str, size: int, etag: str = None, cache=None):
+        """
+        Read a csv or Parquet object into an Arrow table.
+
+        With a cache the object is read from its local copy, which is only downloaded when
+        the cache has no copy of the same ETag. Otherwise Parquet objects are read with ranged
+        requests through S3RangeReader. Csv objects have no index to seek in, so they are
+        downloaded with a multipart download to a temporary file and parsed from there by the
+        multithreaded Arrow csv reader.
+
+        Args:
+            bucket_name (str): Name of the bucket.
+            key (str): Key of the object.
+            size (int): Size of the object in bytes.
+            etag (str, optional): ETag of the object from the listing, needed with a cache.
+            cache (S3Cache, optional): Local cache of the objects.
+
+        Returns:
+            pyarrow.Table: The object data, None if the object is not a csv or Parquet file.
+        """
+        file_type = key.split(".")[-1].lower()
+        if file_type not in ("csv", "parquet"):
+            return None
+        if cache is not None and etag:
+            return S3Transfer.read_file(cache.get_file(self, bucket_name, key, etag), file_type)
+        if file_type == "parquet":
+            return pq.read_table(S3RangeReader(self.client, bucket_name, key, size))
+
+        file_descriptor, temp_path = tempfile.mkstemp(suffix=".csv")
+        os.close(file_descriptor)
+        try:
+            self.client.download_file(bucket_name, key, temp_path, Config=self.transfer_config)
+            return S3Transfer.read_file(temp_path, file_type)
+        finally:
+            os.remove(temp_path)
+
+    def read_tables(self, bucket_name: str, prefix: str = "", cache=None):
+        """
+        Read every csv and Parquet object of a bucket concurrently.
+
+        Args:
+            bucket_name (str): Name of the bucket.
+            prefix (str, optional): Only read the keys starting with this prefix.
+            cache (S3Cache, optional): Local cache of the objects, unchanged objects are not
+                downloaded again.
+
+        Returns:
+            dict: Dictionary where keys are the object keys and values are Arrow tables.
+        """
+        tables = {}
+        with ThreadPoolExecutor(max_workers=self.max_concurrency) as executor:
+            futures = {
+                executor.submit(self.read_table, bucket_name, obj["Key"], obj["Size"], obj.get("ETag"), cache): obj["Key"]
+                for obj in self.list_objects(bucket_name, prefix)
+            }
+            for future in as_completed(futures):
+                key = futures[future]
+                try:
+                    table = future.result()
+                except Exception as e:
+                    logging.info(f"Error reading object {key}: {e}")
+                    continue
+                if table is not None:
+                    tables[key] = table
+        return tables
+
+    def upload_directory(self, output_dir: str, bucket_name: str, prefix: str = ""):
+        """
+        Upload every file of a directory concurrently, keeping the relative paths as keys.
+
+        Args:
+            output_dir (str): Directory to upload.
+            bucket_name (str): Name of the bucket.
+            prefix (str, optional): Prefix added in front of every key.
+
+        Returns:
+            list: The keys which were uploaded successfully.
+        """
+        uploads = {}
+        for root, dirs, files in os.walk(output_dir):
+            for file_name in files:
+                file_path = os.path.join(root, file_name)
+                s3_key = prefix + os.path.relpath(file_path, output_dir).replace(os.path.sep, "/")
+                uploads[s3_key] = file_path
+
+        uploaded = []
+        with ThreadPoolExecutor(max_workers=self.max_concurrency) as executor:
+            futures = {
+                executor.submit(self.client.upload_file, file_path, bucket_name, s3_key,
+                                Config=self.transfer_config): s3_key
+                for s3_key, file_path in uploads.items()
+            }
+            for future in as_completed(futures):
+                s3_key = futures[future]
+                try:
+                    future.result()
+                    uploaded.append(s3_key)
+                    logging.info(f"Successfully uploaded {s3_key} to bucket {bucket_name}.")
+                except Exception as e:
+                    logging.info(f"Error uploading file {s3_key}: {e}")
+        return uploaded
+
+    def compute_etag(self, file_path: str, block_size: int = 1 << 20):
+        """
+        Calculate the ETag S3 gives a file uploaded with the transfer config of this S3Transfer.
+
+        Files below the multipart threshold get the MD5 of their content. Multipart uploads
+        get the MD5 of the concatenated part MD5s followed by "-" and the number of parts.
+
+        Args:
+            file_path (str): Path of the local file.
+            block_size (int, optional): Number of bytes hashed at a time.
+
+        Returns:
+            str: The expected ETag, without quotes.
+        """
+        size = os.path.getsize(file_path)
+        if size < self.transfer_config.multipart_threshold:
+            digest = hashlib.md5()
+            with open(file_path, "rb") as f:
+                for block in iter(lambda: f.read(block_size), b""):
+                    digest.update(block)
+            return digest.hexdigest()
+
+        part_size = ChunksizeAdjuster().adjust_chunksize(self.transfer_config.multipart_chunksize, size)
+        part_digests = []
+        with open(file_path, "rb") as f:
+            for part in iter(lambda: f.read(part_size), b""):
+                part_digests.append(hashlib.md5(part).digest())
+        return f"{hashlib.md5(b''.join(part_digests)).hexdigest()}-{len(part_digests)}"
+
+    @staticmethod
+    def is_synced_file(relative_path: str, extension: str = ".parquet"):
+        ''' only data files are synced, pipeline metadata under "_" and hidden entries are skipped '''
+        parts = relative_path.split("/")
+        return relative_path.endswith(extension) and not any(part.startswith(("_", ".")) for part in parts)
+
+    @staticmethod
+    def is_dataset_file(relative_path: str, names: list = None):
+        ''' whether a file belongs to one of the datasets, every file belongs to names=None '''
+        if names is None:
+            return True
+        first = relative_path.split("/")[0]
+        return first in names or (first.endswith(".parquet") and first[:-len(".parquet")] in names)
+
+    def sync_directory(self, output_dir: str, bucket_name: str, prefix: str = "", delete: bool = False,
+                       dry_run: bool = False, names: list = None):
+        """
+        Upload only the Parquet files of a directory which are new or differ from the bucket.
+
+        A file is unchanged when the remote object has the same size and the ETag the file
+        would get when uploaded. The size is compared first, so only files of the same size
+        are hashed. The hashing and the uploads run on the thread pool.
+
+        Args:
+            output_dir (str): Directory to sync.
+            bucket_name (str): Name of the bucket.
+            prefix (str, optional): Prefix added in front of every key.
+            delete (bool, optional): Delete the remote Parquet keys under prefix which no longer
+                exist locally.
+            dry_run (bool, optional): Only report what would be uploaded and deleted.
+            names (list, optional): Only sync the files of these datasets, <name>.parquet or
+                the files under <name>/. Defaults to None, which syncs every file.
+
+        Returns:
+            dict: The report with the keys to "upload", "skip" and "delete", the bytes to
+                upload, and the keys which were "uploaded" and "deleted".
+        """
+        local_files = {}
+        for root, dirs, files in os.walk(output_dir):
+            for file_name in files:
+                file_path = os.path.join(root, file_name)
+                relative_path = os.path.relpath(file_path, output_dir).replace(os.path.sep, "/")
+                if S3Transfer.is_synced_file(relative_path) and S3Transfer.is_dataset_file(relative_path, names):
+                    local_files[prefix + relative_path] = file_path
+
+        remote_objects = {
+            obj["Key"]: obj for obj in self.list_objects(bucket_name, prefix)
+            if S3Transfer.is_synced_file(obj["Key"][len(prefix):])
+            and S3Transfer.is_dataset_file(obj["Key"][len(prefix):], names)
+        }
+
+        def is_changed(s3_key, file_path):
+            remote = remote_objects.get(s3_key)
+            if remote is None or remote["Size"] != os.path.getsize(file_path):
+                return True
+            return remote["ETag"].strip('"') != self.compute_etag(file_path)
+
+        with ThreadPoolExecutor(max_workers=self.max_concurrency) as executor:
+            changed = dict(zip(local_files, executor.map(lambda item: is_changed(*item), local_files.items())))
+
+        report = {
+            "upload": sorted(key for key, is_new in changed.items() if is_new),
+            "skip": sorted(key for key, is_new in changed.items() if not is_new),
+            "delete": sorted(set(remote_objects) - set(local_files)) if delete else [],
+            "upload_bytes": sum(os.path.getsize(local_files[key]) for key, is_new in changed.items() if is_new),
+            "uploaded": [],
+            "deleted": [],
+        }
+        logging.info(f"Sync of {output_dir} to {bucket_name}: {len(report['upload'])} to upload "
+                     f"({report['upload_bytes']} bytes), {len(report['skip'])} unchanged, "
+                     f"{len(report['delete'])} to delete")
+        if dry_run:
+            for s3_key in report["upload"]:
+                logging.info(f"Would upload {s3_key}")
+            for s3_key in report["delete"]:
+                logging.info(f"Would delete {s3_key}")
+            return report
+
+        with ThreadPoolExecutor(max_workers=self.max_concurrency) as executor:
+            futures = {
+                executor.submit(self.client.upload_file, local_files[s3_key], bucket_name, s3_key,
+                                Config=self.transfer_config): s3_key
+                for s3_key in report["upload"]
+            }
+            for future in as_completed(futures):
+                s3_key = futures[future]
+                try:
+                    future.result()
+                    report["uploaded"].append(s3_key)
+                    logging.info(f"Successfully uploaded {s3_key} to bucket {bucket_name}.")
+                except Exception as e:
+                    logging.info(f"Error uploading file {s3_key}: {e}")
+
+        for start in range(0, len(report["delete"]), 1000):
+            batch = report["delete"][start:start + 1000]
+            try:
+                response = self.client.delete_objects(
+                    Bucket=bucket_name, Delete={"Objects": [{"Key": key} for key in batch], "Quiet": True}
+                )
+                failed = {error["Key"] for error in response.get("Errors", [])}
+                report["deleted"].extend(key for key in batch if key not in failed)
+            except Exception as e:
+                logging.info(f"Error deleting keys from bucket {bucket_name}: {e}")
+        return report
@@ -0,0 +1,69 @@
+import os
+import importlib.util
+import duckdb
+import pytest
+from paths import path
+from files import FileName
+from data_generators import DataGenerators
+
+# __main__.py cannot be imported by its name under pytest, it is loaded as the analyze module
+spec = importlib.util.spec_from_file_location("analyze", os.path.join(os.path.dirname(__file__), "__main__.py"))
+analyze = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(analyze)
+
+
+def test_run_is_the_default_command(monkeypatch):
+    calls = []
+    monkeypatch.setattr(analyze, "main", lambda **options: calls.append(options) or 0)
+
+    assert analyze.cli([]) == 0
+    assert analyze.cli(["run", "--engine", "duckdb", "--load-mode", "direct", "--execution-mode", "async"]) == 0
+    assert calls[0]["engine"] is None
+    assert (calls[1]["engine"], calls[1]["load_mode"], calls[1]["execution_mode"]) == ("duckdb", "direct", "async")
+
+def test_failed_run_returns_an_error(tmp_path, monkeypatch):
+    from data_pipeline import Pipeline
+    from data_injection import DataInjection
+
+    def open_database():
+        injector = DataInjection("covid_19_db", str(tmp_path / "db_files"))
+        injector.create_database()
+        return injector
+
+    file_path = DataGenerators.generate("day_wise", str(tmp_path), scale=0.1, seed=1)
+    monkeypatch.setattr(FileName, "get_files_name", staticmethod(lambda: {"day_wise": file_path}))
+    monkeypatch.setattr(path, "get_output_path", staticmethod(lambda: str(tmp_path / "output")))
+    monkeypatch.setattr(path, "get_db_files_path", staticmethod(lambda: str(tmp_path / "db_files")))
+    monkeypatch.setattr(analyze, "open_database", open_database)
+    monkeypatch.setattr(analyze.Instrumentation, "write_report", staticmethod(lambda records, run_info=None: None))
+    monkeypatch.setattr(Pipeline, "run", staticmethod(lambda file_names, **options: {
+        name: {"name": name, "success": False, "error": f"{name} failed"} for name in file_names
+    }))
+
+    assert analyze.cli(["run", "--execution-mode", "serial", "--ingest-mode", "full", "--load-mode", "parquet"]) == 1
+
+def test_validate(tmp_path, monkeypatch, capsys):
+    file_path = DataGenerators.generate("day_wise", str(tmp_path), scale=0.1, seed=1)
+    monkeypatch.setattr(FileName, "get_files_name", staticmethod(lambda: {"day_wise": file_path}))
+    monkeypatch.setattr(path, "get_validations_path", staticmethod(lambda: str(tmp_path / "validations")))
+
+    assert analyze.cli(["validate", "--datasets", "day_wise"]) == 0
+    assert "expectations met" in capsys.readouterr().out
+    assert os.path.exists(tmp_path / "validations" / "day_wise.json")
+
+def test_query(tmp_path, capsys):
+    db_file = str(tmp_path / "test.duckdb")
+    connection = duckdb.connect(db_file)
+    connection.execute("CREATE TABLE day_wise AS SELECT 555 AS confirmed")
+    connection.close()
+
+    assert analyze.cli(["query", "SELECT confirmed FROM day_wise", "--db-file", db_file]) == 0
+    assert "555" in capsys.readouterr().out
+
+def test_import_only(capsys):
+    assert analyze.cli(["--import-only", "validate"]) == 0
+    assert "validate imports took" in capsys.readouterr().out
+
+def test_unknown_command_is_rejected():
+    with pytest.raises(SystemExit):
+        analyze.cli(["export"])
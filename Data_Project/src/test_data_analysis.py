@@ -0,0 +1,25 @@
+import os
+import pandas as pd
+from data_analysis import Analysis
+from instrumentation import Instrumentation
+
+
+def test_eda_applies_the_dataset_rules(tmp_path):
+    data_frame = pd.DataFrame({
+        'Province/State': [None, 'Ontario'],
+        'Country/Region': ['India', 'Canada'],
+        'Date': pd.to_datetime(['2020-01-22', '2020-01-23']),
+        'Confirmed': [1, -2],
+        'Deaths': [0, 1],
+    })
+    with Instrumentation.collect() as records:
+        df = Analysis.covid_19_clean_eda(data_frame, 'covid_19_clean', str(tmp_path))
+    assert df is not None
+    assert df['province_state'].tolist() == ['Unknown', 'Ontario']
+    assert df['confirmed'].tolist() == [1, 0]
+    assert list(data_frame.columns)[:2] == ['Province/State', 'Country/Region']
+    stages = {record["stage"]: record for record in records}
+    assert stages["rename"]["rows_in"] == 2
+    assert (stages["validation"]["rows_in"], stages["write_parquet"]["rows_out"]) == (2, 2)
+    assert os.path.exists(os.path.join(tmp_path, 'covid_19_clean.parquet')) \
+        or os.path.isdir(os.path.join(tmp_path, 'covid_19_clean'))
@@ -1,21 +1,79 @@
-import os
-import pandas as pd
-from data_conversion import DataConvert
-
-
-
-project_root=os.path.dirname(os.path.dirname(__file__))
-Test_output_dir=os.path.join(project_root,'data','test_output')
-
-Mock_Data={
-    'test_file': pd.DataFrame({'col1': [1, 2], 'col2': ['A', 'B']})
-}
-
-
-
-def test_to_parquet_creates_file():
-    if not os.path.exists(Test_output_dir):
-        os.makedirs(Test_output_dir)
-    DataConvert.to_parquet(Mock_Data, Test_output_dir)
-    output_path = os.path.join(Test_output_dir, 'test_file.parquet')   
-    assert os.path.exists(output_path)
\ No newline at end of file
+import os
+import pytest
+import pandas as pd
+from data_conversion import DataConvert
+
+
+
+project_root=os.path.dirname(os.path.dirname(__file__))
+Test_output_dir=os.path.join(project_root,'data','test_output')
+
+Mock_Data={
+    'test_file': pd.DataFrame({'col1': [1, 2], 'col2': ['A', 'B']})
+}
+
+
+
+def test_to_parquet_creates_file():
+    if not os.path.exists(Test_output_dir):
+        os.makedirs(Test_output_dir)
+    DataConvert.to_parquet(Mock_Data, Test_output_dir)
+    output_path = os.path.join(Test_output_dir, 'test_file.parquet')   
+    assert os.path.exists(output_path)
+
+def test_to_parquet_in_batches_appends_all_batches():
+    batches = [pd.DataFrame({'col1': [1, 2], 'col2': ['A', 'B']}), pd.DataFrame({'col1': [3], 'col2': ['C']})]
+    rows = DataConvert.to_parquet_in_batches(iter(batches), 'test_batches', Test_output_dir)
+    output_path = os.path.join(Test_output_dir, 'test_batches.parquet')
+    assert rows == 3
+    assert pd.read_parquet(output_path)['col1'].tolist() == [1, 2, 3]
+    os.remove(output_path)
+
+def test_to_parquet_in_batches_removes_the_temporary_file_on_error(tmp_path):
+    def batches():
+        yield pd.DataFrame({'col1': [1, 2], 'col2': ['A', 'B']})
+        raise ValueError("broken batch")
+
+    with pytest.raises(ValueError):
+        DataConvert.to_parquet_in_batches(batches(), 'test_batches', str(tmp_path))
+    assert os.listdir(tmp_path) == []
+
+def test_to_parquet_partitioned_by_month(tmp_path):
+    df = pd.DataFrame({
+        'date': pd.to_datetime(['2020-02-02', '2020-01-05', '2020-01-01']),
+        'country_region': ['A', 'B', 'A'],
+        'confirmed': [3, 2, 1],
+    })
+    DataConvert.to_parquet({'full_grouped': df}, str(tmp_path), partitioned=True)
+    DataConvert.to_parquet({'full_grouped': df}, str(tmp_path), partitioned=True)
+    january = pd.read_parquet(os.path.join(tmp_path, 'full_grouped', 'month=2020-01'))
+    assert sorted(os.listdir(os.path.join(tmp_path, 'full_grouped'))) == ['month=2020-01', 'month=2020-02']
+    assert january['confirmed'].tolist() == [1, 2]
+
+    DataConvert.to_parquet({'full_grouped': df}, str(tmp_path), partitioned=False)
+    assert os.listdir(tmp_path) == ['full_grouped.parquet']
+
+def test_to_parquet_applies_encoding_profile(tmp_path):
+    import pyarrow.parquet as pq
+    df = pd.DataFrame({'combined_key': ['b', 'a', 'c'], 'admin2': ['x', 'y', 'z'], 'confirmed': [1, 2, 3]})
+    DataConvert.to_parquet({'usa_county_wise': df}, str(tmp_path), partitioned=False, profile='zstd')
+    metadata = pq.ParquetFile(os.path.join(tmp_path, 'usa_county_wise.parquet')).metadata
+    column = metadata.row_group(0).column(0)
+
+    assert column.compression == 'ZSTD'
+    assert column.bloom_filter_offset is not None
+    assert column.statistics.min == 'a'
+
+def test_to_parquet_in_batches_follows_the_layout(tmp_path, monkeypatch):
+    import pyarrow.parquet as pq
+    from data_layouts import DataLayouts
+    layout = dict(DataLayouts.get_layout('day_wise'), row_group_size=2)
+    monkeypatch.setattr(DataLayouts, 'get_layout', staticmethod(lambda name: layout))
+    batches = [
+        pd.DataFrame({'date': pd.to_datetime(['2020-01-24', '2020-01-22', '2020-01-23']), 'confirmed': [3, 1, 2]}),
+        pd.DataFrame({'date': pd.to_datetime(['2020-01-26', '2020-01-25']), 'confirmed': [5, 4]}),
+    ]
+    DataConvert.to_parquet_in_batches(iter(batches), 'day_wise', str(tmp_path))
+    parquet_file = pq.ParquetFile(os.path.join(tmp_path, 'day_wise.parquet'))
+    assert [parquet_file.metadata.row_group(i).num_rows for i in range(parquet_file.num_row_groups)] == [2, 1, 2]
+    assert parquet_file.read()['confirmed'].to_pylist() == [1, 2, 3, 4, 5]
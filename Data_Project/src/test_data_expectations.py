@@ -0,0 +1,54 @@
+import pandas as pd
+import pyarrow as pa
+from data_expectations import Expectations
+
+
+Mock_Data = pd.DataFrame({
+    'region': ['A', 'B', 'B', None],
+    'date': ['d1', 'd1', 'd1', 'd2'],
+    'deaths': [1.0, -2.0, 300.0, None],
+    'mixed': [1, 'two', 3.0, None],
+})
+
+
+def get_results(expectations, batch_size=None):
+    result = Expectations.run(Mock_Data, expectations, batch_size=batch_size)
+    return result, [document['result'] for document in result['results']]
+
+def test_column_expectations_in_batches():
+    expectations = [
+        Expectations.expectation('expect_column_values_to_be_between', column='deaths', min_value=0, max_value=100),
+        Expectations.expectation('expect_column_values_to_not_be_null', column='region'),
+    ]
+    for batch_size in [1, 3, None]:
+        result, (between, not_null) = get_results(expectations, batch_size)
+        assert between['element_count'] == 4 and between['missing_count'] == 1
+        assert between['unexpected_count'] == 2
+        assert between['partial_unexpected_list'] == [-2.0, 300.0]
+        assert not_null['unexpected_count'] == 1
+        assert not result['success']
+
+def test_unique_and_types():
+    expectations = [
+        Expectations.expectation('expect_compound_columns_to_be_unique', column_list=['region', 'date']),
+        Expectations.expectation('expect_column_values_to_be_unique', column='date'),
+        Expectations.expectation('expect_column_values_to_be_in_type_list', column='deaths', type_list=['float']),
+        Expectations.expectation('expect_column_values_to_be_in_type_list', column='mixed', type_list=['int', 'str']),
+        Expectations.expectation('expect_column_values_to_not_be_null', column='missing'),
+    ]
+    result, (compound, unique, float_type, mixed_type, missing) = get_results(expectations)
+    assert compound['unexpected_count'] == 2
+    assert compound['partial_unexpected_list'] == [{'region': 'B', 'date': 'd1'}]
+    assert unique['unexpected_count'] == 3
+    assert [document['success'] for document in result['results']] == [False, False, True, False, False]
+    assert mixed_type['observed_value'].startswith('mixed')
+    assert result['results'][4]['exception_info']['raised_exception']
+    assert result['statistics']['successful_expectations'] == 1
+
+def test_suite_of_a_dataset():
+    suite = Expectations.get_suite('full_grouped')
+    types = {expectation['expectation_type'] for expectation in suite}
+    assert 'expect_compound_columns_to_be_unique' in types
+    table = pa.table({'Date': pa.array([0, 0], pa.timestamp('us')), 'Country/Region': ['A', 'B'], 'Confirmed': [1, 2]})
+    unique = next(expectation for expectation in suite if expectation['expectation_type'] == 'expect_compound_columns_to_be_unique')
+    assert Expectations.run(table, [unique])['success']
@@ -0,0 +1,33 @@
+import pandas as pd
+from data_generators import DataGenerators
+from data_rules import DataRules
+from data_schemas import DataSchemas
+
+
+def read(name, file_path):
+    df = pd.read_csv(file_path, **DataSchemas.get_read_options(name))
+    return df.rename(columns=DataRules.get_rules()[name]["rename"])
+
+def test_generated_files_follow_the_schemas_and_rules(tmp_path):
+    for name, file_path in DataGenerators.generate_all(str(tmp_path)).items():
+        schema = DataSchemas.get_schemas()[name]
+        rules = DataRules.get_rules()[name]
+        df = pd.read_csv(file_path, **DataSchemas.get_read_options(name))
+        assert len(df) == DataGenerators.BASE_ROWS[name]
+        assert set(schema["dtype"]) | set(schema["categories"]) | set(schema["dates"]) <= set(df.columns)
+
+        df = df.rename(columns=rules["rename"])
+        assert not df.duplicated(subset=rules["unique"]).any(), name
+        for column in rules["non_negative"]:
+            assert (df[column].fillna(0) >= 0).all(), (name, column)
+        for column, (low, high) in rules["between"].items():
+            assert df[column].between(low, high).all(), (name, column)
+
+def test_scale_and_seed(tmp_path):
+    first = DataGenerators.generate("full_grouped", str(tmp_path / "a"), scale=3, seed=1)
+    second = DataGenerators.generate("full_grouped", str(tmp_path / "b"), scale=3, seed=1)
+    df = read("full_grouped", first)
+    assert len(df) == 3 * DataGenerators.BASE_ROWS["full_grouped"]
+    assert df["date"].nunique() == DataGenerators.DAYS
+    with open(first, "rb") as f, open(second, "rb") as g:
+        assert f.read() == g.read()
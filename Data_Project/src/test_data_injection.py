@@ -1,57 +1,183 @@
-import os
-import pytest
-import shutil
-import glob
-import duckdb
-from data_injection import DataInjection
-
-
-project_root=os.path.dirname(os.path.dirname(__file__))
-test_db_folder = os.path.join(project_root,'data','test_db_files')
-test_parquet_folder = os.path.join(project_root,"data",'test_output','')
-
-
-@pytest.fixture(scope="module")
-def setup_environment():
-    os.makedirs(test_db_folder, exist_ok=True)
-    os.makedirs(test_parquet_folder, exist_ok=True)
-    yield
-    shutil.rmtree(test_db_folder, ignore_errors=True)
-    shutil.rmtree(test_parquet_folder, ignore_errors=True)
-
-def test_create_database(setup_environment):
-    db_name = "test_db"
-    injector = DataInjection(db_name)
-    
-    
-    injector.create_database()
-    
-
-    assert os.path.exists(injector.db_file)
-    
-    if os.path.exists(injector.db_file):
-        os.remove(injector.db_file)
-
-def test_inject_data_from_parquet(setup_environment):
-    db_name = "test_db"
-    injector = DataInjection(db_name, )
-    injector.create_database()
-    
-    parquet_file_path = os.path.join(test_parquet_folder, 'table1.parquet')
-    with open(parquet_file_path, 'w') as f:
-        f.write('dummy data')
-
-   
-    injector.inject_data_from_parquet()
-    
-    if os.path.exists(parquet_file_path):
-        os.remove(parquet_file_path)
-    injector.close_connection()
-
-def test_close_connection(setup_environment):
-    db_name = "test_db"
-    injector = DataInjection(db_name)
-    injector.create_database()
-    injector.close_connection()
-    
-    assert injector.connection is None
+import os
+import pytest
+import duckdb
+from data_injection import DataInjection
+
+
+def write_day_wise(folder):
+    import pandas as pd
+    os.makedirs(folder, exist_ok=True)
+    pd.DataFrame({'date': pd.to_datetime(['2020-01-22', '2020-01-23']), 'confirmed': [1, 2]}).to_parquet(
+        os.path.join(folder, 'day_wise.parquet'), index=False
+    )
+
+def test_create_database(tmp_path):
+    injector = DataInjection("test_db", str(tmp_path))
+    injector.create_database()
+    injector.close_connection()
+
+    assert os.path.exists(injector.db_file)
+
+def test_default_db_folder_is_resolved_at_runtime():
+    from paths import path
+    assert DataInjection("test_db").db_folder == path.get_db_files_path()
+
+def test_inject_data_from_parquet(tmp_path):
+    parquet_folder = str(tmp_path / 'output')
+    write_day_wise(parquet_folder)
+    injector = DataInjection("test_db", str(tmp_path))
+    injector.create_database()
+    injector.inject_data_from_parquet(parquet_folder=parquet_folder)
+    rows = injector.connection.execute("SELECT count(*) FROM day_wise").fetchone()[0]
+    injector.close_connection()
+
+    assert rows == 2
+
+def test_close_connection(tmp_path):
+    injector = DataInjection("test_db", str(tmp_path))
+    injector.create_database()
+    injector.close_connection()
+
+    assert injector.connection is None
+
+def test_bulk_inject_leaves_no_staging_tables(tmp_path):
+    parquet_folder = str(tmp_path / 'output')
+    write_day_wise(parquet_folder)
+    injector = DataInjection("test_db", str(tmp_path))
+    injector.create_database()
+    injector.inject_data_from_parquet(table_names=['day_wise'], bulk=True, parquet_folder=parquet_folder)
+    tables = [table for table, in injector.connection.execute("SHOW TABLES").fetchall()]
+    injector.close_connection()
+
+    assert 'day_wise' in tables
+    assert not any(table.endswith('__staging') for table in tables)
+
+def test_inject_data_from_frames(tmp_path):
+    import pyarrow as pa
+    injector = DataInjection("test_db", str(tmp_path))
+    injector.create_database()
+    injector.inject_data_from_frames({'frame_table': pa.table({'a': [1, 2, 3]})})
+    rows = injector.connection.execute("SELECT sum(a) FROM frame_table").fetchone()[0]
+    tables = [table for table, in injector.connection.execute("SHOW TABLES").fetchall()]
+    injector.close_connection()
+
+    assert rows == 6
+    assert 'frame_table__frame' not in tables
+
+def test_partitioned_source_excludes_derived_columns(tmp_path):
+    import pandas as pd
+    from data_conversion import DataConvert
+    df = pd.DataFrame({'date': pd.to_datetime(['2020-01-01', '2020-02-01']), 'confirmed': [1, 2]})
+    folder = str(tmp_path / "it's output")
+    DataConvert.to_parquet({'full_grouped': df}, folder, partitioned=True)
+    delta_file = os.path.join(folder, "full_grouped_o'clock.parquet")
+    df.to_parquet(delta_file, index=False)
+    source = DataInjection.get_parquet_source('full_grouped', os.path.join(folder, 'full_grouped'), [delta_file])
+    connection = duckdb.connect()
+    columns = [column for column, *_ in connection.execute(f"DESCRIBE SELECT * FROM {source}").fetchall()]
+    rows = connection.execute(f"SELECT count(*) FROM {source}").fetchone()[0]
+    connection.close()
+
+    assert columns == ['date', 'confirmed']
+    assert rows == 4
+
+def test_tables_follow_their_layout(tmp_path):
+    import pandas as pd
+    injector = DataInjection("test_db", str(tmp_path))
+    injector.create_database()
+    injector.inject_data_from_frames({'full_grouped': pd.DataFrame({
+        'date': pd.to_datetime(['2020-01-23', '2020-01-22', '2020-01-22']),
+        'country_region': ['B', 'B', 'A'],
+        'confirmed': [2, 1, 5],
+    })})
+    connection = injector.connection
+    rows = connection.execute("SELECT country_region, date FROM full_grouped").fetchall()
+    date_type = connection.execute("SELECT data_type FROM duckdb_columns() WHERE table_name = 'full_grouped' AND column_name = 'date'").fetchone()[0]
+    indexes = [name for name, in connection.execute("SELECT index_name FROM duckdb_indexes() WHERE table_name = 'full_grouped'").fetchall()]
+    with pytest.raises(duckdb.ConstraintException):
+        connection.execute("INSERT INTO full_grouped (date, country_region, confirmed) VALUES (DATE '2020-01-22', 'A', 1)")
+    injector.close_connection()
+
+    assert [country for country, _ in rows] == ['A', 'B', 'B']
+    assert str(rows[1][1]) == '2020-01-22'
+    assert date_type == 'DATE'
+    assert indexes == ['full_grouped_country_region_idx']
+
+def test_parquet_paths_which_need_quoting(tmp_path):
+    import pandas as pd
+    parquet_folder = str(tmp_path / "it's output")
+    write_day_wise(parquet_folder)
+    delta_dir = os.path.join(parquet_folder, '_deltas', 'day_wise')
+    os.makedirs(delta_dir)
+    pd.DataFrame({'date': pd.to_datetime(['2020-01-24']), 'confirmed': [3]}).to_parquet(
+        os.path.join(delta_dir, "day_wise_o'clock.parquet"), index=False
+    )
+    injector = DataInjection("test_db", str(tmp_path))
+    injector.create_database()
+    injector.inject_data_from_parquet(table_names=['day_wise'], parquet_folder=parquet_folder)
+    loaded = injector.connection.execute("SELECT count(*) FROM day_wise").fetchone()[0]
+    appended_file = os.path.join(parquet_folder, "day_wise_it's_new.parquet")
+    pd.DataFrame({'date': pd.to_datetime(['2020-01-25']), 'confirmed': [4]}).to_parquet(appended_file, index=False)
+    injector.append_data_from_parquet('day_wise', appended_file)
+    rows = injector.connection.execute("SELECT count(*) FROM day_wise").fetchone()[0]
+    injector.close_connection()
+
+    assert loaded == 3
+    assert rows == 4
+
+def test_get_max_date(tmp_path):
+    import pandas as pd
+    injector = DataInjection("test_db", str(tmp_path))
+    injector.create_database()
+    injector.inject_data_from_frames({'day_wise': pd.DataFrame({
+        'date': pd.to_datetime(['2020-01-23', '2020-01-22']), 'confirmed': [2, 1],
+    })})
+    max_date = injector.get_max_date('day_wise', 'date')
+    not_a_date = injector.get_max_date('day_wise', 'confirmed')
+    missing = injector.get_max_date('full_grouped', 'date')
+    injector.close_connection()
+
+    assert str(max_date)[:10] == '2020-01-23'
+    assert not_a_date is None
+    assert missing is None
+
+def test_inject_errors_outside_the_transaction_are_raised(tmp_path, monkeypatch):
+    injector = DataInjection("test_db", str(tmp_path))
+    injector.create_database()
+    with pytest.raises(FileNotFoundError):
+        injector.inject_data_from_parquet(parquet_folder=str(tmp_path / 'missing'))
+
+    def fail(*args, **kwargs):
+        raise OSError("versions file is not writable")
+    monkeypatch.setattr(injector, 'record_reload', fail)
+    parquet_folder = str(tmp_path / 'output')
+    write_day_wise(parquet_folder)
+    with pytest.raises(OSError, match="not writable"):
+        injector.inject_data_from_parquet(parquet_folder=parquet_folder)
+    rows = injector.connection.execute("SELECT count(*) FROM day_wise").fetchone()[0]
+    injector.close_connection()
+
+    assert rows == 2
+
+def test_refresh_rollups_only_rolls_back_its_own_transaction(tmp_path):
+    class FailingBegin:
+        def __init__(self, connection):
+            self.connection = connection
+            self.statements = []
+
+        def execute(self, sql, *args):
+            self.statements.append(sql)
+            if sql.startswith("BEGIN"):
+                raise duckdb.IOException("cannot start the transaction")
+            return self.connection.execute(sql, *args)
+
+    injector = DataInjection("test_db", str(tmp_path))
+    injector.create_database()
+    connection = injector.connection
+    injector.connection = FailingBegin(connection)
+    with pytest.raises(duckdb.IOException, match="cannot start"):
+        injector.refresh_rollups()
+    statements = injector.connection.statements
+    connection.close()
+
+    assert "ROLLBACK" not in statements
@@ -0,0 +1,92 @@
+import os
+import pytest
+import pandas as pd
+import pyarrow.parquet as pq
+from data_pipeline import Pipeline
+from data_injection import DataInjection
+from data_conversion import DataConvert
+from data_generators import DataGenerators
+
+@pytest.fixture
+def isolated(monkeypatch):
+    # keep the output and the quarantine of the real data folder untouched
+    monkeypatch.setattr(Pipeline, "clear_deltas", staticmethod(lambda name, output_dir=None: None))
+    monkeypatch.setattr(DataConvert, "save_non_compliant", staticmethod(lambda df, key, intermediate_path=None: len(df)))
+
+@pytest.fixture
+def inputs(tmp_path, isolated):
+    return {
+        name: DataGenerators.generate(name, str(tmp_path), scale=0.1, seed=1)
+        for name in ["country_wise", "day_wise", "full_grouped", "worldometer"]
+    }
+
+def test_parallel_run_matches_serial_run(inputs):
+    serial = Pipeline.run(inputs, "serial", direct=True)
+    parallel = Pipeline.run(inputs, "parallel", max_workers=2, direct=True)
+
+    assert list(parallel) == list(serial)
+    for name in inputs:
+        assert serial[name]["success"] and parallel[name]["success"]
+        assert parallel[name]["table"].equals(serial[name]["table"])
+
+def write_until(file_path, dates, folder):
+    # the rows of the input csv up to the given number of dates, as an earlier extract
+    df = pd.read_csv(file_path, dtype=str, keep_default_na=False)
+    kept = sorted(df["Date"].unique(), key=pd.to_datetime)[:dates]
+    partial_path = os.path.join(folder, f"{dates}_{os.path.basename(file_path)}")
+    df[df["Date"].isin(kept)].to_csv(partial_path, index=False)
+    return partial_path
+
+def load_full(name, file_path, folder):
+    injector = DataInjection(name, folder)
+    injector.create_database()
+    injector.inject_data_from_frames({name: Pipeline.process_dataset(name, file_path, direct=True)["table"]})
+    return injector
+
+def test_delta_ingests_match_a_full_reload(tmp_path, isolated):
+    file_path = DataGenerators.generate("full_grouped", str(tmp_path), scale=0.1, seed=1)
+    output_dir = str(tmp_path / "output")
+    injector = load_full("full_grouped", write_until(file_path, 40, str(tmp_path)), str(tmp_path / "delta"))
+    base_max_date = injector.get_max_date("full_grouped", "date")
+
+    first = Pipeline.ingest_delta("full_grouped", write_until(file_path, 60, str(tmp_path)), injector, output_dir)
+    second = Pipeline.ingest_delta("full_grouped", file_path, injector, output_dir)
+    assert first["success"] and first["rows"] > 0
+    assert second["success"] and second["rows"] > 0
+    assert injector.get_max_date("full_grouped", "date") > base_max_date
+
+    # both part files are kept, written with the layout of full_grouped
+    parts = sorted(os.listdir(os.path.join(output_dir, "_deltas", "full_grouped")))
+    assert len(parts) == 2
+    metadata = pq.ParquetFile(os.path.join(output_dir, "_deltas", "full_grouped", parts[0])).metadata
+    assert metadata.row_group(0).column(0).compression == "ZSTD"
+
+    reloaded = load_full("full_grouped", file_path, str(tmp_path / "full"))
+    query = "SELECT * FROM full_grouped ORDER BY ALL"
+    assert injector.connection.execute(query).fetchall() == reloaded.connection.execute(query).fetchall()
+    injector.close_connection()
+    reloaded.close_connection()
+
+def test_delta_ingest_needs_a_loaded_table(tmp_path, isolated):
+    file_path = DataGenerators.generate("full_grouped", str(tmp_path), scale=0.1, seed=1)
+    injector = DataInjection("test_db", str(tmp_path))
+    injector.create_database()
+    result = Pipeline.ingest_delta("full_grouped", file_path, injector, str(tmp_path / "output"))
+    injector.close_connection()
+
+    assert not result["success"]
+    assert not os.path.exists(tmp_path / "output")
+
+def test_load_direct_without_export_removes_the_outdated_parquet(tmp_path):
+    import pyarrow as pa
+    output_dir = str(tmp_path / "output")
+    table = pa.table({"date": pa.array([pd.Timestamp("2020-01-22")], pa.timestamp("us")), "confirmed": [1]})
+    DataConvert.to_parquet({"day_wise": table}, output_dir)
+    injector = DataInjection("test_db", str(tmp_path))
+    injector.create_database()
+
+    Pipeline.load_direct({"day_wise": table}, injector, export_parquet=False, output_dir=output_dir)
+    assert not os.path.exists(os.path.join(output_dir, "day_wise.parquet"))
+    Pipeline.load_direct({"day_wise": table}, injector, export_parquet=True, output_dir=output_dir)
+    assert os.path.exists(os.path.join(output_dir, "day_wise.parquet"))
+    injector.close_connection()
@@ -0,0 +1,42 @@
+import os
+import pytest
+import pandas as pd
+import pyarrow.parquet as pq
+from data_quarantine import Quarantine
+from data_polars_engine import PolarsEngine
+from data_generators import DataGenerators
+from test_data_sql_engine import write_input, normalize, clean_with_pandas
+
+# polars is an optional dependency
+pytest.importorskip("polars")
+
+
+def test_clean_dataset_matches_the_pandas_engine(tmp_path):
+    file_path = write_input(str(tmp_path))
+    expected, expected_non_compliant = clean_with_pandas(file_path, str(tmp_path / "pandas"))
+
+    rows = PolarsEngine.clean_dataset("country_wise", file_path, str(tmp_path / "output"), str(tmp_path / "polars"))
+    df = pd.read_parquet(os.path.join(tmp_path, "output", "country_wise.parquet"))
+    non_compliant = Quarantine.read("country_wise", str(tmp_path / "polars"))
+
+    assert rows == len(expected) == 6
+    pd.testing.assert_frame_equal(normalize(df), normalize(expected), check_dtype=False)
+    assert sorted(non_compliant["country_region"]) == expected_non_compliant
+
+def test_clean_dataset_follows_the_layout(monkeypatch, tmp_path):
+    monkeypatch.delenv("parquet_profile", raising=False)
+    file_path = DataGenerators.generate("covid_19_clean", str(tmp_path), scale=0.05, seed=1)
+    output_dir = str(tmp_path / "output")
+
+    rows = PolarsEngine.clean_dataset("covid_19_clean", file_path, output_dir, str(tmp_path / "polars"), partitioned=False)
+    parquet_file = pq.ParquetFile(os.path.join(output_dir, "covid_19_clean.parquet"))
+    assert parquet_file.metadata.row_group(0).column(0).compression == "ZSTD"
+    df = parquet_file.read().to_pandas()
+    assert df.equals(df.sort_values(["Date", "country_region", "province_state"], kind="stable"))
+
+    partitioned_rows = PolarsEngine.clean_dataset("covid_19_clean", file_path, output_dir, str(tmp_path / "polars"),
+                                                  partitioned=True)
+    assert partitioned_rows == rows
+    assert not os.path.exists(os.path.join(output_dir, "covid_19_clean.parquet"))
+    months = os.listdir(os.path.join(output_dir, "covid_19_clean"))
+    assert months and all(month.startswith("month=") for month in months)
@@ -0,0 +1,36 @@
+import os
+import pandas as pd
+from data_quarantine import Quarantine
+
+
+def test_append_skips_known_rows(tmp_path):
+    first = pd.DataFrame({'country': pd.Categorical(['A', 'B']), 'deaths': [-1, -2]})
+    second = pd.DataFrame({'country': pd.Categorical(['B', 'C']), 'deaths': [-2, -3]})
+
+    assert Quarantine.append(first, 'test', str(tmp_path)) == 2
+    assert Quarantine.append(second, 'test', str(tmp_path)) == 1
+    assert sorted(Quarantine.read('test', str(tmp_path))['country']) == ['A', 'B', 'C']
+
+def test_same_row_of_another_engine_is_known(tmp_path):
+    pandas_row = pd.DataFrame({
+        'country': pd.Categorical(['A']), 'deaths': [-1], 'recovered': [None],
+        'date': pd.to_datetime(['2020-01-22']).astype('datetime64[ns]'),
+    })
+    duckdb_row = pd.DataFrame({
+        'date': pd.to_datetime(['2020-01-22']).astype('datetime64[us]'), 'deaths': [-1.0],
+        'recovered': [float('nan')], 'country': pd.Series(['A'], dtype=object),
+    })
+
+    assert Quarantine.append(pandas_row, 'test', str(tmp_path)) == 1
+    assert Quarantine.append(duckdb_row, 'test', str(tmp_path)) == 0
+
+def test_compact_imports_legacy_csv(tmp_path):
+    pd.DataFrame({'country': ['A', 'D'], 'deaths': [-1, -4]}).to_csv(os.path.join(tmp_path, 'test_non_compliant.csv'), index=False)
+    Quarantine.append(pd.DataFrame({'country': ['A'], 'deaths': [-1]}), 'test', str(tmp_path))
+
+    rows = Quarantine.compact('test', str(tmp_path), export=True)
+
+    assert rows == 2
+    assert not os.path.exists(os.path.join(tmp_path, 'test_non_compliant.csv'))
+    assert len(pd.read_parquet(os.path.join(tmp_path, 'test_quarantine.parquet'))) == 2
+    assert Quarantine.append(pd.DataFrame({'country': ['D'], 'deaths': [-4]}), 'test', str(tmp_path)) == 0
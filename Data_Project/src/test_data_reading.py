@@ -1,36 +1,84 @@
-import warnings
-import pandas as pd
-import pytest
-from data_reading import DataReading
-import os
-
-
-@pytest.fixture(scope='module', autouse=True)
-def suppress_warnings():
-    warnings.filterwarnings('ignore', category=DeprecationWarning, module='botocore.auth')
-
-
-
-
-project_root = os.path.dirname(os.path.dirname(__file__))
-MOCK_FILE_PATHS = {
-    'file1': os.path.join(project_root, 'data', 'input', 'country_wise_latest.csv'),
-    'file2': os.path.join(project_root,'data','input','covid_19_clean_complete.csv'),
-    }
-
-def test_read_data_returns_dict():
-    result = DataReading.read_data(MOCK_FILE_PATHS)
-    assert isinstance(result, dict)
-
-def test_read_data_returns_dataframes():
-    result = DataReading.read_data(MOCK_FILE_PATHS)
-    for df in result.values():
-        assert isinstance(df, pd.DataFrame)
-
-def test_read_from_aws():
-    result=DataReading.read_data_aws('dataprojectbuckets')
-    for df in result.values():
-        assert isinstance(df,pd.DataFrame)
-
-
-
+import warnings
+import pandas as pd
+import pytest
+from data_reading import DataReading
+import os
+
+
+@pytest.fixture(scope='module', autouse=True)
+def suppress_warnings():
+    warnings.filterwarnings('ignore', category=DeprecationWarning, module='botocore.auth')
+
+
+
+
+project_root = os.path.dirname(os.path.dirname(__file__))
+MOCK_FILE_PATHS = {
+    'file1': os.path.join(project_root, 'data', 'input', 'country_wise_latest.csv'),
+    'file2': os.path.join(project_root,'data','input','covid_19_clean_complete.csv'),
+    }
+
+def test_read_data_returns_dict():
+    result = DataReading.read_data(MOCK_FILE_PATHS)
+    assert isinstance(result, dict)
+
+def test_read_data_returns_dataframes():
+    result = DataReading.read_data(MOCK_FILE_PATHS)
+    for df in result.values():
+        assert isinstance(df, pd.DataFrame)
+
+def test_read_from_aws():
+    result=DataReading.read_data_aws('dataprojectbuckets')
+    for df in result.values():
+        assert isinstance(df,pd.DataFrame)
+
+
+
+
+@pytest.fixture
+def db_file(tmp_path):
+    import duckdb
+    file_path = str(tmp_path / "test.duckdb")
+    connection = duckdb.connect(file_path)
+    connection.execute("CREATE TABLE full_grouped AS SELECT TIMESTAMP '2020-03-01' + INTERVAL (i % 10) DAY AS date, "
+                       "CASE WHEN i < 10 THEN 'India' ELSE 'Chile' END AS country_region, i AS confirmed FROM range(20) t(i)")
+    connection.execute("CREATE TABLE usa_county_wise AS SELECT 'Texas' AS province_state, 1 AS deaths")
+    connection.close()
+    return file_path
+
+def test_read_data_from_db_pushes_down_the_selection(db_file):
+    result = DataReading.read_data_from_db(
+        db_file, ["full_grouped"], columns=["date", "confirmed"],
+        filters={"country_region": ["India"], "date": ("2020-03-03", "2020-03-05")}, as_arrow=True
+    )
+    assert list(result) == ["full_grouped"]
+    assert result["full_grouped"].column_names == ["date", "confirmed"]
+    assert result["full_grouped"]["confirmed"].to_pylist() == [2, 3, 4]
+
+def test_read_data_from_db_rejects_unknown_columns(db_file):
+    with pytest.raises(ValueError):
+        DataReading.read_data_from_db(db_file, ["full_grouped"], columns=["date'); DROP TABLE x; --"])
+
+def test_read_batches_from_db(db_file):
+    batches = list(DataReading.read_batches_from_db(db_file, "full_grouped", filters={"country_region": "Chile"},
+                                                    limit=8, batch_size=5))
+    assert sum(batch.num_rows for batch in batches) == 8
+    assert all(batch.num_rows <= 5 for batch in batches)
+
+def test_read_data_applies_the_declared_schema(tmp_path):
+    from data_generators import DataGenerators
+    file_path = DataGenerators.generate("covid_19_clean", str(tmp_path), scale=0.01, seed=1)
+    df = DataReading.read_data({"covid_19_clean": file_path})["covid_19_clean"]
+    assert df["Confirmed"].dtype == "int64"
+    assert df["Lat"].dtype == "float64"
+    assert isinstance(df["Country/Region"].dtype, pd.CategoricalDtype)
+    assert isinstance(df["WHO Region"].dtype, pd.CategoricalDtype)
+    assert pd.api.types.is_datetime64_any_dtype(df["Date"])
+
+def test_read_data_infers_the_types_of_undeclared_datasets(tmp_path):
+    file_path = tmp_path / "undeclared.csv"
+    file_path.write_text("Date,Country,Confirmed\n2020-01-22,India,1\n2020-01-23,Chile,2\n")
+    df = DataReading.read_data({"undeclared": str(file_path)})["undeclared"]
+    assert df["Confirmed"].dtype == "int64"
+    assert not pd.api.types.is_datetime64_any_dtype(df["Date"])
+    assert not isinstance(df["Country"].dtype, pd.CategoricalDtype)
@@ -0,0 +1,51 @@
+import duckdb
+import pandas as pd
+from data_rollups import DataRollups
+
+
+def make_database(days):
+    dates = pd.date_range('2020-01-22', periods=days)
+    connection = duckdb.connect()
+    full_grouped = pd.DataFrame({
+        'date': dates.repeat(2),
+        'country_region': ['US', 'India'] * days,
+        'who_region': ['Americas', 'South-East Asia'] * days,
+        'confirmed': range(0, 20 * days, 10), 'deaths': range(2 * days), 'recovered': 0, 'active': 0,
+        'new_cases': [1, 2] * days, 'new_deaths': range(2 * days), 'new_recovered': 0,
+    })
+    usa_county_wise = pd.DataFrame({
+        'Date': dates.repeat(2), 'province_state': 'Texas', 'admin2': ['Dallas', 'Harris'] * days,
+        'confirmed': range(0, 6 * days, 3), 'deaths': 0,
+    })
+    worldometer = pd.DataFrame({'country_region': ['USA', 'India'], 'population': [330e6, 1380e6]})
+    for name, frame in [('full_grouped', full_grouped), ('usa_county_wise', usa_county_wise), ('worldometer', worldometer)]:
+        connection.execute(f"CREATE TABLE {name} AS SELECT * FROM frame")
+    return connection
+
+def read_rollups(connection):
+    return {name: connection.execute(f"SELECT * FROM {name} ORDER BY ALL").fetchall() for name in DataRollups.ROLLUPS}
+
+def test_incremental_refresh_matches_a_rebuild():
+    connection = make_database(20)
+    assert set(DataRollups.refresh(connection).values()) == {'full'}
+    expected = read_rollups(connection)
+
+    for name in DataRollups.ROLLUPS:
+        connection.execute(f"DELETE FROM {name} WHERE date > TIMESTAMP '2020-02-05'")
+    refreshed = DataRollups.refresh(connection, {'full_grouped': 'appended', 'usa_county_wise': 'appended'})
+
+    assert set(refreshed.values()) == {'incremental'}
+    assert read_rollups(connection) == expected
+
+def test_refresh_only_the_rollups_of_the_changed_tables():
+    connection = make_database(10)
+    DataRollups.refresh(connection)
+
+    assert DataRollups.refresh(connection, {'worldometer': 'reloaded'}) == {'rollup_country_daily': 'full'}
+    assert DataRollups.refresh(connection, {'day_wise': 'reloaded'}) == {}
+    per_capita = connection.execute(
+        "SELECT population, new_cases_7d_avg FROM rollup_country_daily WHERE country_region = 'US' ORDER BY date DESC LIMIT 1"
+    ).fetchone()
+    assert per_capita == (330e6, 1.0)
+    state = connection.execute("SELECT new_cases FROM rollup_state_daily ORDER BY date").fetchall()
+    assert state[:2] == [(None,), (12,)]
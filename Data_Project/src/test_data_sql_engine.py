@@ -0,0 +1,62 @@
+import os
+import duckdb
+import pandas as pd
+import pyarrow.parquet as pq
+from data_analysis import Analysis
+from data_reading import DataReading
+from data_generators import DataGenerators
+from data_quarantine import Quarantine
+from data_sql_engine import SqlEngine
+
+
+def write_input(folder):
+    # country_wise has a range rule, a clamped column and drops the rows with nulls
+    file_path = DataGenerators.generate("country_wise", folder, scale=0.05, seed=1)
+    df = pd.read_csv(file_path)
+    df.loc[1, "Deaths"] = 90000000
+    df.loc[2, "Deaths"] = -5
+    df.loc[3, "1 week change"] = -10
+    df.loc[4, "WHO Region"] = None
+    df.to_csv(file_path, index=False)
+    return file_path
+
+def normalize(df):
+    df = df.astype({column: str for column in df.columns if not pd.api.types.is_numeric_dtype(df[column])})
+    return df.sort_values(list(df.columns)).reset_index(drop=True)
+
+def clean_with_pandas(file_path, intermediate_path):
+    data_frame = DataReading.read_data({"country_wise": file_path})["country_wise"]
+    df = Analysis.apply_rules(data_frame, "country_wise", intermediate_path)
+    return df, sorted(Quarantine.read("country_wise", intermediate_path)["country_region"])
+
+def test_clean_dataset_matches_the_pandas_engine(tmp_path):
+    file_path = write_input(str(tmp_path))
+    expected, expected_non_compliant = clean_with_pandas(file_path, str(tmp_path / "pandas"))
+
+    rows = SqlEngine.clean_dataset("country_wise", file_path, str(tmp_path / "output"), str(tmp_path / "duckdb"))
+    df = pd.read_parquet(os.path.join(tmp_path, "output", "country_wise.parquet"))
+    non_compliant = Quarantine.read("country_wise", str(tmp_path / "duckdb"))
+
+    assert rows == len(expected) == 6
+    pd.testing.assert_frame_equal(normalize(df), normalize(expected), check_dtype=False)
+    assert sorted(non_compliant["country_region"]) == expected_non_compliant == ["Country 000001", "Country 000002"]
+
+def test_clean_dataset_follows_the_layout(monkeypatch, tmp_path):
+    monkeypatch.delenv("parquet_profile", raising=False)
+    file_path = DataGenerators.generate("covid_19_clean", str(tmp_path), scale=0.05, seed=1)
+    output_dir = str(tmp_path / "output")
+
+    rows = SqlEngine.clean_dataset("covid_19_clean", file_path, output_dir, str(tmp_path / "duckdb"), partitioned=False)
+    parquet_file = pq.ParquetFile(os.path.join(output_dir, "covid_19_clean.parquet"))
+    assert parquet_file.metadata.row_group(0).column(0).compression == "ZSTD"
+    df = parquet_file.read().to_pandas()
+    assert df.equals(df.sort_values(["Date", "country_region", "province_state"], kind="stable"))
+
+    partitioned_rows = SqlEngine.clean_dataset("covid_19_clean", file_path, output_dir, str(tmp_path / "duckdb"),
+                                               partitioned=True)
+    assert partitioned_rows == rows
+    assert not os.path.exists(os.path.join(output_dir, "covid_19_clean.parquet"))
+    months = os.listdir(os.path.join(output_dir, "covid_19_clean"))
+    assert months and all(month.startswith("month=") for month in months)
+    source = os.path.join(output_dir, "covid_19_clean", "**", "*.parquet").replace(os.sep, "/")
+    assert duckdb.sql(f"SELECT count(*) FROM read_parquet('{source}', hive_partitioning = true)").fetchone()[0] == rows
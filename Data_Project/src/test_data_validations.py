@@ -0,0 +1,41 @@
+import pandas as pd
+from data_validations import Validate
+
+
+Mock_Data = pd.DataFrame({
+    'deaths': [1, -2, 3, None],
+    'confirmed': [5, 6, -7, 8],
+    'region': ['A', None, 'B', 'B'],
+    'rate': [1.5, 200.0, 3.0, 4.0],
+})
+
+Rule_Set = {
+    'fill_null': {'deaths': 0, 'region': 'Unknown'},
+    'non_negative': ['deaths', 'confirmed'],
+    'between': {'rate': (0, 100)},
+    'unique': ['region'],
+}
+
+
+def test_apply_rule_set_cleans_data():
+    df, violations, counts = Validate.apply_rule_set(Mock_Data, Rule_Set)
+    assert df['deaths'].tolist() == [1, 3, 0]
+    assert df['confirmed'].tolist() == [5, 0, 8]
+    assert df['confirmed'].dtype == Mock_Data['confirmed'].dtype
+    assert len(violations) == len(Mock_Data)
+
+def test_apply_rule_set_flags_violations():
+    df, violations, counts = Validate.apply_rule_set(Mock_Data, Rule_Set)
+    assert violations[1] & Validate.OUT_OF_RANGE
+    assert violations[3] & Validate.NULL_VALUE
+    assert violations[3] & Validate.DUPLICATE
+    assert counts['non_negative:confirmed'] == 1
+    assert counts['between:rate'] == 1
+
+def test_fill_null_values_leaves_the_input_frame_as_it_is():
+    data_frame = pd.DataFrame({'region': pd.Series(['A', None], dtype='category'), 'deaths': [1.0, None]})
+    df = Validate.fill_null_values(data_frame, {'region': 'Unknown', 'deaths': 0})
+    assert df['region'].tolist() == ['A', 'Unknown']
+    assert df['deaths'].tolist() == [1.0, 0.0]
+    assert list(data_frame['region'].cat.categories) == ['A']
+    assert data_frame['deaths'].isna().sum() == 1
@@ -0,0 +1,62 @@
+import json
+import os
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
+from instrumentation import Instrumentation
+
+
+def test_stage_records_rows_and_parent():
+    with Instrumentation.collect() as records:
+        with Instrumentation.stage("process", dataset="day_wise") as outer:
+            with Instrumentation.stage("write_parquet", rows_in=3) as inner:
+                inner["rows_out"] = 2
+            outer["rows_out"] = 2
+
+    assert [record["stage"] for record in records] == ["write_parquet", "process"]
+    assert records[0]["dataset"] == "day_wise"
+    assert records[0]["parent"] == "process"
+    assert records[0]["rows_in"] == 3 and records[0]["rows_out"] == 2
+    assert records[1]["wall_seconds"] >= records[0]["wall_seconds"]
+    assert not any(record in Instrumentation.records for record in records)
+
+def test_stages_of_threads_keep_the_context():
+    def write(rows):
+        with Instrumentation.stage("write_parquet") as record:
+            record["rows_out"] = rows
+
+    with Instrumentation.collect() as records:
+        with Instrumentation.stage("load", dataset="day_wise"):
+            with ThreadPoolExecutor(max_workers=4) as executor:
+                for future in [executor.submit(Instrumentation.in_context(write, rows)) for rows in range(20)]:
+                    future.result()
+
+    writes = [record for record in records if record["stage"] == "write_parquet"]
+    assert sorted(record["rows_out"] for record in writes) == list(range(20))
+    assert all(record["dataset"] == "day_wise" and record["parent"] == "load" for record in writes)
+    assert not any(record in Instrumentation.records for record in records)
+
+def test_timed_counts_rows():
+    @Instrumentation.timed("drop_odd")
+    def drop_odd(df):
+        return df[df["value"] % 2 == 0]
+
+    with Instrumentation.collect() as records:
+        drop_odd(pd.DataFrame({"value": [1, 2, 3, 4]}))
+    assert records[0]["stage"] == "drop_odd"
+    assert (records[0]["rows_in"], records[0]["rows_out"]) == (4, 2)
+
+def test_write_report(tmp_path):
+    with Instrumentation.collect() as records:
+        for rows in [1, 2]:
+            with Instrumentation.stage("read", dataset=f"d{rows}") as record:
+                record["rows_out"] = rows
+
+    Instrumentation.write_report(records, {"execution_mode": "serial"}, str(tmp_path))
+    Instrumentation.write_report(records, {"execution_mode": "parallel"}, str(tmp_path))
+    with open(os.path.join(tmp_path, "run_report.json")) as f:
+        report = json.load(f)
+    assert report["run"] == {"execution_mode": "parallel"}
+    assert report["summary"]["read"]["calls"] == 2
+    assert report["summary"]["read"]["rows_out"] == 3
+    with open(os.path.join(tmp_path, "run_reports.jsonl")) as f:
+        assert len(f.readlines()) == 2
@@ -0,0 +1,102 @@
+import os
+import threading
+import time
+import pytest
+from orchestrator import Orchestrator
+
+
+class ThreadStages(Orchestrator):
+    STAGES = {
+        "process": {"after": None, "executor": "thread", "workers": 2},
+        "load": {"after": "process", "executor": "thread", "workers": 1},
+        "upload": {"after": "load", "executor": "thread", "workers": 1},
+    }
+
+    def __init__(self, **kwargs):
+        super().__init__(injector=None, **kwargs)
+        self.events = []
+        self.lock = threading.Lock()
+
+    def log(self, event):
+        with self.lock:
+            self.events.append(event)
+
+    def process(self, name, file_path):
+        # the large input takes a while to clean
+        time.sleep(0.3 if os.path.getsize(file_path) > 100 else 0)
+        self.log(("process", name))
+        if name == "broken":
+            return {"name": name, "success": False, "error": "bad input"}
+        return {"name": name, "success": True, "error": None}
+
+    def load(self, name, result):
+        self.log(("load", name))
+        result["loaded"] = True
+        return result
+
+def make_inputs(tmp_path, sizes):
+    file_names = {}
+    for name, size in sizes.items():
+        file_names[name] = str(tmp_path / f"{name}.csv")
+        with open(file_names[name], "w") as f:
+            f.write("x" * size)
+    return file_names
+
+
+def test_small_datasets_are_loaded_while_a_large_one_is_processed(tmp_path):
+    orchestrator = ThreadStages(queue_size=1)
+    results = orchestrator.run(make_inputs(tmp_path, {"small": 10, "large": 1000, "other": 20}))
+
+    assert all(result["loaded"] for result in results.values())
+    assert orchestrator.events.index(("load", "small")) < orchestrator.events.index(("process", "large"))
+    assert orchestrator.events[-1] == ("load", "large")
+    assert "upload" not in orchestrator.get_stages()
+
+def test_a_failed_stage_skips_the_next_ones(tmp_path):
+    orchestrator = ThreadStages()
+    results = orchestrator.run(make_inputs(tmp_path, {"broken": 10, "fine": 10}))
+
+    assert results["broken"]["success"] is False
+    assert "bad input" in results["broken"]["error"]
+    assert ("load", "broken") not in orchestrator.events
+    assert results["fine"]["loaded"]
+
+def test_real_stages_load_and_upload_generated_data(tmp_path, monkeypatch):
+    moto = pytest.importorskip("moto")
+    import boto3
+    from s3_transfer import S3Transfer
+    from data_pipeline import Pipeline
+    from data_conversion import DataConvert
+    from data_injection import DataInjection
+    from data_generators import DataGenerators
+
+    # keep the quarantine and the deltas of the real data folder untouched, the workers are forked with the patches
+    monkeypatch.setattr(Pipeline, "clear_deltas", staticmethod(lambda name, output_dir=None: None))
+    monkeypatch.setattr(DataConvert, "save_non_compliant", staticmethod(lambda df, key, intermediate_path=None: len(df)))
+    for variable, value in {"AWS_ACCESS_KEY_ID": "testing", "AWS_SECRET_ACCESS_KEY": "testing",
+                            "export_parquet": "true", "output_layout": "file"}.items():
+        monkeypatch.setenv(variable, value)
+    file_names = {
+        name: DataGenerators.generate(name, str(tmp_path / "input"), scale=0.1, seed=1)
+        for name in ["country_wise", "day_wise", "full_grouped"]
+    }
+    injector = DataInjection("test_db", str(tmp_path / "db_files"))
+    injector.create_database()
+    try:
+        with moto.mock_aws():
+            client = boto3.client("s3", region_name="us-east-1")
+            client.create_bucket(Bucket="test-bucket")
+            monkeypatch.setattr(S3Transfer, "_client", client)
+            # the real STAGES: the cleaning runs in worker processes, the load and the upload in threads
+            results = Orchestrator(injector, max_workers=2, upload_bucket="test-bucket",
+                                   output_dir=str(tmp_path / "output"), direct=True).run(file_names)
+            keys = [obj["Key"] for obj in client.list_objects_v2(Bucket="test-bucket").get("Contents", [])]
+        counts = {name: injector.connection.execute(f"SELECT count(*) FROM {name}").fetchone()[0] for name in file_names}
+    finally:
+        injector.close_connection()
+
+    for name in file_names:
+        assert results[name]["success"] and results[name]["loaded"], results[name]["error"]
+        assert results[name]["uploaded"] == [f"{name}.parquet"]
+        assert counts[name] == results[name]["stages"][-1]["rows_out"] > 0
+        assert f"{name}.parquet" in keys
@@ -0,0 +1,70 @@
+import pandas as pd
+import pytest
+from data_injection import DataInjection
+from query_service import QueryService
+
+
+def load(db_folder, deaths):
+    injector = DataInjection(db_name='covid_19_db', db_folder=str(db_folder))
+    injector.create_database()
+    try:
+        injector.inject_data_from_frames({
+            'country_wise': pd.DataFrame({
+                'country_region': ['A', 'B', 'C'],
+                'who_region': ['Europe', 'Europe', 'Africa'],
+                'confirmed': [100, 200, 300],
+                'deaths': deaths,
+                'recovered': [10, 20, 30],
+                'active': [80, 170, 240],
+                'deaths_per_100_cases': [10.0, 5.0, 10.0],
+            }),
+            'full_grouped': pd.DataFrame({
+                'date': pd.to_datetime(['2020-01-23', '2020-01-22', '2020-01-22']),
+                'country_region': ['A', 'A', 'B'],
+                'confirmed': [2, 1, 5], 'deaths': [0, 0, 1], 'recovered': [0, 0, 0], 'active': [2, 1, 4],
+                'new_cases': [1, 1, 5], 'new_deaths': [0, 0, 1], 'new_recovered': [0, 0, 0],
+            }),
+        })
+    finally:
+        injector.close_connection()
+    return injector.db_file
+
+def test_named_queries_are_cached(tmp_path):
+    service = QueryService(load(tmp_path, [10, 10, 30]), pool_size=2)
+    try:
+        assert service.query('top_deaths', limit='2')['country_region'].to_pylist() == ['C', 'A']
+        assert service.query('top_deaths', limit=2)['country_region'].to_pylist() == ['C', 'A']
+        series = service.query('country_time_series', country='A')
+        assert series['confirmed'].to_pylist() == [1, 2]
+        totals = service.query('region_totals')
+        assert dict(zip(totals['who_region'].to_pylist(), totals['deaths'].to_pylist())) == {'Europe': 20, 'Africa': 30}
+        assert (service.hits, service.misses) == (1, 3)
+        with pytest.raises(ValueError):
+            service.query('country_time_series')
+    finally:
+        service.close()
+
+def test_reload_invalidates_only_the_reloaded_tables(tmp_path):
+    db_file = load(tmp_path, [10, 10, 30])
+    service = QueryService(db_file)
+    assert service.query('top_deaths', limit=1)['deaths'].to_pylist() == [30]
+    service.query('country_time_series', country='B')
+    assert service.invalidate(['day_wise']) == 0
+
+    # DuckDB lets one process either write or read the file, the service lets go for the load
+    service.close()
+    load(tmp_path, [10, 50, 30])
+    assert service.query('top_deaths', limit=1)['deaths'].to_pylist() == [50]
+    assert service.get_stats()['misses'] == 3
+    service.close()
+
+def test_close_waits_for_the_borrowed_connections(tmp_path):
+    service = QueryService(load(tmp_path, [10, 10, 30]), pool_size=2)
+    with service.connection() as cursor:
+        # another thread retires the pool while this query still runs on it
+        service.close()
+        assert cursor.execute('SELECT count(*) FROM country_wise').fetchone()[0] == 3
+        assert service.query('top_deaths', limit=1)['deaths'].to_pylist() == [30]
+    assert service.get_stats()['open']
+    service.close()
+    assert not service.get_stats()['open']
@@ -0,0 +1,59 @@
+import os
+from run_manifest import RunManifest
+
+
+def write_input(folder, content):
+    file_path = os.path.join(folder, 'day_wise.csv')
+    with open(file_path, 'w') as f:
+        f.write(content)
+    return file_path
+
+def test_unchanged_dataset_is_skipped(tmp_path):
+    file_path = write_input(tmp_path, 'Date,Confirmed\n2020-01-22,555\n')
+    open(os.path.join(tmp_path, 'day_wise.parquet'), 'w').close()
+    manifest = RunManifest(str(tmp_path))
+    assert manifest.get_changed({'day_wise': file_path}) == {'day_wise': file_path}
+
+    manifest.update('day_wise', file_path)
+    manifest.save()
+    assert RunManifest(str(tmp_path)).get_changed({'day_wise': file_path}) == {}
+
+def test_changed_content_is_processed(tmp_path):
+    file_path = write_input(tmp_path, 'Date,Confirmed\n2020-01-22,555\n')
+    open(os.path.join(tmp_path, 'day_wise.parquet'), 'w').close()
+    manifest = RunManifest(str(tmp_path))
+    manifest.update('day_wise', file_path)
+    manifest.save()
+
+    write_input(tmp_path, 'Date,Confirmed\n2020-01-22,555\n2020-01-23,654\n')
+    assert RunManifest(str(tmp_path)).get_changed({'day_wise': file_path}) == {'day_wise': file_path}
+
+def test_changed_engine_or_load_mode_is_processed(tmp_path):
+    file_path = write_input(tmp_path, 'Date,Confirmed\n2020-01-22,555\n')
+    open(os.path.join(tmp_path, 'day_wise.parquet'), 'w').close()
+    manifest = RunManifest(str(tmp_path), engine='pandas', load_mode='parquet')
+    manifest.update('day_wise', file_path)
+    manifest.save()
+
+    assert RunManifest(str(tmp_path), engine='pandas', load_mode='parquet').get_changed({'day_wise': file_path}) == {}
+    assert RunManifest(str(tmp_path), engine='duckdb', load_mode='parquet').get_changed({'day_wise': file_path}) == {'day_wise': file_path}
+    assert RunManifest(str(tmp_path), engine='pandas', load_mode='direct').get_changed({'day_wise': file_path}) == {'day_wise': file_path}
+
+def test_direct_load_without_export_checks_the_database(tmp_path):
+    import duckdb
+    file_path = write_input(tmp_path, 'Date,Confirmed\n2020-01-22,555\n')
+    db_file = os.path.join(tmp_path, 'test.duckdb')
+    options = {'engine': 'pandas', 'load_mode': 'direct', 'export_parquet': False, 'db_file': db_file}
+    manifest = RunManifest(str(tmp_path), **options)
+    manifest.update('day_wise', file_path)
+    manifest.save()
+
+    connection = duckdb.connect(db_file)
+    connection.execute('CREATE TABLE worldometer (confirmed BIGINT)')
+    connection.close()
+    assert RunManifest(str(tmp_path), **options).get_changed({'day_wise': file_path}) == {'day_wise': file_path}
+
+    connection = duckdb.connect(db_file)
+    connection.execute('CREATE TABLE day_wise (confirmed BIGINT)')
+    connection.close()
+    assert RunManifest(str(tmp_path), **options).get_changed({'day_wise': file_path}) == {}
@@ -0,0 +1,60 @@
+import os
+import time
+import pytest
+import boto3
+from s3_cache import S3Cache
+from s3_transfer import S3Transfer
+
+moto = pytest.importorskip("moto")
+
+BUCKET = "test-bucket"
+
+
+@pytest.fixture
+def transfer(monkeypatch):
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    with moto.mock_aws():
+        client = boto3.client("s3", region_name="us-east-1")
+        client.create_bucket(Bucket=BUCKET)
+        transfer = S3Transfer(client=client, max_concurrency=2, part_concurrency=2)
+        transfer.downloads = []
+        client.meta.events.register("provide-client-params.s3.GetObject",
+                                    lambda params, **kwargs: transfer.downloads.append(params["Key"]))
+        yield transfer
+
+def test_unchanged_objects_are_not_downloaded_again(transfer, tmp_path):
+    cache = S3Cache(str(tmp_path))
+    transfer.client.put_object(Bucket=BUCKET, Key="data.csv", Body=b"a\n1\n2\n")
+
+    first = transfer.read_tables(BUCKET, cache=cache)
+    downloads = len(transfer.downloads)
+    second = transfer.read_tables(BUCKET, cache=cache)
+
+    assert downloads > 0
+    assert len(transfer.downloads) == downloads
+    assert first["data.csv"].equals(second["data.csv"])
+
+def test_changed_object_replaces_stale_copy(transfer, tmp_path):
+    cache = S3Cache(str(tmp_path))
+    transfer.client.put_object(Bucket=BUCKET, Key="data.csv", Body=b"a\n1\n")
+    transfer.read_tables(BUCKET, cache=cache)
+    transfer.client.put_object(Bucket=BUCKET, Key="data.csv", Body=b"a\n1\n2\n")
+
+    tables = transfer.read_tables(BUCKET, cache=cache)
+
+    assert tables["data.csv"].num_rows == 2
+    assert len(os.listdir(tmp_path)) == 1
+
+def test_least_recently_used_files_are_evicted(transfer, tmp_path):
+    cache = S3Cache(str(tmp_path), max_bytes=150)
+    for key in ["a.csv", "b.csv", "c.csv"]:
+        transfer.client.put_object(Bucket=BUCKET, Key=key, Body=b"a\n" + b"1\n" * 30)
+        etag = transfer.client.head_object(Bucket=BUCKET, Key=key)["ETag"]
+        cache.get_file(transfer, BUCKET, key, etag)
+        time.sleep(0.01)
+
+    remaining = os.listdir(tmp_path)
+
+    assert len(remaining) == 2
+    assert not os.path.exists(cache.get_cache_file(BUCKET, "a.csv", etag))
@@ -0,0 +1,92 @@
+import os
+import pytest
+import boto3
+import pyarrow as pa
+import pyarrow.parquet as pq
+from s3_transfer import S3Transfer
+
+moto = pytest.importorskip("moto")
+
+BUCKET = "test-bucket"
+
+
+@pytest.fixture
+def transfer(monkeypatch):
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    with moto.mock_aws():
+        client = boto3.client("s3", region_name="us-east-1")
+        client.create_bucket(Bucket=BUCKET)
+        yield S3Transfer(client=client, max_concurrency=4, part_concurrency=2,
+                         multipart_chunksize=5 * 1024 * 1024)
+
+def test_list_objects_follows_pages(transfer):
+    for i in range(5):
+        transfer.client.put_object(Bucket=BUCKET, Key=f"part_{i}.csv", Body=b"a\n1\n")
+    keys = [obj["Key"] for obj in transfer.list_objects(BUCKET, page_size=2)]
+
+    assert len(keys) == 5
+
+def test_read_tables_reads_parquet_with_ranges(transfer, tmp_path):
+    table = pa.table({"a": list(range(1000)), "b": [str(i) for i in range(1000)]})
+    file_path = os.path.join(tmp_path, "table.parquet")
+    pq.write_table(table, file_path, row_group_size=100)
+    transfer.client.upload_file(file_path, BUCKET, "table.parquet")
+    transfer.client.put_object(Bucket=BUCKET, Key="table.csv", Body=b"a,b\n1,x\n2,y\n")
+
+    tables = transfer.read_tables(BUCKET)
+
+    assert tables["table.parquet"].equals(table)
+    assert tables["table.csv"].num_rows == 2
+
+def test_upload_directory_multipart(transfer, tmp_path):
+    os.makedirs(os.path.join(tmp_path, "nested"))
+    with open(os.path.join(tmp_path, "nested", "large.bin"), "wb") as f:
+        f.write(os.urandom(6 * 1024 * 1024))
+    with open(os.path.join(tmp_path, "small.txt"), "w") as f:
+        f.write("small")
+
+    uploaded = transfer.upload_directory(str(tmp_path), BUCKET)
+    etag = transfer.client.head_object(Bucket=BUCKET, Key="nested/large.bin")["ETag"]
+
+    assert sorted(uploaded) == ["nested/large.bin", "small.txt"]
+    assert etag.strip('"').endswith("-2")
+
+def test_compute_etag_matches_multipart_upload(transfer, tmp_path):
+    file_path = os.path.join(tmp_path, "large.parquet")
+    with open(file_path, "wb") as f:
+        f.write(os.urandom(11 * 1024 * 1024))
+    transfer.client.upload_file(file_path, BUCKET, "large.parquet", Config=transfer.transfer_config)
+    etag = transfer.client.head_object(Bucket=BUCKET, Key="large.parquet")["ETag"].strip('"')
+
+    assert transfer.compute_etag(file_path) == etag
+
+def test_sync_directory_uploads_only_changed_parquet(transfer, tmp_path):
+    os.makedirs(os.path.join(tmp_path, "_deltas"))
+    pq.write_table(pa.table({"a": [1]}), os.path.join(tmp_path, "one.parquet"))
+    pq.write_table(pa.table({"a": [2]}), os.path.join(tmp_path, "two.parquet"))
+    pq.write_table(pa.table({"a": [3]}), os.path.join(tmp_path, "_deltas", "part.parquet"))
+    with open(os.path.join(tmp_path, "_manifest.json"), "w") as f:
+        f.write("{}")
+    transfer.client.put_object(Bucket=BUCKET, Key="old.parquet", Body=b"old")
+
+    first = transfer.sync_directory(str(tmp_path), BUCKET)
+    pq.write_table(pa.table({"a": [4, 5]}), os.path.join(tmp_path, "two.parquet"))
+    dry_run = transfer.sync_directory(str(tmp_path), BUCKET, delete=True, dry_run=True)
+    second = transfer.sync_directory(str(tmp_path), BUCKET, delete=True)
+    keys = sorted(obj["Key"] for obj in transfer.list_objects(BUCKET))
+
+    assert sorted(first["uploaded"]) == ["one.parquet", "two.parquet"]
+    assert dry_run["upload"] == ["two.parquet"] and dry_run["delete"] == ["old.parquet"] and dry_run["uploaded"] == []
+    assert second["skip"] == ["one.parquet"] and second["deleted"] == ["old.parquet"]
+    assert keys == ["one.parquet", "two.parquet"]
+
+def test_sync_directory_only_syncs_the_given_datasets(transfer, tmp_path):
+    os.makedirs(os.path.join(tmp_path, "full_grouped", "month=2020-01"))
+    pq.write_table(pa.table({"a": [1]}), os.path.join(tmp_path, "day_wise.parquet"))
+    pq.write_table(pa.table({"a": [2]}), os.path.join(tmp_path, "full_grouped", "month=2020-01", "part-0.parquet"))
+    pq.write_table(pa.table({"a": [3]}), os.path.join(tmp_path, "worldometer.parquet"))
+
+    report = transfer.sync_directory(str(tmp_path), BUCKET, names=["day_wise", "full_grouped"])
+
+    assert sorted(report["uploaded"]) == ["day_wise.parquet", "full_grouped/month=2020-01/part-0.parquet"]